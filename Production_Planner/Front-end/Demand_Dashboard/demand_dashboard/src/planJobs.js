@@ -0,0 +1,27 @@
+import axios from "axios";
+
+const API_BASE = "http://127.0.0.1:8100";
+const POLL_INTERVAL_MS = 1000;
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// POST /api/plan/ starts a solve job and answers 202 {job_id, status}:
+// poll the job until it has ended, then fetch its result. Resolves with the
+// plan result (what /api/plan/ used to return) and rejects with an Error
+// whose message says why the job did not produce one.
+export async function requestPlan(postData) {
+  const { data: job } = await axios.post(`${API_BASE}/api/plan/`, postData);
+  let status = job.status;
+  while (status === "queued" || status === "running") {
+    await sleep(POLL_INTERVAL_MS);
+    status = (await axios.get(`${API_BASE}/api/plan/jobs/${job.job_id}`)).data.status;
+  }
+  try {
+    const { data } = await axios.get(`${API_BASE}/api/plan/jobs/${job.job_id}/result`);
+    return data;
+  } catch (err) {
+    const detail = err.response?.data?.detail;
+    if (!detail) throw err;
+    throw new Error(typeof detail === "string" ? detail : detail.message || JSON.stringify(detail));
+  }
+}
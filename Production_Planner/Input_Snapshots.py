@@ -0,0 +1,120 @@
+"""
+Binary snapshots of the planner's input files (Lines.json and the parameters
+workbook).
+
+A snapshot is the compiled content of one source file, pickled next to it as
+<source>.snapshot together with the snapshot format version and the SHA-256
+of the source it was compiled from. Loading a source returns its compiled
+content from memory while the file's mtime and size are unchanged, else from
+its snapshot while the checksum matches, and compiles (and rewrites the
+snapshot) only when the source itself changed.
+
+Usage (from the repository root), to compile snapshots ahead of a deployment:
+    python Production_Planner/Input_Snapshots.py Data/Lines.json "Data/Products parameters AI.xlsx"
+"""
+import json
+import os
+import pickle
+import sys
+
+import Plan_Cache
+
+SNAPSHOT_VERSION = 1  # Bump when a compiler's output changes
+SNAPSHOT_SUFFIX = ".snapshot"
+
+_loaded: dict[str, tuple[int, int, object]] = {}
+
+
+def snapshot_path(source: str) -> str:
+    return source + SNAPSHOT_SUFFIX
+
+
+def read_json(path: str) -> dict:
+    """
+    Parsed content of a JSON file.
+    """
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def write_snapshot(source: str, kind: str, content, digest: str):
+    """
+    Pickle the compiled content of source next to it; written to a temporary
+    file first so readers never see half a snapshot. A read-only data folder
+    only costs the next cold start a compile.
+    """
+    path = snapshot_path(source)
+    snapshot = {
+        "version": SNAPSHOT_VERSION,
+        "kind": kind,
+        "source_sha256": digest,
+        "content": content,
+    }
+    try:
+        with open(path + ".tmp", "wb") as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + ".tmp", path)
+    except OSError as e:
+        print("Could not write snapshot", path, e)
+
+
+def read_snapshot(source: str, kind: str, digest: str):
+    """
+    Content of the snapshot of source, or None if there is none or it is of
+    another version, kind or source checksum.
+    """
+    try:
+        with open(snapshot_path(source), "rb") as f:
+            snapshot = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        return None
+    if (
+        not isinstance(snapshot, dict)
+        or snapshot.get("version") != SNAPSHOT_VERSION
+        or snapshot.get("kind") != kind
+        or snapshot.get("source_sha256") != digest
+    ):
+        return None
+    return snapshot["content"]
+
+
+def load_snapshot(source: str, kind: str, compiler):
+    """
+    Compiled content of a source file (see the module docstring).
+
+    Args:
+        source: path of the source file.
+        kind: what the content is ("lines_config", "parameters"); a snapshot of
+            another kind is not used.
+        compiler: function of the source path that compiles it.
+    Returns:
+        The compiled content, shared between callers: do not modify it.
+    """
+    st = os.stat(source)
+    known = _loaded.get(source)
+    if known is not None and known[:2] == (st.st_mtime_ns, st.st_size):
+        return known[2]
+    digest = Plan_Cache.file_digest(source)
+    content = read_snapshot(source, kind, digest)
+    if content is None:
+        content = compiler(source)
+        write_snapshot(source, kind, content, digest)
+    _loaded[source] = (st.st_mtime_ns, st.st_size, content)
+    return content
+
+
+def main():
+    import Lines_Config
+    import Product_Parameters
+
+    for source in sys.argv[1:]:
+        if source.endswith(".json"):
+            kind, compiler = "lines_config", Lines_Config.read_config
+        else:
+            kind, compiler = "parameters", Product_Parameters.index_workbook
+        write_snapshot(source, kind, compiler(source), Plan_Cache.file_digest(source))
+        print("Wrote", snapshot_path(source))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+"""
+Typed view of Lines.json, compiled once per file version.
+
+compile_config turns the raw JSON into frozen, slotted dataclasses with every
+lookup the model builder needs already resolved: the BR chain of a line with
+each BR's overlap with the previous one (the "a & b" / "b & a" keys), which
+BRs are harvested, their Mab and SS counts, and their Follow_Up stages with
+their SameStarts groups and overlaps. The JSON is validated while compiling,
+so a malformed Lines.json is rejected with a ValueError naming the offending
+entry instead of failing halfway through a model build.
+
+load_config compiles through Input_Snapshots: a process compiles Lines.json
+once and again only when the file changes (hot reload).
+"""
+from dataclasses import dataclass, field
+
+import Input_Snapshots
+
+NO_OVERLAP_VALUES = (None, "None")
+
+
+@dataclass(frozen=True, slots=True)
+class FollowUpStage:
+    """
+    One Follow_Up_<BR> stage, in Lines.json order.
+
+    group:         the stages of the first SameStarts group naming this one
+                   (split on " & "), all started together; None if ungrouped.
+    skip:          ungrouped but named in the last SameStarts group, so only
+                   placed with that group.
+    restart_after: the previous stage if it is named in the last SameStarts
+                   group: this stage then follows that stage's end.
+    overlap:       days this stage overlaps the previous one (the first stage
+                   looks at the last one), "Full", or None.
+    """
+    name: str
+    days: int
+    group: tuple[str, ...] | None
+    skip: bool
+    restart_after: str | None
+    overlap: int | str | None
+
+
+@dataclass(frozen=True, slots=True)
+class BRSpec:
+    """
+    One BR of a line's chain.
+
+    overlap: overlap with the previous BR from the line's Overlaps (1 = starts
+             on the previous end, "Full" = ends with it, n = starts n - 1 days
+             before it ends), or None if it starts on its own after the
+             previous end. Always None for the first BR.
+    """
+    name: str
+    days: int
+    volume: float
+    overlap: int | str | None
+    harvested: bool
+    mabs: int
+    sss: int
+    follow_up: tuple[FollowUpStage, ...] | None
+
+
+@dataclass(frozen=True, slots=True)
+class LineSpec:
+    id: int
+    active: bool
+    brs: tuple[BRSpec, ...]
+    hold: bool
+    final_volume: float
+
+    @property
+    def br_names(self) -> list[str]:
+        return [br.name for br in self.brs]
+
+
+@dataclass(frozen=True, slots=True)
+class ProductSpec:
+    name: str
+    protein_per_1000l: float
+    thawing: int
+    lines: tuple[LineSpec, ...]
+
+    def active_lines(self) -> dict[int, LineSpec]:
+        return {line.id: line for line in self.lines if line.active}
+
+
+@dataclass(frozen=True, slots=True)
+class LinesConfig:
+    """
+    products:     the BR products (AryoSeven_RC and other TF-only products
+                  have no entry; their planner reads raw).
+    common_lines: Common_Lines, product -> line ids.
+    covers:       "<product> <dose>" -> (min, max) cover multipliers.
+    raw:          the parsed JSON, as served by /api/lines.
+    """
+    products: dict[str, ProductSpec]
+    common_lines: dict[str, tuple[int, ...]]
+    covers: dict[str, tuple[float, float]]
+    raw: dict = field(repr=False)
+
+
+def parse_volume(br_name: str) -> float:
+    """
+    Parses the volume from a batch record name.
+
+    The function extracts the leading numeric characters from the batch record name,
+    which are assumed to represent the volume. The batch record name is expected to
+    have the format where the volume is the first part of the string, separated by a
+    hyphen.
+
+    Args:
+        br_name (str): The batch record name from which to extract the volume.
+
+    Returns:
+        float: The extracted volume as a float. Returns 0.0 if no numeric characters
+               are found at the beginning of the batch record name.
+
+    """
+    chunk = br_name.split("-")[0]
+    digits = ""
+    for ch in chunk:
+        if ch.isdigit():
+            digits += ch
+        else:
+            break
+    return float(digits) if digits else 0.0
+
+
+def line_final_volume(br_names: list) -> float:
+    """
+    Return the harvested volume (liters) of one run on a line.
+
+    The last BR is always harvested; when the last two BRs are both >= 1000 L
+    (double-harvest lines), their volumes are added.
+    """
+    if not br_names:
+        return 0
+    last_vol = parse_volume(br_names[-1])
+    if len(br_names) >= 2:
+        sec_vol = parse_volume(br_names[-2])
+        if last_vol >= 1000 and sec_vol >= 1000:
+            return last_vol + sec_vol
+    return last_vol
+
+
+def _check(condition: bool, where: str, message: str):
+    if not condition:
+        raise ValueError(f"Lines.json {where}: {message}")
+
+
+def _check_days(value, where: str):
+    _check(
+        isinstance(value, int) and not isinstance(value, bool) and value >= 1,
+        where, f"expected a positive whole number of days, got {value!r}",
+    )
+
+
+def _check_overlap(value, where: str):
+    _check(
+        value in NO_OVERLAP_VALUES or value == "Full"
+        or (isinstance(value, int) and not isinstance(value, bool) and value >= 0),
+        where, f"expected a number of days, 'Full' or 'None', got {value!r}",
+    )
+
+
+def _harvested_indices(br_names: list[str], n_harvest) -> set[int]:
+    """
+    Indices of the harvested BRs: the last one, or for N_Harvest 2 the last
+    two of at least 1000 L (the last one if there are fewer).
+    """
+    n_br = len(br_names)
+    if n_harvest == 2:
+        candidates = [i for i, br in enumerate(br_names) if parse_volume(br) >= 1000]
+        return set(candidates[-2:]) if len(candidates) >= 2 else {n_br - 1}
+    if n_harvest == 1:
+        return {n_br - 1}
+    return set()
+
+
+def compile_follow_up(l_conf: dict, brn: str, where: str) -> tuple[FollowUpStage, ...] | None:
+    """
+    The Follow_Up_<brn> stages of a line, or None if it has none.
+    """
+    fu_key = f"Follow_Up_{brn}"
+    if fu_key not in l_conf:
+        return None
+    where = f"{where} {fu_key}"
+    fu_dict = l_conf[fu_key]
+    _check(isinstance(fu_dict, dict) and fu_dict, where, "expected a non-empty object")
+    for fu_name, days in fu_dict.items():
+        _check_days(days, f"{where} {fu_name!r}")
+
+    fu_over = l_conf.get(f"{fu_key}_Overlaps", None)
+    if isinstance(fu_over, dict):
+        for key, value in fu_over.items():
+            _check_overlap(value, f"{where}_Overlaps {key!r}")
+    else:
+        _check_overlap(fu_over, f"{where}_Overlaps")
+
+    same_starts = l_conf.get(f"{fu_key}_SameStarts", {})
+    if isinstance(same_starts, str):
+        same_starts = {same_starts: 1}
+    _check(
+        isinstance(same_starts, dict), f"{where}_SameStarts",
+        f"expected an object or a string, got {type(same_starts).__name__}",
+    )
+    groups = [tuple(key.split(" & ")) for key in same_starts]
+    for key, group in zip(same_starts, groups):
+        for stg in group:
+            _check(
+                stg in fu_dict or key == "None", f"{where}_SameStarts {key!r}",
+                f"unknown stage {stg!r}",
+            )
+    # Stages named in the last group are only placed together with it.
+    last_group = [part.strip() for part in list(same_starts)[-1].split("&")] if same_starts else []
+
+    fu_order = list(fu_dict)
+    stages = []
+    for idx, fu_name in enumerate(fu_order):
+        prev_fu_name = fu_order[idx - 1]
+        if isinstance(fu_over, dict):
+            ov_val = fu_over.get(f"{prev_fu_name} & {fu_name}", None)
+            if ov_val is None:
+                ov_val = fu_over.get(f"{fu_name} & {prev_fu_name}", None)
+        else:
+            ov_val = fu_over
+        if ov_val in NO_OVERLAP_VALUES or ov_val == 1:
+            ov_val = None
+        stages.append(FollowUpStage(
+            name=fu_name,
+            days=fu_dict[fu_name],
+            group=next((g for g in groups if fu_name in g), None),
+            skip=fu_name in last_group,
+            restart_after=prev_fu_name if prev_fu_name in last_group else None,
+            overlap=ov_val,
+        ))
+    return tuple(stages)
+
+
+def compile_line(l_conf: dict, where: str) -> LineSpec:
+    """
+    One entry of a product's "lines" list.
+    """
+    _check("id" in l_conf, where, "line without an id")
+    where = f"{where} line {l_conf['id']}"
+    br_map = l_conf["BRs"]
+    _check(isinstance(br_map, dict) and br_map, f"{where} BRs", "expected a non-empty object")
+    overlaps = l_conf.get("Overlaps") or {}
+    _check(isinstance(overlaps, dict), f"{where} Overlaps", "expected an object")
+    for key, value in overlaps.items():
+        _check_overlap(value, f"{where} Overlaps {key!r}")
+    for key in ("Mabs", "SS's"):
+        for after, count in l_conf.get(key, {}).items():
+            _check(
+                isinstance(count, int) and count >= 0, f"{where} {key} {after!r}",
+                f"expected a stage count, got {count!r}",
+            )
+
+    br_names = list(br_map)
+    harvested = _harvested_indices(br_names, l_conf.get("N_Harvest", 1))
+    brs = []
+    for i, brn in enumerate(br_names):
+        _check_days(br_map[brn], f"{where} BR {brn!r}")
+        ov_val = None
+        if i > 0:
+            prev_br = br_names[i - 1]
+            ov_val = overlaps.get(f"{prev_br} & {brn}") or overlaps.get(f"{brn} & {prev_br}")
+            if ov_val in NO_OVERLAP_VALUES:
+                ov_val = None
+        brs.append(BRSpec(
+            name=brn,
+            days=br_map[brn],
+            volume=parse_volume(brn),
+            overlap=ov_val,
+            harvested=i in harvested,
+            mabs=l_conf.get("Mabs", {}).get(f"After {brn}", 0),
+            sss=l_conf.get("SS's", {}).get(f"After {brn}", 0),
+            follow_up=compile_follow_up(l_conf, brn, where),
+        ))
+    return LineSpec(
+        id=l_conf["id"],
+        active=l_conf.get("status") == "active",
+        brs=tuple(brs),
+        # Hold is read from the line entry; the product-level Hold is unused.
+        hold=l_conf.get("Hold", 0) in [1, "Yes"],
+        final_volume=line_final_volume(br_names),
+    )
+
+
+def compile_config(raw: dict) -> LinesConfig:
+    """
+    Validate and compile parsed Lines.json content.
+
+    Raises:
+        ValueError: If an entry is malformed.
+    """
+    _check(isinstance(raw.get("Common_Lines"), dict), "Common_Lines", "expected an object")
+    products = {}
+    for name, conf_list in raw.items():
+        if name in ("Common_Lines", "Covers"):
+            continue
+        _check(
+            isinstance(conf_list, list) and len(conf_list) >= 2
+            and all(isinstance(c, dict) for c in conf_list[:2]),
+            name, "expected [base config, {\"lines\": [...]}]",
+        )
+        base_conf, lines_conf = conf_list[0], conf_list[1]
+        lines_list = lines_conf["lines"] if "lines" in lines_conf else lines_conf.get("RC", [])
+        if not any("BRs" in li for li in lines_list):
+            continue  # Transfection lines (AryoSeven_RC), planned separately
+        thawing = base_conf.get("Cell_Thawing & SF", 0)
+        _check(
+            isinstance(thawing, int) and thawing >= 0, f"{name} Cell_Thawing & SF",
+            f"expected a number of days, got {thawing!r}",
+        )
+        factor = base_conf.get("Protein_per_1000L_BR", 0.0)
+        _check(
+            isinstance(factor, (int, float)) and factor >= 0, f"{name} Protein_per_1000L_BR",
+            f"expected a non-negative number, got {factor!r}",
+        )
+        products[name] = ProductSpec(
+            name=name,
+            protein_per_1000l=factor,
+            thawing=thawing,
+            lines=tuple(compile_line(li, name) for li in lines_list),
+        )
+
+    common_lines = {}
+    for name, line_ids in raw["Common_Lines"].items():
+        _check(isinstance(line_ids, list), f"Common_Lines {name!r}", "expected a list of line ids")
+        if name not in raw:
+            print(f"Lines.json: Common_Lines product {name!r} has no configuration.")
+        common_lines[name] = tuple(line_ids)
+
+    covers = {}
+    for key, cover in (raw.get("Covers") or {}).items():
+        _check(
+            isinstance(cover, list) and len(cover) == 2
+            and all(isinstance(v, (int, float)) for v in cover) and cover[0] <= cover[1],
+            f"Covers {key!r}", f"expected [min, max], got {cover!r}",
+        )
+        covers[key] = tuple(cover)
+
+    return LinesConfig(products=products, common_lines=common_lines, covers=covers, raw=raw)
+
+
+def read_config(path: str) -> LinesConfig:
+    """
+    Compiler of Lines.json: its content, validated and compiled.
+    """
+    return compile_config(Input_Snapshots.read_json(path))
+
+
+def load_config(path: str) -> LinesConfig:
+    """
+    The compiled Lines.json at path, through its snapshot: compiled again only
+    when the file changes.
+    """
+    return Input_Snapshots.load_snapshot(path, "lines_config", read_config)
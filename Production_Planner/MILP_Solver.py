@@ -1,9 +1,19 @@
+import hashlib
 import json
 import math
+import multiprocessing
+import os
+import sys
+import threading
+import time
 import uuid
 from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import date, datetime, timedelta
+from types import SimpleNamespace
 from ortools.sat.python import cp_model
+import Lines_Config
+import Model_Profiler
 import pandas as pd
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
@@ -13,9 +23,55 @@ SHELF_LIFE = 24  # Shelf life in months
 DAYS_PER_MONTH = 30
 TOTAL_MONTHS = None
 BASE_DATE_FOR_PLANNING = None
+STOP_EVENT = None  # Event that ends running solves early, keeping their best solution
+SOLVE_STATS: list[dict] = []  # Telemetry of every solve of the current plan (see solve_model)
 MAX_RUNS = 100  # Maximum number of production runs per product
+NEGATIVE_BOUND = -180  # Earliest day a run may start (extended schedule before day 0)
+LOT_SIZING_TIME_LIMIT = 30  # Seconds for the aggregate phase of the two-phase engine
+STAGE_SCHEDULING_TIME_LIMIT = 120  # Seconds for the stage phase of the two-phase engine
+RC_TIME_LIMIT = 100  # Seconds for the AryoSeven_RC planner
+RC_NUM_WORKERS = 2  # Search workers for the AryoSeven_RC planner
+LINES_JSON_PATH = r"E:\Sherkat_DeepSpring_projects\Aryogen_Planning\Data\Lines.json"
+GREEDY_HINTS = True  # Hint a greedy plan onto the model when there is no saved plan
+WARM_START_DIR = r"E:\Sherkat_DeepSpring_projects\Aryogen_Planning\Data\warm_starts"  # Solved plans kept as hints
 bigM = 1_000_000
 
+# Solver profiles, selected per request (PlanPayload.solverProfile). The time
+# limit caps every solve (the phases of the two-phase engine and the RC planner
+# keep their own, shorter limits); the worker count is per model.
+SOLVER_PROFILES_PATH = r"E:\Sherkat_DeepSpring_projects\Aryogen_Planning\Data\solver_profiles.json"
+DEFAULT_SOLVER_PROFILE = "overnight-optimal"
+SOLVER_PROFILES = {
+    "interactive": {
+        "max_time_in_seconds": 20,
+        "num_workers": 8,
+        "relative_gap_limit": 0.05,
+        "presolve": True,
+        "probing_level": 0,
+        "symmetry_level": 2,
+        "log_search_progress": False,
+    },
+    "balanced": {
+        "max_time_in_seconds": 120,
+        "num_workers": 8,
+        "relative_gap_limit": 0.01,
+        "presolve": True,
+        "probing_level": 1,
+        "symmetry_level": 2,
+        "log_search_progress": False,
+    },
+    "overnight-optimal": {
+        "max_time_in_seconds": 1000,
+        "num_workers": 6,
+        "relative_gap_limit": 0.0,
+        "presolve": True,
+        "probing_level": 2,
+        "symmetry_level": 3,
+        "log_search_progress": True,
+    },
+}
+SOLVER_PROFILE = dict(SOLVER_PROFILES[DEFAULT_SOLVER_PROFILE])
+
 from datetime import datetime
 
 def parse_date_isoformat(date_str: str) -> datetime:
@@ -60,6 +116,64 @@ def set_base_date_for_planning(new_date: date):
     BASE_DATE_FOR_PLANNING = new_date
 
 
+def load_solver_profiles(path: str = None) -> dict[str, dict]:
+    """
+    The built-in SOLVER_PROFILES, updated from the JSON file at `path`
+    (SOLVER_PROFILES_PATH by default) if it exists.
+
+    The file maps profile names to parameters, e.g.
+        {"interactive": {"max_time_in_seconds": 10},
+         "weekend": {"base": "overnight-optimal", "max_time_in_seconds": 7200}}
+    An entry for a built-in profile overrides only the parameters it lists; a
+    new profile starts from "base" (default: DEFAULT_SOLVER_PROFILE).
+
+    Raises:
+        ValueError: for an unknown parameter or base profile.
+    """
+    profiles = {name: dict(params) for name, params in SOLVER_PROFILES.items()}
+    path = path or SOLVER_PROFILES_PATH
+    if not os.path.exists(path):
+        return profiles
+    with open(path, "r") as f:
+        overrides = json.load(f)
+
+    allowed = set(SOLVER_PROFILES[DEFAULT_SOLVER_PROFILE])
+    for name, params in overrides.items():
+        params = dict(params)
+        base = params.pop("base", name if name in profiles else DEFAULT_SOLVER_PROFILE)
+        if base not in profiles:
+            raise ValueError(f"Solver profile '{name}' is based on unknown profile '{base}'")
+        unknown = set(params) - allowed
+        if unknown:
+            raise ValueError(f"Unknown parameters {sorted(unknown)} in solver profile '{name}'")
+        profiles[name] = {**profiles[base], **params}
+    return profiles
+
+
+def set_solver_profile(name: str = None, profiles: dict = None):
+    """
+    Sets the global SOLVER_PROFILE to the named profile (DEFAULT_SOLVER_PROFILE
+    if name is None) from `profiles` (load_solver_profiles() by default).
+
+    Raises:
+        ValueError: if there is no profile with that name.
+    """
+    global SOLVER_PROFILE
+    profiles = profiles if profiles is not None else load_solver_profiles()
+    name = name or DEFAULT_SOLVER_PROFILE
+    if name not in profiles:
+        raise ValueError(f"Unknown solver profile '{name}'; expected one of {sorted(profiles)}")
+    SOLVER_PROFILE = dict(profiles[name])
+
+
+def set_stop_event(event):
+    """
+    Sets the global STOP_EVENT (a threading or multiprocessing Event, or None).
+    """
+    global STOP_EVENT
+    STOP_EVENT = event
+
+
 def day_to_date(day_offset: int) -> str:
     """
     Convert a day offset to an ISO formatted date string, based on the global
@@ -76,32 +190,6 @@ def day_to_date(day_offset: int) -> str:
     return actual_date.isoformat()
 
 
-def parse_volume(br_name: str) -> float:
-    """
-    Parses the volume from a batch record name.
-
-    The function extracts the leading numeric characters from the batch record name,
-    which are assumed to represent the volume. The batch record name is expected to
-    have the format where the volume is the first part of the string, separated by a
-    hyphen.
-
-    Args:
-        br_name (str): The batch record name from which to extract the volume.
-
-    Returns:
-        float: The extracted volume as a float. Returns 0.0 if no numeric characters
-               are found at the beginning of the batch record name.
-
-    """
-    chunk = br_name.split("-")[0]
-    digits = ""
-    for ch in chunk:
-        if ch.isdigit():
-            digits += ch
-        else:
-            break
-    return float(digits) if digits else 0.0
-
 def build_solver_inputs_from_payload(
     busyLines: list,
     selectedDate: str
@@ -135,11 +223,692 @@ def build_solver_inputs_from_payload(
         day_offset = (finish_date - base_date).days
         
         lineBusyUntil[l_id] = day_offset
-    
+
     return lineBusyUntil
 
+
+def compute_run_bounds(
+    demand: dict[str, dict],
+    product_lines: dict[str, dict],
+    product_factor: dict[str, float],
+    line_final_vol: dict[tuple[str, int], float],
+    products_inventory_protein: dict,
+    lineBusyUntil: dict,
+    earliest_start: int,
+) -> dict[str, tuple[int, int]]:
+    """
+    Pre-solve sizing stage: the minimum and maximum useful number of runs per product.
+
+    - min runs: the total minimum demand over the horizon, net of the opening stock,
+      divided by the best per-run yield. Netting the stock only makes the bound weaker,
+      so it stays valid even though the monthly demand rows are covered from runs.
+    - max runs: every month m can use at most ceil(max_req_m / smallest yield) runs,
+      and no line can start more runs than fit between its free day and the start of
+      the last month, spaced by its longest single-resource stage.
+
+    The yield of a run on line l is floor(line_final_vol * Protein_per_1000L_BR / 1000)
+    grams, matching produced_protein_int in build_schedule_with_inventory.
+
+    Returns:
+        { product: (min_runs, max_runs), ... }
+    """
+    last_finish = (TOTAL_MONTHS - 1) * DAYS_PER_MONTH
+    bounds: dict[str, tuple[int, int]] = {}
+    for p, lines_dict in product_lines.items():
+        f_int = int(round(product_factor[p]))
+        yields = [
+            int(line_final_vol[(p, l_id)]) * f_int // 1000 for l_id in lines_dict
+        ]
+        yields = [y for y in yields if y > 0]
+        month_ranges = demand.get(p, {})
+        if not yields:
+            bounds[p] = (0, 0)
+            continue
+
+        total_min = sum(int(min_req) for min_req, _ in month_ranges.values())
+        net_min = max(0, total_min - int(products_inventory_protein.get(p, 0)))
+        min_runs = math.ceil(net_min / max(yields))
+
+        demand_cap = sum(
+            math.ceil(int(max_req) / min(yields))
+            for _, max_req in month_ranges.values()
+        )
+
+        capacity_cap = 0
+        for l_id, line in lines_dict.items():
+            durations = [br.days for br in line.brs]
+            spacing = max([d - 1 for d in durations] + [0])
+            first_start = max(earliest_start, lineBusyUntil.get(l_id, earliest_start))
+            if first_start > last_finish:
+                continue
+            if spacing <= 0:
+                capacity_cap = demand_cap
+                break
+            capacity_cap += (last_finish - first_start) // spacing + 1
+
+        bounds[p] = (min_runs, min(demand_cap, capacity_cap, MAX_RUNS))
+    return bounds
+
+
+def first_servable_month(finish_day: int) -> int:
+    """
+    First month a run finishing on finish_day can supply: the first month that
+    starts after it (month m starts on day (m - 1) * DAYS_PER_MONTH + 1).
+    """
+    return -(-finish_day // DAYS_PER_MONTH) + 1
+
+
+def compute_variable_domains(
+    demand: dict[str, dict],
+    product_lines: dict[str, dict],
+    product_factor: dict[str, float],
+    line_final_vol: dict[tuple[str, int], float],
+    products_inventory_protein: dict,
+    earliest_start: int,
+) -> dict:
+    """
+    Derive tight variable domains from the horizon, line yields and demand ranges,
+    in place of the bigM / 50000 constants.
+
+    - days: a run can only supply months that start after it finishes, so a used
+      run has to finish by the start of the last month; nothing starts before
+      earliest_start (the extended schedule before day 0).
+    - liters / protein: the largest harvest (and its yield) over the active lines.
+    - demand: the month's max demand bounds what is delivered in that month.
+    - usage: one run can deliver at most its yield and at most the month's max demand.
+    - earliness: month_start - finish, with finish >= earliest_start.
+    - first_month: the first month a run finishing between earliest_start and
+      last_finish can supply.
+    - inventory: opening stock plus everything that can be delivered in the horizon.
+
+    Returns:
+        {
+          "last_finish": int,
+          "liters":    { product: int },
+          "protein":   { product: int },
+          "demand":    { (product, month): int },
+          "usage":     { (product, month): int },
+          "earliness": { month: int },
+          "first_month": (int, int),
+          "inventory": { product: int },
+        }
+    """
+    last_finish = (TOTAL_MONTHS - 1) * DAYS_PER_MONTH
+    liters: dict[str, int] = {}
+    protein: dict[str, int] = {}
+    month_demand: dict[tuple[str, int], int] = {}
+    usage: dict[tuple[str, int], int] = {}
+    inventory: dict[str, int] = {}
+    for p, lines_dict in product_lines.items():
+        f_int = int(round(product_factor[p]))
+        vols = [int(line_final_vol[(p, l_id)]) for l_id in lines_dict]
+        liters[p] = max(vols + [0])
+        protein[p] = liters[p] * f_int // 1000
+        month_ranges = demand.get(p, {})
+        for m in range(1, TOTAL_MONTHS + 1):
+            month_demand[(p, m)] = int(month_ranges.get(m, (0, 0))[1])
+            usage[(p, m)] = min(protein[p], month_demand[(p, m)])
+        inventory[p] = int(products_inventory_protein.get(p, 0)) + sum(
+            int(max_req) for _, max_req in month_ranges.values()
+        )
+    earliness = {
+        m: (m - 1) * DAYS_PER_MONTH + 1 - earliest_start
+        for m in range(1, TOTAL_MONTHS + 1)
+    }
+    return {
+        "last_finish": last_finish,
+        "liters": liters,
+        "protein": protein,
+        "demand": month_demand,
+        "usage": usage,
+        "earliness": earliness,
+        "first_month": (
+            first_servable_month(earliest_start), first_servable_month(last_finish)
+        ),
+        "inventory": inventory,
+    }
+
+
+def compile_line_recipe(thawing: int, line: Lines_Config.LineSpec) -> dict:
+    """
+    Compile one (product, line) of Lines.json into a stage template.
+
+    Every stage of a run is tied to the previous one by a fixed offset (BR
+    Overlaps, Harvest, Hold, Mabs, SS's and Follow_Up_* stages), so a run is one
+    start day plus constants. The only free gap is between two BRs without an
+    Overlaps entry ("next starts on or after previous end"); it starts a new
+    segment with its own start day.
+
+    Returns a dict with:
+        stages:     [(kind, key, resource, segment, offset, size), ...]
+                    kind is "chain", "harvest", "hold", "mab", "ss" or "fu"; key
+                    is the stage key (0 = thawing, i = i-th BR) or
+                    (stage_key, mab_idx / ss_idx / fu_name); the stage ends at
+                    offset + size.
+        links:      [(seg_a, end_offset_a, seg_b, start_offset_b), ...] meaning
+                    start(seg_b) + start_offset_b >= start(seg_a) + end_offset_a.
+        n_segments: number of independent start days (1 for a rigid recipe).
+        finish:     [(segment, offset), ...] the run finish is the max of these.
+        feasible:   False if the recipe contradicts itself (a "Full" follow-up
+                    overlap on a stage longer than one day), so the line can
+                    never be used.
+    """
+    stages = []
+    links = []
+    feasible = True
+    ends = []  # (segment, offset) of every stage that counts toward the finish
+
+    def add(kind, key, resource, seg, offset, size, counts=True):
+        stages.append((kind, key, resource, seg, offset, size))
+        if counts:
+            ends.append((seg, offset + size))
+        return offset + size
+
+    seg = 0
+    prev_end = add("chain", 0, "CellThawing & SF", seg, 0, thawing - 1, counts=False)
+
+    chain_end = None
+    for i, br in enumerate(line.brs):
+        stage_key = i + 1
+        brn = br.name
+        size = br.days - 1
+        if i == 0:
+            start = prev_end
+        elif br.overlap is not None:
+            if br.overlap == "Full":
+                start = prev_end - size
+            else:
+                start = prev_end - br.overlap + 1
+        else:
+            links.append((seg, prev_end, seg + 1, 0))
+            seg += 1
+            start = 0
+        en = add("chain", stage_key, brn, seg, start, size, counts=False)
+        prev_end = chain_end = en
+
+        if not br.harvested:
+            continue
+        harv_en = add("harvest", stage_key, f"Harvest {brn}", seg, en + 1, 0)
+
+        hold_en = None
+        if line.hold:
+            hold_en = add("hold", stage_key, f"Hold {brn}", seg, harv_en + 1, 0)
+        ref = hold_en if hold_en is not None else en + 1
+
+        side_ends = []
+        mab_en = None
+        for mab_idx in range(1, br.mabs + 1):
+            mab_st = ref if mab_idx == 1 else mab_en + 1
+            mab_en = add(
+                "mab", (stage_key, mab_idx), f"Mab {brn} {mab_idx}", seg, mab_st, 0
+            )
+            side_ends.append(mab_en)
+        sss_en = None
+        for sss_idx in range(1, br.sss + 1):
+            sss_st = ref if sss_idx == 1 else sss_en + 1
+            # SS's are reported with the Mabs but do not count toward the finish.
+            sss_en = add(
+                "ss",
+                (stage_key, sss_idx),
+                f"SS's {brn} {sss_idx}",
+                seg,
+                sss_st,
+                0,
+                counts=False,
+            )
+            side_ends.append(sss_en)
+
+        if br.follow_up is None:
+            continue
+        if not side_ends:
+            raise KeyError(f"No Mab or SS stage found for (l_id, stage_key): {(line.id, stage_key)}")
+        fu_prev_end = max(side_ends) + 2
+
+        fu_days = {fu.name: fu.days for fu in br.follow_up}
+        fu_starts: dict[str, int] = {}
+        fu_ends: dict[str, int] = {}
+        for fu in br.follow_up:
+            if fu.group is not None:
+                assigned_start = next(
+                    (fu_starts[stg] for stg in fu.group if stg in fu_starts),
+                    fu_prev_end,
+                )
+                for stg in fu.group:
+                    if stg not in fu_starts:
+                        fu_starts[stg] = assigned_start
+                        fu_ends[stg] = add(
+                            "fu",
+                            (stage_key, stg),
+                            f"FU {brn} {stg}",
+                            seg,
+                            assigned_start,
+                            fu_days[stg] - 1,
+                        )
+                fu_prev_end = max(fu_ends[stg] for stg in fu.group) + 1
+                continue
+
+            if fu.skip:
+                continue
+            if fu.restart_after is not None:
+                fu_prev_end = fu_ends[fu.restart_after] + 1
+
+            size = fu.days - 1
+            if fu.overlap is not None and fu.overlap != "Full":
+                fu_st = fu_prev_end - fu.overlap
+            else:
+                fu_st = fu_prev_end
+                if fu.overlap == "Full" and size != 0:
+                    # "Full" pins the end to the previous end as well.
+                    feasible = False
+            fu_starts[fu.name] = fu_st
+            fu_ends[fu.name] = add(
+                "fu", (stage_key, fu.name), f"FU {brn} {fu.name}", seg, fu_st, size
+            )
+            fu_prev_end = fu_ends[fu.name] + 1
+
+    ends.append((seg, chain_end if chain_end is not None else prev_end))
+    finish: dict[int, int] = {}
+    for s, off in ends:
+        finish[s] = max(finish.get(s, off), off)
+
+    return {
+        "stages": stages,
+        "links": links,
+        "n_segments": seg + 1,
+        "finish": sorted(finish.items()),
+        "feasible": feasible,
+    }
+
+
+def compile_recipes(
+    config: Lines_Config.LinesConfig, products: list, product_lines: dict[str, dict]
+) -> dict[tuple[str, int], dict]:
+    """
+    Compile every active (product, line) recipe once per model build.
+    """
+    recipes = {}
+    for p in products:
+        thawing = config.products[p].thawing
+        for l_id, line in product_lines[p].items():
+            recipes[(p, l_id)] = compile_line_recipe(thawing, line)
+    return recipes
+
+
+def _segment_distances(recipe: dict, source: int) -> dict[int, int]:
+    """
+    Least number of days from the start of segment `source` to the start of
+    every segment the links force after it.
+    """
+    dist = {source: 0}
+    for _ in range(recipe["n_segments"]):
+        for seg_a, end_a, seg_b, start_b in recipe["links"]:
+            if seg_a in dist:
+                d = dist[seg_a] + end_a - start_b
+                dist[seg_b] = max(dist.get(seg_b, d), d)
+    return dist
+
+
+def stage_start_bounds(inputs: dict, p: str, l_id) -> list[tuple[int, int, int]]:
+    """
+    Per stage of a run of product p on line l_id: the earliest day it can start
+    (NEGATIVE_BOUND, lineBusyUntil and the recipe offsets), the least number of
+    days from its start to the run finish, and its size.
+    """
+    recipe = inputs["recipes"][(p, l_id)]
+    seg_lo = {}
+    for k in range(recipe["n_segments"]):
+        seg_lo[k] = NEGATIVE_BOUND - min(st[4] for st in recipe["stages"] if st[3] == k)
+    seg_lo[0] = max(seg_lo[0], inputs["lineBusyUntil"].get(l_id, seg_lo[0]))
+    from_first = _segment_distances(recipe, 0)
+    bounds = []
+    for _, _, _, seg, offset, size in recipe["stages"]:
+        dist = _segment_distances(recipe, seg)
+        to_finish = max(dist[s] + off for s, off in recipe["finish"] if s in dist)
+        earliest = seg_lo[seg]
+        if seg in from_first:
+            earliest = max(earliest, seg_lo[0] + from_first[seg])
+        bounds.append((earliest + offset, to_finish - offset, size))
+    return bounds
+
+
+def compute_run_reach(
+    inputs: dict, n_runs: dict[str, int], ordered: bool = False
+) -> dict[tuple[str, int], int]:
+    """
+    First month each run slot can supply, from the earliest day a run can
+    finish on any of the product's lines (busy lines, NEGATIVE_BOUND and the
+    recipe durations). Months before it get no usage variables.
+
+    With ordered run slots (add_run_symmetry_breaking), slot r is the (r+1)-th
+    run of its product to finish, so it can finish no earlier than the
+    (r+1)-th earliest finish over the lines; on one line, the k-th run finishes
+    at least (k - 1) times the size of each of its stages after the first.
+
+    Returns:
+        {(product, run): month}; TOTAL_MONTHS + 1 when the slot can supply no
+        month of the horizon.
+    """
+    reach = {}
+    for p in inputs["products"]:
+        finishes = []  # earliest finish of the k-th run, over every line
+        for l_id in inputs["product_lines"][p]:
+            if not inputs["recipes"][(p, l_id)]["feasible"]:
+                continue
+            bounds = stage_start_bounds(inputs, p, l_id)
+            for k in range(n_runs[p] if ordered else 1):
+                finishes.append(
+                    max(earliest + to_finish + k * size for earliest, to_finish, size in bounds)
+                )
+        finishes.sort()
+        for r in range(n_runs[p]):
+            if not finishes:
+                reach[(p, r)] = TOTAL_MONTHS + 1
+                continue
+            day = finishes[r] if ordered else finishes[0]
+            reach[(p, r)] = min(TOTAL_MONTHS + 1, max(1, first_servable_month(day)))
+    return reach
+
+
+def compute_capacity_shortfall(
+    inputs: dict, demand: dict[str, dict], products_inventory_protein: dict
+) -> dict[str, dict[int, dict]]:
+    """
+    Analytic feasibility pre-check, run before the CP-SAT model is built.
+
+    A run serves month m only if it finishes by the start of the month. On one
+    line, the stage intervals of a resource never overlap, so the starts of
+    that stage in two runs are at least its size apart; with the earliest day
+    the stage can start (NEGATIVE_BOUND, lineBusyUntil and the recipe offsets)
+    and the least time from it to the run finish, this bounds the number of
+    runs a line can finish by any day. Every product is given every line to
+    itself, so the bound holds whatever the other products do.
+
+    Deliverable protein up to month m is then at most the opening stock plus
+    those runs times the line yield; the minimum demand of months 1..m must
+    fit in it.
+
+    Args:
+        inputs: collect_planning_inputs for the demand.
+        demand: {product: {month: (min_req, max_req)}}
+        products_inventory_protein: opening stock per product.
+    Returns:
+        {product: {month: {"demand_min", "deliverable_max", "shortfall"}}}, all
+        cumulative over months 1..m, for the months whose minimum demand cannot
+        be met; empty when no product is clearly infeasible.
+    """
+    report: dict[str, dict[int, dict]] = {}
+    for p in inputs["products"]:
+        f_int = int(round(inputs["product_factor"][p]))
+        # Per line: its yield and, per resource stage, (earliest stage start,
+        # least days from stage start to finish, stage size).
+        line_stages = []
+        for l_id in inputs["product_lines"][p]:
+            recipe = inputs["recipes"][(p, l_id)]
+            run_yield = int(inputs["line_final_vol"][(p, l_id)]) * f_int // 1000
+            if not recipe["feasible"] or run_yield <= 0:
+                continue
+            # A zero-size interval never conflicts.
+            stages = [st for st in stage_start_bounds(inputs, p, l_id) if st[2] > 0]
+            if not stages:
+                break  # runs on this line are not bounded: skip the product
+            line_stages.append((run_yield, stages))
+        else:
+            stock = int(products_inventory_protein.get(p, 0))
+            cum_min = 0
+            for m in range(1, TOTAL_MONTHS + 1):
+                cum_min += int(demand.get(p, {}).get(m, (0, 0))[0])
+                deadline = (m - 1) * DAYS_PER_MONTH
+                deliverable = stock
+                for run_yield, stages in line_stages:
+                    runs = min(
+                        max(0, (deadline - to_finish - earliest) // size + 1)
+                        for earliest, to_finish, size in stages
+                    )
+                    deliverable += runs * run_yield
+                if cum_min > deliverable:
+                    report.setdefault(p, {})[m] = {
+                        "demand_min": cum_min,
+                        "deliverable_max": deliverable,
+                        "shortfall": cum_min - deliverable,
+                    }
+    return report
+
+
+def unmet_minimum_demand(
+    demand: dict[str, dict], chosen: dict[str, dict[int, int]]
+) -> dict[str, dict[int, dict]]:
+    """
+    Months in which a plan delivers less than the minimum demand.
+
+    The CP-SAT models never do, but build_schedule_greedy (the greedy engine
+    and the fallback when CP-SAT stops without a solution) delivers what fits
+    on the lines.
+
+    Args:
+        demand: {product: {month: (min_req, max_req)}}
+        chosen: the chosen demand of the plan, {product: {month: delivered}};
+            products it leaves out are not checked.
+    Returns:
+        {product: {month: {"demand_min", "delivered", "shortfall"}}}; empty
+        when every minimum is met.
+    """
+    report: dict[str, dict[int, dict]] = {}
+    for p, delivered in chosen.items():
+        for m, (min_req, _) in demand.get(p, {}).items():
+            got = delivered.get(m, 0)
+            if got < int(min_req):
+                report.setdefault(p, {})[m] = {
+                    "demand_min": int(min_req),
+                    "delivered": got,
+                    "shortfall": int(min_req) - got,
+                }
+    return report
+
+
+def add_run_symmetry_breaking(
+    model: cp_model.CpModel,
+    products: list,
+    product_lines: dict[str, dict],
+    n_runs: dict[str, int],
+    activate_run: dict,
+    use_line: dict,
+    finish_time: dict,
+    stage_vars: dict,
+):
+    """
+    Order the interchangeable run slots of each product:
+
+      - activated runs fill the lowest indices,
+      - finish times are non-decreasing over the activated runs,
+      - two runs of the product on the same line start thawing in index order.
+
+    Every plan can be relabelled to satisfy these, so no solution is lost.
+    """
+    for p in products:
+        for r in range(n_runs[p] - 1):
+            model.Add(activate_run[(p, r)] >= activate_run[(p, r + 1)])
+            model.Add(finish_time[(p, r)] <= finish_time[(p, r + 1)]).OnlyEnforceIf(
+                activate_run[(p, r + 1)]
+            )
+        for l_id in product_lines[p]:
+            for r in range(n_runs[p]):
+                for r2 in range(r + 1, n_runs[p]):
+                    model.Add(
+                        stage_vars[(p, r, l_id)][0]["start"]
+                        <= stage_vars[(p, r2, l_id)][0]["start"]
+                    ).OnlyEnforceIf([use_line[(p, r, l_id)], use_line[(p, r2, l_id)]])
+
+
+def warm_start_key(products: list, payload) -> str:
+    """
+    Key under which a solved plan is kept: the planned products and the horizon
+    (selectedDate, monthsCount). Demand, stock and busy lines are left out, so a
+    resubmitted payload with edited quantities still finds the previous plan.
+    """
+    raw = json.dumps(
+        {
+            "products": sorted(products),
+            "selectedDate": payload.selectedDate,
+            "monthsCount": payload.monthsCount,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def warm_start_from_plan(final_plan: list[dict]) -> dict[str, list[dict]]:
+    """
+    The assignments of a plan that add_warm_start_hints hints: per product, in
+    run order, the line, the thawing start day and the usage per month.
+    """
+    plan: dict[str, list[dict]] = {}
+    for run in sorted(final_plan, key=lambda x: (x["product"], x["run_index"])):
+        if run["line_used"] is None or not run["br_stages"]:
+            continue
+        plan.setdefault(run["product"], []).append(
+            {
+                "line": run["line_used"],
+                "thaw_start": run["br_stages"][0]["start_day"],
+                "usage": run["monthly_usage"],
+            }
+        )
+    return plan
+
+
+def save_warm_start(key: str, final_plan: list[dict]):
+    """
+    Keep the assignments of a solved plan (warm_start_from_plan) for the next
+    solve with the same key. Written to a temporary file of this process first,
+    so a concurrent job or load_warm_start never sees half a file.
+    """
+    os.makedirs(WARM_START_DIR, exist_ok=True)
+    path = os.path.join(WARM_START_DIR, f"{key}.json")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(warm_start_from_plan(final_plan), f)
+    os.replace(tmp_path, path)
+
+
+def load_warm_start(key: str) -> dict[str, list[dict]]:
+    """
+    Read the plan saved by save_warm_start, or None if there is none.
+    """
+    path = os.path.join(WARM_START_DIR, f"{key}.json")
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r") as f:
+            plan = json.load(f)
+    except (OSError, ValueError):
+        print("Ignoring unreadable warm start", path)
+        return None
+    for runs in plan.values():
+        for run in runs:
+            run["usage"] = {int(m): q for m, q in run["usage"].items()}
+    return plan
+
+
+def add_warm_start_hints(
+    model: cp_model.CpModel,
+    warm_start: dict[str, list[dict]],
+    products: list,
+    product_lines: dict[str, dict],
+    n_runs: dict[str, int],
+    activate_run: dict,
+    use_line: dict,
+    thaw_start: dict,
+    usage: dict,
+    usage_hi: dict,
+) -> dict:
+    """
+    Hint a saved plan (see save_warm_start) onto a new model.
+
+    The k-th saved run of a product is mapped onto run slot k: activation, its
+    line, its thawing start and its usage in every month. Slots past the saved
+    runs are hinted inactive. A saved run is dropped when its line is not usable
+    in the new model or its thawing start is outside the line's start window
+    (thaw_start[(p, r, l_id)] = (var, lo, hi)); so are saved runs beyond the
+    product's slots. Usages above their new upper bound (usage_hi[(p, r, m)],
+    e.g. after the demand went down) or outside the horizon are clipped.
+
+    Returns:
+        {"status", "hinted_runs", "clipped_runs", "dropped_runs",
+        "missing_products"} where status is "complete" (the saved plan hinted
+        unchanged onto every slot), "partial" or "rejected" (nothing hinted).
+    """
+    hinted = 0
+    clipped = 0
+    dropped = 0
+    missing = []
+    for p in products:
+        saved = warm_start.get(p)
+        if saved is None:
+            missing.append(p)
+            continue
+        dropped += max(0, len(saved) - n_runs[p])
+        for r in range(n_runs[p]):
+            if r >= len(saved):
+                model.AddHint(activate_run[(p, r)], 0)
+                for l_id in product_lines[p]:
+                    model.AddHint(use_line[(p, r, l_id)], 0)
+                continue
+
+            run = saved[r]
+            bounds = thaw_start.get((p, r, run["line"]))
+            if bounds is None or not bounds[1] <= run["thaw_start"] <= bounds[2]:
+                dropped += 1
+                continue
+
+            model.AddHint(activate_run[(p, r)], 1)
+            for l_id in product_lines[p]:
+                model.AddHint(use_line[(p, r, l_id)], l_id == run["line"])
+            model.AddHint(bounds[0], run["thaw_start"])
+            was_clipped = any(m > TOTAL_MONTHS for m in run["usage"])
+            for m in range(1, TOTAL_MONTHS + 1):
+                q = run["usage"].get(m, 0)
+                if q > usage_hi[(p, r, m)]:
+                    q = usage_hi[(p, r, m)]
+                    was_clipped = True
+                if usage_hi[(p, r, m)] > 0:  # months out of reach have no variable
+                    model.AddHint(usage[(p, r, m)], q)
+            hinted += 1
+            clipped += was_clipped
+
+    if hinted == 0:
+        status = "rejected"
+    elif clipped or dropped or missing:
+        status = "partial"
+    else:
+        status = "complete"
+    return {
+        "status": status,
+        "hinted_runs": hinted,
+        "clipped_runs": clipped,
+        "dropped_runs": dropped,
+        "missing_products": missing,
+    }
+
+
+def merge_warm_start_reports(reports: list[dict]) -> dict:
+    """
+    Combine the warm-start reports of separately solved models into one.
+    """
+    statuses = {r["status"] for r in reports}
+    status = statuses.pop() if len(statuses) == 1 else "partial"
+    sources = {r["source"] for r in reports if "source" in r}
+    merged = {} if not sources else {"source": sources.pop() if len(sources) == 1 else "mixed"}
+    return {
+        "status": status,
+        "hinted_runs": sum(r.get("hinted_runs", 0) for r in reports),
+        "clipped_runs": sum(r.get("clipped_runs", 0) for r in reports),
+        "dropped_runs": sum(r.get("dropped_runs", 0) for r in reports),
+        "missing_products": [p for r in reports for p in r.get("missing_products", [])],
+        **merged,
+    }
+
+
 # --- NEW CODE: A specialized planner for AryoSeven_RC ---
-def build_schedule_for_AryoSevenRC(data: dict, demand: dict[str, dict]):
+def build_schedule_for_AryoSevenRC(data: Lines_Config.LinesConfig, demand: dict[str, dict]):
     """
     A separate planner that handles AryoSeven_RC production,
     because it uses 'TFs' instead of 'BRs', and yields a fixed 3.3 grams per run
@@ -156,7 +925,7 @@ def build_schedule_for_AryoSevenRC(data: dict, demand: dict[str, dict]):
         print("No AryoSeven_RC demand. Skipping specialized RC planner.")
         return [], {}
 
-    rc_conf_list = data.get("AryoSeven_RC")  # e.g. [base_conf, {lines: [...]}]
+    rc_conf_list = data.raw.get("AryoSeven_RC")  # e.g. [base_conf, {lines: [...]}]
     if not rc_conf_list or len(rc_conf_list) < 2:
         print("Incomplete config for AryoSeven_RC in Lines.json.")
         return [], {}
@@ -196,11 +965,13 @@ def build_schedule_for_AryoSevenRC(data: dict, demand: dict[str, dict]):
     run_duration = cell_thaw_time + total_tf_time
 
 
+    # A run can only supply months it finishes in, so days stay inside the horizon.
+    horizon_end = TOTAL_MONTHS * DAYS_PER_MONTH
     start_vars = {}    # Dictionary to hold independent start times
     for r in range(MAX_RUNS):
         use_run[r] = model.NewBoolVar(f"run_aryoSevenRC_{r}")
-        start_vars[r] = model.NewIntVar(0, bigM, f"start_aryoSevenRC_{r}")
-        finish_time[r] = model.NewIntVar(0, bigM, f"fin_aryoSevenRC_{r}")
+        start_vars[r] = model.NewIntVar(0, horizon_end, f"start_aryoSevenRC_{r}")
+        finish_time[r] = model.NewIntVar(0, horizon_end, f"fin_aryoSevenRC_{r}")
         # If a run is used, finish_time is set relative to its start
         model.Add(finish_time[r] == start_vars[r] + run_duration - 1).OnlyEnforceIf(use_run[r])
         # Otherwise, you can fix start and finish to 0 if not used.
@@ -235,11 +1006,13 @@ def build_schedule_for_AryoSevenRC(data: dict, demand: dict[str, dict]):
         # model.Add(produced_protein_run[r] == 0).OnlyEnforceIf(use_run[r].Not())
 
         # expiration day => finish_time[r] + SHELF_LIFE_RC * 30
-        expiration_date[r] = model.NewIntVar(0, bigM, f"exp_run_{r}")
+        expiration_date[r] = model.NewIntVar(
+            0, horizon_end + SHELF_LIFE_RC * 30, f"exp_run_{r}"
+        )
         model.Add(expiration_date[r] == finish_time[r] + SHELF_LIFE_RC * 30)
 
         for m in range(1, TOTAL_MONTHS + 1):
-            usage[(r, m)] = model.NewIntVar(0, bigM, f"usage_{r}_{m}")
+            usage[(r, m)] = model.NewIntVar(0, 4, f"usage_{r}_{m}")
             isValid[(r, m)] = model.NewBoolVar(f"isValid_{r}_{m}")
 
     # Sum usage <= produced
@@ -267,11 +1040,11 @@ def build_schedule_for_AryoSevenRC(data: dict, demand: dict[str, dict]):
             model.Add(F <= month_end).OnlyEnforceIf(valid)
             model.Add(E > month_start).OnlyEnforceIf(valid)
             # usage zero if not valid
-            model.Add(usage[(r, m)] <= bigM * valid)
+            model.Add(usage[(r, m)] <= 4 * valid)
 
     # Minimization: keep it consistent with your logic, or simpler
     # e.g. minimize max finish_time plus sum of active runs
-    max_finish = model.NewIntVar(0, bigM, "max_finish_rc")
+    max_finish = model.NewIntVar(0, horizon_end, "max_finish_rc")
     model.AddMaxEquality(max_finish, [finish_time[r] for r in range(MAX_RUNS)])
     total_runs = model.NewIntVar(0, MAX_RUNS, "total_runs")
     model.Add(total_runs == sum(use_run[r] for r in range(MAX_RUNS)))
@@ -280,10 +1053,8 @@ def build_schedule_for_AryoSevenRC(data: dict, demand: dict[str, dict]):
     model.Minimize(max_finish + 1000 * total_runs)
 
     solver = cp_model.CpSolver()
-    solver.parameters.log_search_progress = True
-    solver.parameters.max_time_in_seconds = 100.0
-    solver.parameters.num_search_workers = 2
-    status = solver.Solve(model)
+    configure_solver(solver, RC_TIME_LIMIT, RC_NUM_WORKERS)
+    status = solve_model(solver, model, phase="rc")
     if status not in [cp_model.OPTIMAL, cp_model.FEASIBLE]:
         print("No feasible solution for AryoSeven_RC.")
         return [], {}
@@ -334,678 +1105,240 @@ def build_schedule_for_AryoSevenRC(data: dict, demand: dict[str, dict]):
     return final_plan_RC, inv_traj_RC
 
 
-def build_schedule_with_inventory(
-    data: dict[str, dict],
+def collect_planning_inputs(
+    data: Lines_Config.LinesConfig,
     demand: dict[str, dict],
     products_inventory_protein,
     payload,
-    x,y
-):
-    model = cp_model.CpModel()
+) -> dict:
+    """
+    Gather everything both the monolithic and the two-phase models need from
+    the compiled Lines.json and the payload: active lines, protein factors,
+    line busy days, harvest volumes, run-count bounds and compiled recipes.
 
-    print("\nProduct Inventory Entered By User =>",products_inventory_protein)
+    Returns:
+        A dict with products, product_lines ({product: {l_id: LineSpec}}),
+        product_factor, lineBusyUntil, line_final_vol, run_bounds and recipes,
+        or None if no product has demand.
+    """
     # 1) Filter relevant products
-    all_prods = list(data["Common_Lines"].keys())
-    products = [p for p in all_prods if p in demand]
+    products = [p for p in data.common_lines if p in demand]
     if not products:
         print("No matching products. Exiting.")
-        return [], {}
+        return None
 
     # 2) Gather product parameters
     product_lines: dict[str, dict] = {}
     product_factor: dict[str, float] = {}
-    product_harvest: dict[str, int] = {}
-    base_configs: dict[str, dict] = {}
     for p in products:
-        conf_list = data[p]  # e.g., [base_conf, {"lines": [...]}]
-        base_conf = conf_list[0]
-        base_configs[p] = base_conf
-        lines_conf = conf_list[1]
-        factor = base_conf.get("Protein_per_1000L_BR", 0.0)
-        harvest = base_conf.get("Harvest", 0)
-        if "lines" in lines_conf:
-            lines_list = lines_conf["lines"]
-        else:
-            lines_list = lines_conf.get("RC", [])
-        active_lines: dict[str, dict] = {}
-        for li in lines_list:
-            if li.get("status") == "active":
-                active_lines[li["id"]] = li
-        product_lines[p] = active_lines
-        product_factor[p] = factor
-        product_harvest[p] = harvest
+        product = data.products[p]
+        product_lines[p] = product.active_lines()
+        product_factor[p] = product.protein_per_1000l
+
+    lineBusyUntil = build_solver_inputs_from_payload(payload.busyLines, payload.selectedDate)
+
+    # Harvested volume per (product, line), needed by the sizing stage below.
+    line_final_vol: dict[tuple[str, str], float] = {}
+    for p in products:
+        for l_id, line in product_lines[p].items():
+            line_final_vol[(p, l_id)] = line.final_volume
+
+    # Pre-solve sizing: only allocate the run slots that can ever be useful.
+    run_bounds = compute_run_bounds(
+        demand,
+        product_lines,
+        product_factor,
+        line_final_vol,
+        products_inventory_protein,
+        lineBusyUntil,
+        NEGATIVE_BOUND,
+    )
+
+    # Compile every (product, line) recipe once; run slots only instantiate it.
+    recipes = compile_recipes(data, products, product_lines)
+
+    return {
+        "products": products,
+        "product_lines": product_lines,
+        "product_factor": product_factor,
+        "lineBusyUntil": lineBusyUntil,
+        "line_final_vol": line_final_vol,
+        "run_bounds": run_bounds,
+        "recipes": recipes,
+    }
+
+
+def build_inventory_model(
+    data: Lines_Config.LinesConfig,
+    demand: dict[str, dict],
+    products_inventory_protein,
+    payload,
+    symmetry_breaking: bool = False,
+    run_slots: int = None,
+    run_plan: dict = None,
+    warm_start: dict = None,
+    profile_model: bool = False,
+) -> dict:
+    """
+    Build the CP-SAT model for every product except AryoSeven_RC.
+
+    With symmetry_breaking=True, the interchangeable run slots of a product are
+    put in canonical order (see add_run_symmetry_breaking) so the search does not
+    revisit permutations of the same plan. run_slots fixes the number of run slots
+    per product instead of using the sizing stage (used by the benchmarks).
+    run_plan ({product: [(line_id, deadline_day, months), ...]}, from
+    solve_lot_sizing) restricts the model to those runs, each finishing by its
+    deadline and delivering only to its months, with its planned line as a hint
+    (lines stay free so stage conflicts the aggregate model cannot see are
+    resolved here); this is the stage phase of the two-phase engine.
+    warm_start (from load_warm_start) is hinted onto the run slots, see
+    add_warm_start_hints; it is ignored together with run_plan, which already
+    hints the lines.
+    profile_model=True tags every variable and constraint with the family that
+    creates it (Model_Profiler.ModelProfiler).
+
+    Returns:
+        A dict with the model and every variable family needed to read a solution
+        (see extract_inventory_plan), or None if no product has demand. Its
+        "warm_start" entry is the add_warm_start_hints report (None without hints)
+        and "profile" the per-family ModelProfiler report (None unless
+        profile_model).
+    """
+    build_started = time.perf_counter()
+    model = cp_model.CpModel()
+    profiler = Model_Profiler.ModelProfiler(model) if profile_model else None
+    profile = profiler or Model_Profiler.no_profile
+
+    print("\nProduct Inventory Entered By User =>",products_inventory_protein)
+    profile("inputs")
+    inputs = collect_planning_inputs(data, demand, products_inventory_protein, payload)
+    if inputs is None:
+        return None
+    products = inputs["products"]
+    product_lines = inputs["product_lines"]
+    product_factor = inputs["product_factor"]
+    lineBusyUntil = inputs["lineBusyUntil"]
+    line_final_vol = inputs["line_final_vol"]
+    run_bounds = inputs["run_bounds"]
+    recipes = inputs["recipes"]
 
     # 3) Decision variables for production runs
     activate_run: dict[tuple[str, int], cp_model.IntVar] = {}
     use_line: dict[tuple[str, int, str], cp_model.IntVar] = {}
-    stage_start: dict[
-        tuple[str, int, str, int], cp_model.IntVar
-    ] = {}  # (p, r, l_id, stage_key): chain stages (thawing and BR stages)
-    stage_end: dict[tuple[str, int, str, int], cp_model.IntVar] = {}
+    # Stage registry: stage_vars[(p, r, l_id)][stage_key] ->
+    #   {"start", "end", "harvest": (st, en), "hold": (st, en),
+    #    "mabs": [(st, en), ...], "sss": [(st, en), ...], "fu": {fu_name: (st, en)}}
+    # stage_key 0 is thawing, i is the i-th BR; harvest/hold exist only if scheduled.
+    stage_vars: dict[tuple[str, int, int], dict[int, dict]] = {}
     finish_time: dict[tuple[str, int], cp_model.IntVar] = {}
     resources: dict[tuple[str, str], list[cp_model.IntervalVar]] = {}
-    harvest_vars: dict[
-        tuple[str, int, str, int], tuple[cp_model.IntVar, cp_model.IntVar]
-    ] = {}  # (p, r, l_id, br_stage_key): (harv_st, harv_en)
-    hold_vars: dict[
-        tuple[str, int, str, int], tuple[cp_model.IntVar, cp_model.IntVar]
-    ] = {}  # (p, r, l_id, br_stage_key): (hold_st, hold_en)
-    mab_vars: dict[
-        tuple[str, int, str, int, int], tuple[cp_model.IntVar, cp_model.IntVar]
-    ] = {}  # (p, r, l_id, br_stage_key, mab_idx): (mab_st, mab_en)
-    fu_vars: dict[
-        tuple[str, int, str, int, str], tuple[cp_model.IntVar, cp_model.IntVar]
-    ] = {}  # (p, r, l_id, br_stage_key, fu_name): (fu_st, fu_en)
-    lineBusyUntil = build_solver_inputs_from_payload(payload.busyLines, payload.selectedDate)
-
-    
-    NEGATIVE_BOUND = -180
+    # (p, r, l_id) -> (thawing start var, lo, hi) for lines the run can use.
+    thaw_start: dict[tuple[str, int, int], tuple] = {}
+
+    n_runs = {p: run_bounds[p][1] for p in products}
+    if run_slots is not None:
+        n_runs = {p: run_slots for p in products}
+    if run_plan is not None:
+        n_runs = {p: len(run_plan.get(p, [])) for p in products}
+    print("Run slots per product (min, max) =>", run_bounds)
+
+    # Tight domains for every variable family, derived from the horizon and demand.
+    domains = compute_variable_domains(
+        demand,
+        product_lines,
+        product_factor,
+        line_final_vol,
+        products_inventory_protein,
+        NEGATIVE_BOUND,
+    )
+    last_finish = domains["last_finish"]
 
     for p in products:
         lines_dict = product_lines[p]
-        thawing = base_configs[p].get("Cell_Thawing & SF", 0)
-        for r in range(MAX_RUNS):
+        for r in range(n_runs[p]):
+            profile("runs")
             activate_run[(p, r)] = model.NewBoolVar(f"activate_{p}_{r}")
             for l_id in lines_dict:
                 use_line[(p, r, l_id)] = model.NewBoolVar(f"use_{p}_{r}_l{l_id}")
+                if run_plan is not None:
+                    model.AddHint(use_line[(p, r, l_id)], l_id == run_plan[p][r][0])
             model.Add(
                 sum(use_line[(p, r, l)] for l in lines_dict) == activate_run[(p, r)]
             )
 
             candidate_finishes = []
 
-            for l_id, l_conf in lines_dict.items():
-                br_map = l_conf["BRs"]
-                overlaps = l_conf.get("Overlaps") or {}
-                br_names = list(br_map.keys())
-                n_br = len(br_names)
-
-                # Build chain stages: stage 0 = thawing; then BR stages (integer keys)
-                chain_keys = []
-                chain_keys.append(0)
-                thaw_st = model.NewIntVar(
-                    NEGATIVE_BOUND, 50000, f"thaw_{p}_{r}_l{l_id}_0"
-                )
-                thaw_en = model.NewIntVar(
-                    NEGATIVE_BOUND, 50000, f"thaw_{p}_{r}_l{l_id}_0"
-                )
-                
-                if l_id in lineBusyUntil:
-                    # The day offset after which line l_id is free
-                    free_day = lineBusyUntil[l_id]
-                    # Ensure we don't start the thawing stage before line is free
-                    model.Add(thaw_st >= free_day).OnlyEnforceIf(use_line[(p, r, l_id)])
-
-                stage_start[(p, r, l_id, 0)] = thaw_st
-                stage_end[(p, r, l_id, 0)] = thaw_en
-                thaw_interval = model.NewOptionalIntervalVar(
-                    thaw_st,
-                    thawing - 1,
-                    thaw_en,
-                    use_line[(p, r, l_id)],
-                    f"thaw_interval_{p}_{r}_l{l_id}_0",
-                )
-                res_id = (l_id, "CellThawing & SF")
-                if res_id not in resources:
-                    resources[res_id] = []
-                resources[res_id].append(thaw_interval)
-
-                # Determine harvest rules.
-                n_harvest = l_conf.get("N_Harvest", 1)
-                if n_harvest == 2:
-                    candidate_indices = [
-                        i for i, br in enumerate(br_names) if parse_volume(br) >= 1000
-                    ]
-                    if len(candidate_indices) >= 2:
-                        first_harvest_index = candidate_indices[-2]
-                        second_harvest_index = candidate_indices[-1]
-                    else:
-                        first_harvest_index = second_harvest_index = n_br - 1
-                else:
-                    first_harvest_index = n_br - 1
-
-                # Process each BR stage.
-                for i, brn in enumerate(br_names):
-                    stage_key = i + 1
-                    chain_keys.append(stage_key)
-                    dur = br_map[brn]  # Duration without harvest/hold/mab/follow-up.
-                    st_var = model.NewIntVar(
-                        NEGATIVE_BOUND, 50000, f"st_{p}_{r}_l{l_id}_{stage_key}"
-                    )
-                    en_var = model.NewIntVar(
-                        NEGATIVE_BOUND, 50000, f"en_{p}_{r}_l{l_id}_{stage_key}"
+            for l_id in lines_dict:
+                profile("stage_intervals")
+                recipe = recipes[(p, l_id)]
+                lit = use_line[(p, r, l_id)]
+                if not recipe["feasible"]:
+                    model.Add(lit == 0)
+
+                # One start day per segment (a single one for rigid recipes); every
+                # stage is that start plus a constant offset from the template.
+                # Nothing starts before NEGATIVE_BOUND, thawing waits until the line
+                # is free (lineBusyUntil), and the run must finish by last_finish.
+                seg_finish = dict(recipe["finish"])
+                seg_starts = []
+                for k in range(recipe["n_segments"]):
+                    offsets = [st[4] for st in recipe["stages"] if st[3] == k]
+                    lo = NEGATIVE_BOUND - min(offsets)
+                    if k == 0 and l_id in lineBusyUntil:
+                        lo = max(lo, lineBusyUntil[l_id])
+                    hi = last_finish - seg_finish.get(k, min(offsets))
+                    if lo > hi:
+                        # The line cannot finish a run inside the horizon.
+                        model.Add(lit == 0)
+                        hi = lo
+                    seg_starts.append(
+                        model.NewIntVar(lo, hi, f"start_{p}_{r}_l{l_id}_{k}")
                     )
-                    stage_start[(p, r, l_id, stage_key)] = st_var
-                    stage_end[(p, r, l_id, stage_key)] = en_var
-                    interval = model.NewOptionalIntervalVar(
-                        st_var,
-                        dur - 1,
-                        en_var,
-                        use_line[(p, r, l_id)],
-                        f"interval_{p}_{r}_l{l_id}_{stage_key}",
+                    if k == 0 and recipe["feasible"] and lo <= hi:
+                        thaw_start[(p, r, l_id)] = (seg_starts[0], lo, hi)
+                for seg_a, end_a, seg_b, start_b in recipe["links"]:
+                    model.Add(
+                        seg_starts[seg_b] + start_b >= seg_starts[seg_a] + end_a
+                    ).OnlyEnforceIf(lit)
+
+                run_stages: dict[int, dict] = {}
+                for kind, key, resource, seg, offset, size in recipe["stages"]:
+                    st = seg_starts[seg] + offset
+                    en = st + size
+                    interval = model.NewOptionalFixedSizeIntervalVar(
+                        st, size, lit, f"interval_{p}_{r}_l{l_id}_{kind}_{key}"
                     )
-                    res_id = (l_id, brn)
-                    if res_id not in resources:
-                        resources[res_id] = []
-                    resources[res_id].append(interval)
-
-                    # Determine if this BR stage qualifies for harvest.
-                    add_harvest = False
-                    if n_harvest == 1 and i == n_br - 1:
-                        add_harvest = True
-                    elif n_harvest == 2 and i in [
-                        first_harvest_index,
-                        second_harvest_index,
-                    ]:
-                        add_harvest = True
-                    if add_harvest:
-                        # Harvest stage (one day) starting one day after BR stage end.
-                        harv_st = model.NewIntVar(
-                            NEGATIVE_BOUND,
-                            50000,
-                            f"harv_st_{p}_{r}_l{l_id}_{stage_key}",
-                        )
-                        harv_en = model.NewIntVar(
-                            NEGATIVE_BOUND,
-                            50000,
-                            f"harv_en_{p}_{r}_l{l_id}_{stage_key}",
-                        )
-                        model.Add(harv_st == en_var + 1).OnlyEnforceIf(
-                            use_line[(p, r, l_id)]
-                        )
-                        model.Add(harv_en == harv_st).OnlyEnforceIf(
-                            use_line[(p, r, l_id)]
-                        )
-                        harv_interval = model.NewOptionalIntervalVar(
-                            harv_st,
-                            1 - 1,
-                            harv_en,
-                            use_line[(p, r, l_id)],
-                            f"harv_interval_{p}_{r}_l{l_id}_{stage_key}",
-                        )
-                        res_id_h = (l_id, f"Harvest {brn}")
-                        if res_id_h not in resources:
-                            resources[res_id_h] = []
-                        resources[res_id_h].append(harv_interval)
-                        harvest_vars[(p, r, l_id, stage_key)] = (harv_st, harv_en)
-
-                        # Optional Hold stage.
-                        if l_conf.get("Hold", 0) in [1, "Yes"]:
-                            hold_st = model.NewIntVar(
-                                NEGATIVE_BOUND,
-                                50000,
-                                f"hold_st_{p}_{r}_l{l_id}_{stage_key}",
-                            )
-                            hold_en = model.NewIntVar(
-                                NEGATIVE_BOUND,
-                                50000,
-                                f"hold_en_{p}_{r}_l{l_id}_{stage_key}",
-                            )
-                            model.Add(hold_st == harv_en + 1).OnlyEnforceIf(
-                                use_line[(p, r, l_id)]
-                            )
-                            model.Add(hold_en == hold_st).OnlyEnforceIf(
-                                use_line[(p, r, l_id)]
-                            )
-                            hold_interval = model.NewOptionalIntervalVar(
-                                hold_st,
-                                1 - 1,
-                                hold_en,
-                                use_line[(p, r, l_id)],
-                                f"hold_interval_{p}_{r}_l{l_id}_{stage_key}",
-                            )
-                            res_id_hold = (l_id, f"Hold {brn}")
-                            if res_id_hold not in resources:
-                                resources[res_id_hold] = []
-                            resources[res_id_hold].append(hold_interval)
-                            hold_vars[(p, r, l_id, stage_key)] = (hold_st, hold_en)
-
-                        # Mab stages.
-                        mabs_dict = l_conf.get("Mabs", {})
-                        mab_key = f"After {brn}"
-                        if mab_key in mabs_dict:
-                            num_mabs = mabs_dict[mab_key]
-                            if (p, r, l_id, stage_key) in hold_vars:
-                                ref_expr = hold_vars[(p, r, l_id, stage_key)][1]
-                            else:
-                                ref_expr = en_var + 1  # Ensure separation from Harvest.
-                            mab_en_prev = None
-                            for mab_idx in range(1, num_mabs + 1):
-                                mab_st = model.NewIntVar(
-                                    NEGATIVE_BOUND,
-                                    50000,
-                                    f"mab_st_{p}_{r}_l{l_id}_{stage_key}_{mab_idx}",
-                                )
-                                mab_en = model.NewIntVar(
-                                    NEGATIVE_BOUND,
-                                    50000,
-                                    f"mab_en_{p}_{r}_l{l_id}_{stage_key}_{mab_idx}",
-                                )
-                                if mab_idx == 1:
-                                    model.Add(mab_st == ref_expr)
-                                else:
-                                    model.Add(mab_st == mab_en_prev + 1)
-                                model.Add(mab_en == mab_st).OnlyEnforceIf(
-                                    use_line[(p, r, l_id)]
-                                )
-                                mab_interval = model.NewOptionalIntervalVar(
-                                    mab_st,
-                                    1 - 1,
-                                    mab_en,
-                                    use_line[(p, r, l_id)],
-                                    f"mab_interval_{p}_{r}_l{l_id}_{stage_key}_{mab_idx}",
-                                )
-                                res_id_mab = (l_id, f"Mab {brn} {mab_idx}")
-                                if res_id_mab not in resources:
-                                    resources[res_id_mab] = []
-                                resources[res_id_mab].append(mab_interval)
-                                mab_vars[(p, r, l_id, stage_key, mab_idx)] = (
-                                    mab_st,
-                                    mab_en,
-                                )
-                                mab_en_prev = mab_en
-
-                        # --- MODIFIED CODE: Handling "SS's" for AryoSeven_BR ---
-                        # Check for "SS's" dict
-                        sss_dict = l_conf.get("SS's", {})
-                        sss_key = f"After {brn}"
-                        if sss_key in sss_dict:
-                            num_sss = sss_dict[sss_key]
-                            # If there's a hold stage, reference its end. Else reference en_var + 1
-                            if (p, r, l_id, stage_key) in hold_vars:
-                                ref_expr = hold_vars[(p, r, l_id, stage_key)][1]
-                            else:
-                                ref_expr = en_var + 1  # or the harvest end, etc.
-                            sss_en_prev = None
-                            for sss_idx in range(1, num_sss + 1):
-                                sss_st = model.NewIntVar(
-                                    NEGATIVE_BOUND,
-                                    50000,
-                                    f"sss_st_{p}_{r}_l{l_id}_{stage_key}_{sss_idx}",
-                                )
-                                sss_en = model.NewIntVar(
-                                    NEGATIVE_BOUND,
-                                    50000,
-                                    f"sss_en_{p}_{r}_l{l_id}_{stage_key}_{sss_idx}",
-                                )
-                                if sss_idx == 1:
-                                    model.Add(sss_st == ref_expr)
-                                else:
-                                    model.Add(sss_st == sss_en_prev + 1)
-                                model.Add(sss_en == sss_st).OnlyEnforceIf(
-                                    use_line[(p, r, l_id)]
-                                )
-                                sss_interval = model.NewOptionalIntervalVar(
-                                    sss_st,
-                                    1 - 1,
-                                    sss_en,
-                                    use_line[(p, r, l_id)],
-                                    f"sss_interval_{p}_{r}_l{l_id}_{stage_key}_{sss_idx}",
-                                )
-                                # Provide resource ID if needed, or skip if it doesn't block anything
-                                res_id_sss = (l_id, f"SS's {brn} {sss_idx}")
-                                resources.setdefault(res_id_sss, []).append(
-                                    sss_interval
-                                )
-
-                                # store for final plan printing
-                                mab_vars[(p, r, l_id, stage_key, 1000 + sss_idx)] = (
-                                    sss_st,
-                                    sss_en,
-                                )  # or define a new dict if you prefer
-                                sss_en_prev = sss_en
-
-                        
-                        # FOLLOW-UP STAGES.
-                        # Handle FU stages, including those with same start dates
-                        fu_key = f"Follow_Up_{brn}"
-                        if fu_key in l_conf:
-                            fu_dict = l_conf[fu_key]
-                            fu_over = l_conf.get(f"{fu_key}_Overlaps", None)
-                            same_start_dict = l_conf.get(f"{fu_key}_SameStarts", {})
-
-                            # Ensure same_start_dict is a dictionary
-                            if isinstance(same_start_dict, str):
-                                # If it's a string, treat it as a mapping (e.g., "DP_QC_Test & Visual Insp." to "1")
-                                same_start_dict = {same_start_dict: 1}
-                            elif not isinstance(same_start_dict, dict):
-                                # If it's neither a dictionary nor a string, raise an error
-                                raise ValueError(
-                                    f"Expected a dictionary or string for 'SameStarts', but got {type(same_start_dict)}"
-                                )
-
-                            # Determine reference for FU start (last completed stage, whether Hold or Mab)
-                            # Determine reference for FU start (last completed stage, whether Hold or Mab)
-                            if any(
-                                (p, r, l_id, stage_key, idx) in mab_vars
-                                for idx in range(1, mabs_dict.get(mab_key, 0) + 1)
-                            ):
-                                # If there are Mab stages, use the end of the last Mab stage as the reference
-                                idx = 1
-                                while (p, r, l_id, stage_key, idx) in mab_vars:
-                                    idx += 1
-                                ref_fu = mab_vars[(p, r, l_id, stage_key, idx - 1)][1]
-                                ref_fu = ref_fu + 1
-                            elif (p, r, l_id, stage_key) in hold_vars:
-                                # If there is a Hold stage, use the end of the Hold stage as the reference
-                                ref_fu = hold_vars[(p, r, l_id, stage_key)][1]
-                            else:
-                                # Otherwise, use the end of the Harvest stage as the reference
-                                ref_fu = harvest_vars[(p, r, l_id, stage_key)][1]
-
-                            # Start FU stages 1 day after the reference stage ends
-                            fu_prev_end = model.NewIntVar(
-                                NEGATIVE_BOUND,
-                                50000,
-                                f"fu_ref_{p}_{r}_l{l_id}_{stage_key}",
-                            )
-                            model.Add(fu_prev_end == ref_fu + 1)
-
-                            # Create an ordered list of FU stages as they appear in the dictionary
-                            fu_stage_order = list(fu_dict.keys())
-
-                            # Extracting the key and value
-                            for key, value in same_start_dict.items():
-                                # Split the key and strip whitespace
-                                parts = [part.strip() for part in key.split("&")]
-                                # Create the desired list
-                                result = parts + [value]
-
-                            # Adjust FU stage scheduling to ensure it follows the last Mab stage of the same BR (e.g., 4500).
-                            fu_prev_end = model.NewIntVar(
-                                NEGATIVE_BOUND,
-                                50000,
-                                f"fu_ref_{p}_{r}_l{l_id}_{stage_key}",
-                            )
-                            # Instead of directly using mab_idx, we try candidate indices:
-                            # Instead of directly iterating over candidate indices, do this:
-
-                            # Create a list to collect all Mab (and SS) stage end times for the current (p, r, l_id, stage_key)
-                            candidate_end_exprs = []
-                            for key in mab_vars:
-                                if key[0] == p and key[1] == r and key[2] == l_id and key[3] == stage_key:
-                                    candidate_end_exprs.append(mab_vars[key][1])
-                            # Similarly, if you want to also include SS's tracked with offsets (e.g., keys with 1000+ something)
-                            for key in mab_vars:
-                                if key[0] == p and key[1] == r and key[2] == l_id and key[3] == stage_key and key[4] >= 1000:
-                                    candidate_end_exprs.append(mab_vars[key][1])
-
-                            if not candidate_end_exprs:
-                                raise KeyError(f"No Mab or SS stage found for (p, r, l_id, stage_key): {(p, r, l_id, stage_key)}")
-
-                            # Create a new CP variable to hold the maximum end time among Mab (and SS) stages for the current BR stage.
-                            last_stage_end = model.NewIntVar(NEGATIVE_BOUND, 50000, f"last_stage_end_{p}_{r}_{l_id}_{stage_key}")
-                            model.AddMaxEquality(last_stage_end, candidate_end_exprs)
-
-                            # Define fu_prev_end to start FU stages 2 days after the maximum Mab/SS stage end time.
-                            fu_prev_end = model.NewIntVar(NEGATIVE_BOUND, 50000, f"fu_ref_{p}_{r}_l{l_id}_{stage_key}")
-                            model.Add(fu_prev_end == last_stage_end + 2)
-
-
-                            for fu_name in fu_stage_order:
-
-                                # 1) Check if fu_name is in any same-start group.
-                                matched_group = None
-                                for same_stages_str, _ in same_start_dict.items():
-                                    # e.g. same_stages_str = "DP_QC_Test & Visual Insp."
-                                    stages_list = same_stages_str.split(" & ")
-                                    if fu_name in stages_list:
-                                        matched_group = same_stages_str
-                                        break
-                                
-                                if matched_group is not None:
-                                    # === We have a same-start group that includes fu_name ===
-                                    stages_to_sync = matched_group.split(" & ")
-
-                                    # Check if any stage in this group is already scheduled (has an entry in fu_vars).
-                                    assigned_start = None
-                                    for stg in stages_to_sync:
-                                        stage_key_ = (p, r, l_id, stage_key, stg)
-                                        if stage_key_ in fu_vars:
-                                            # Found a stage already scheduled -> use its start for everyone else
-                                            assigned_start = fu_vars[stage_key_][0]
-                                            break
-
-                                    if assigned_start is None:
-                                        # No stage in the group is scheduled yet -> define a new start = fu_prev_end + 1
-                                        assigned_start = model.NewIntVar(
-                                            NEGATIVE_BOUND,
-                                            50000,
-                                            f"common_start_{p}_{r}_l{l_id}_{stage_key}_{matched_group}",
-                                        )
-                                        model.Add(
-                                            assigned_start == fu_prev_end
-                                        ).OnlyEnforceIf(use_line[(p, r, l_id)])
-
-                                    # Schedule all stages in the group that are not already scheduled.
-                                    for stg in stages_to_sync:
-                                        stage_key_ = (p, r, l_id, stage_key, stg)
-                                        if stage_key_ not in fu_vars:
-                                            fu_st = model.NewIntVar(
-                                                NEGATIVE_BOUND,
-                                                50000,
-                                                f"fu_st_{p}_{r}_l{l_id}_{stage_key}_{stg}",
-                                            )
-                                            fu_en = model.NewIntVar(
-                                                NEGATIVE_BOUND,
-                                                50000,
-                                                f"fu_en_{p}_{r}_l{l_id}_{stage_key}_{stg}",
-                                            )
-                                            # All same-start stages begin at the assigned_start.
-                                            model.Add(
-                                                fu_st == assigned_start
-                                            ).OnlyEnforceIf(use_line[(p, r, l_id)])
-                                            model.Add(
-                                                fu_en == fu_st + fu_dict[stg] - 1
-                                            ).OnlyEnforceIf(use_line[(p, r, l_id)])
-
-                                            fu_interval = model.NewOptionalIntervalVar(
-                                                fu_st,
-                                                fu_dict[stg] - 1,
-                                                fu_en,
-                                                use_line[(p, r, l_id)],
-                                                f"fu_interval_{p}_{r}_l{l_id}_{stage_key}_{stg}",
-                                            )
-                                            res_id_fu = (l_id, f"FU {brn} {stg}")
-                                            resources.setdefault(res_id_fu, []).append(
-                                                fu_interval
-                                            )
-
-                                            fu_vars[stage_key_] = (fu_st, fu_en)
-                                    # Update fu_prev_end to one day after the latest finish in the group.
-                                    group_end = model.NewIntVar(
-                                        NEGATIVE_BOUND,
-                                        50000,
-                                        f"group_end_{p}_{r}_l{l_id}_{stage_key}_{matched_group}",
-                                    )
-                                    group_ends = [
-                                        fu_vars[(p, r, l_id, stage_key, stg)][1]
-                                        for stg in stages_to_sync
-                                    ]
-                                    model.AddMaxEquality(group_end, group_ends)
-                                    fu_prev_end = group_end + 1
-
-                                    # Skip further processing for this fu_name (already handled).
-                                    continue
-                                
-                                # If the stage is already in result, skip it.
-                                if fu_name in result:
-                                    continue
-
-                                # For individual FU stages not in same-start groups:
-                                # Determine if this is the first FU stage or not.
-                                idx = fu_stage_order.index(fu_name)
-                                if fu_stage_order[idx - 1] in result:
-                                    # First FU stage (or previous already handled): start at fu_prev_end.
-                                    fu_prev_end = (
-                                        fu_vars[
-                                            (
-                                                p,
-                                                r,
-                                                l_id,
-                                                stage_key,
-                                                fu_stage_order[idx - 1],
-                                            )
-                                        ][1]
-                                        + 1
-                                    )
-
-                                # For subsequent stages, enforce overlap if defined.
-                                prev_fu_name = fu_stage_order[idx - 1]
-                                # Look for an overlap definition between prev_fu_name and fu_name.
-                                overlap_key = f"{prev_fu_name} & {fu_name}"
-                                if isinstance(fu_over, dict):
-                                    ov_val = fu_over.get(overlap_key, None)
-                                    if ov_val is None:
-                                        # Try the reverse order.
-                                        overlap_key = f"{fu_name} & {prev_fu_name}"
-                                        ov_val = fu_over.get(overlap_key, None)
-                                else:
-                                    # When fu_over is a simple value (like "None")
-                                    ov_val = fu_over
-
-                                # Now apply FU overlap logic similar to BR overlaps.
-                                fu_st = model.NewIntVar(
-                                    NEGATIVE_BOUND,
-                                    50000,
-                                    f"fu_st_{p}_{r}_l{l_id}_{stage_key}_{fu_name}",
-                                )
-                                fu_en = model.NewIntVar(
-                                    NEGATIVE_BOUND,
-                                    50000,
-                                    f"fu_en_{p}_{r}_l{l_id}_{stage_key}_{fu_name}",
-                                )
-
-                                if ov_val is not None and ov_val != "None":
-                                    if ov_val == 1:
-                                        # No gap between stages.
-                                        model.Add(fu_st == fu_prev_end).OnlyEnforceIf(
-                                            use_line[(p, r, l_id)]
-                                        )
-                                    elif ov_val == "Full":
-                                        # FU stage ends exactly when the previous stage ends (i.e., no gap)
-                                        model.Add(fu_st == fu_prev_end).OnlyEnforceIf(
-                                            use_line[(p, r, l_id)]
-                                        )
-                                        model.Add(fu_en == fu_prev_end).OnlyEnforceIf(
-                                            use_line[(p, r, l_id)]
-                                        )
-                                    else:
-                                        # Numeric overlap: next stage starts earlier.
-                                        model.Add(
-                                            fu_st == fu_prev_end - ov_val
-                                        ).OnlyEnforceIf(use_line[(p, r, l_id)])
-                                else:
-                                    # No overlap defined: schedule sequentially (i.e. start immediately after previous FU stage).
-                                    model.Add(fu_st == fu_prev_end).OnlyEnforceIf(
-                                        use_line[(p, r, l_id)]
-                                    )
-                                    
-                                # End time of the current FU stage.
-                                model.Add(
-                                    fu_en == fu_st + fu_dict[fu_name] - 1
-                                ).OnlyEnforceIf(use_line[(p, r, l_id)])
-                                # Create the interval.
-                                fu_interval = model.NewOptionalIntervalVar(
-                                    fu_st,
-                                    fu_dict[fu_name] - 1,
-                                    fu_en,
-                                    use_line[(p, r, l_id)],
-                                    f"fu_interval_{p}_{r}_l{l_id}_{stage_key}_{fu_name}",
-                                )
-                                res_id_fu = (l_id, f"FU {brn} {fu_name}")
-                                resources.setdefault(res_id_fu, []).append(fu_interval)
-                                fu_vars[(p, r, l_id, stage_key, fu_name)] = (
-                                    fu_st,
-                                    fu_en,
-                                )
-                                # Update fu_prev_end to be one day after this FU stage ends.
-                                fu_prev_end = fu_en + 1
-
-                # End processing each BR stage.
-                # Enforce consecutive constraints on the chain (thawing and BR stages).
-                for idx in range(len(chain_keys) - 1):
-                    curr_key = chain_keys[idx]
-                    next_key = chain_keys[idx + 1]
-                    if idx == 0:
-                        model.Add(
-                            stage_start[(p, r, l_id, next_key)]
-                            == stage_end[(p, r, l_id, curr_key)]
-                        ).OnlyEnforceIf(use_line[(p, r, l_id)])
+                    resources.setdefault((l_id, resource), []).append(interval)
+                    if kind == "chain":
+                        run_stages[key] = {
+                            "start": st, "end": en, "mabs": [], "sss": [], "fu": {},
+                        }
+                    elif kind in ("harvest", "hold"):
+                        run_stages[key][kind] = (st, en)
+                    elif kind == "mab":
+                        run_stages[key[0]]["mabs"].append((st, en))
+                    elif kind == "ss":
+                        run_stages[key[0]]["sss"].append((st, en))
                     else:
-                        prev_br = br_names[curr_key - 1]
-                        next_br = br_names[next_key - 1]
-                        ov_val = overlaps.get(f"{prev_br} & {next_br}") or overlaps.get(
-                            f"{next_br} & {prev_br}"
-                        )
-                        if ov_val is not None and ov_val != "None":
-                            if ov_val == 1:
-                                model.Add(
-                                    stage_start[(p, r, l_id, next_key)]
-                                    == stage_end[(p, r, l_id, curr_key)]
-                                ).OnlyEnforceIf(use_line[(p, r, l_id)])
-                            elif ov_val == "Full":
-                                model.Add(
-                                    stage_end[(p, r, l_id, next_key)]
-                                    == stage_end[(p, r, l_id, curr_key)]
-                                ).OnlyEnforceIf(use_line[(p, r, l_id)])
-                            else:
-                                model.Add(
-                                    stage_start[(p, r, l_id, next_key)]
-                                    == stage_end[(p, r, l_id, curr_key)] - ov_val + 1
-                                ).OnlyEnforceIf(use_line[(p, r, l_id)])
-                        else:
-                            model.Add(
-                                stage_start[(p, r, l_id, next_key)]
-                                >= stage_end[(p, r, l_id, curr_key)]
-                            ).OnlyEnforceIf(use_line[(p, r, l_id)])
-
-                # Compute finish time for this line as the maximum of:
-                # - the end of the last chain stage,
-                # - any Harvest, Hold, Mab, or Follow-Up stage end times.
-                if len(chain_keys) > 0:
-                    chain_finish = stage_end[(p, r, l_id, chain_keys[-1])]
-                else:
-                    chain_finish = thaw_en
-                harvest_ends_line = []
-                for key in range(1, len(br_names) + 1):
-                    if (p, r, l_id, key) in harvest_vars:
-                        harvest_ends_line.append(harvest_vars[(p, r, l_id, key)][1])
-                hold_ends_line = []
-                for key in range(1, len(br_names) + 1):
-                    if (p, r, l_id, key) in hold_vars:
-                        hold_ends_line.append(hold_vars[(p, r, l_id, key)][1])
-                mab_ends_line = []
-                for key in range(1, len(br_names) + 1):
-                    idx = 1
-                    while (p, r, l_id, key, idx) in mab_vars:
-                        mab_ends_line.append(mab_vars[(p, r, l_id, key, idx)][1])
-                        idx += 1
-                fu_ends_line = []
-                for key in range(1, len(br_names) + 1):
-                    for fu_key in [
-                        k
-                        for k in fu_vars
-                        if k[0] == p and k[1] == r and k[2] == l_id and k[3] == key
-                    ]:
-                        fu_ends_line.append(fu_vars[fu_key][1])
-                if harvest_ends_line or hold_ends_line or mab_ends_line or fu_ends_line:
+                        run_stages[key[0]]["fu"][key[1]] = (st, en)
+                stage_vars[(p, r, l_id)] = run_stages
+
+                # Finish time for this line: the latest end of the chain, Harvest,
+                # Hold, Mab and Follow-Up stages, taken per segment.
+                profile("finish_time")
+                fin_candidates = [
+                    seg_starts[seg] + offset for seg, offset in recipe["finish"]
+                ]
+                if len(fin_candidates) > 1:
                     fin_l = model.NewIntVar(
-                        NEGATIVE_BOUND, 50000, f"fin_{p}_{r}_l{l_id}"
-                    )
-                    candidates = (
-                        [chain_finish]
-                        + harvest_ends_line
-                        + hold_ends_line
-                        + mab_ends_line
-                        + fu_ends_line
+                        NEGATIVE_BOUND, last_finish, f"fin_{p}_{r}_l{l_id}"
                     )
-                    model.AddMaxEquality(fin_l, candidates)
+                    model.AddMaxEquality(fin_l, fin_candidates)
                 else:
-                    fin_l = chain_finish
+                    fin_l = fin_candidates[0]
 
                 candidate = model.NewIntVar(
-                    NEGATIVE_BOUND, 50000, f"candidate_finish_{p}_{r}_{l_id}"
+                    NEGATIVE_BOUND, last_finish, f"candidate_finish_{p}_{r}_{l_id}"
                 )
                 model.Add(candidate == fin_l).OnlyEnforceIf(use_line[(p, r, l_id)])
                 model.Add(candidate == NEGATIVE_BOUND).OnlyEnforceIf(
@@ -1013,96 +1346,133 @@ def build_schedule_with_inventory(
                 )
                 candidate_finishes.append(candidate)
 
+            profile("finish_time")
             if candidate_finishes:
-                ft = model.NewIntVar(NEGATIVE_BOUND, 50000, f"finish_{p}_{r}")
+                ft = model.NewIntVar(NEGATIVE_BOUND, last_finish, f"finish_{p}_{r}")
                 model.AddMaxEquality(ft, candidate_finishes)
                 finish_time[(p, r)] = ft
             else:
                 finish_time[(p, r)] = model.NewIntVar(0, 0, f"finish_{p}_{r}_null")
+            if run_plan is not None:
+                model.Add(finish_time[(p, r)] <= run_plan[p][r][1])
+                # Identical planned runs are interchangeable: order their finishes.
+                if r > 0 and run_plan[p][r] == run_plan[p][r - 1]:
+                    model.Add(finish_time[(p, r - 1)] <= finish_time[(p, r)])
+
+    # Stages already committed by an earlier rolling window (build_schedule_rolling).
+    profile("stage_intervals")
+    for i, (l_id, resource, start, size) in enumerate(
+        getattr(payload, "frozenStages", None) or []
+    ):
+        resources.setdefault((l_id, resource), []).append(
+            model.NewFixedSizeIntervalVar(start, size, f"frozen_{l_id}_{resource}_{i}")
+        )
 
     # Resource no-overlap.
+    profile("no_overlap")
     for _, intervals in resources.items():
         model.AddNoOverlap(intervals)
 
-    # 4) Production Calculation: volume -> liters -> protein.
-    line_final_vol: dict[tuple[str, str], float] = {}
+    profile("symmetry")
+    if symmetry_breaking and run_plan is None:
+        add_run_symmetry_breaking(
+            model, products, product_lines, n_runs, activate_run, use_line,
+            finish_time, stage_vars,
+        )
+
+    # Lower bound from the sizing stage: enough runs to cover the minimum demand.
+    profile("runs")
     for p in products:
-        for l_id, l_conf in product_lines[p].items():
-            br_names = list(l_conf["BRs"].keys())
-            if not br_names:
-                line_final_vol[(p, l_id)] = 0
-                continue
-            last_vol = parse_volume(br_names[-1])
-            if len(br_names) >= 2:
-                sec_vol = parse_volume(br_names[-2])
-                if last_vol >= 1000 and sec_vol >= 1000:
-                    line_final_vol[(p, l_id)] = last_vol + sec_vol
-                else:
-                    line_final_vol[(p, l_id)] = last_vol
-            else:
-                line_final_vol[(p, l_id)] = last_vol
+        model.Add(
+            sum(activate_run[(p, r)] for r in range(n_runs[p])) >= run_bounds[p][0]
+        )
 
+    # 4) Production Calculation: volume -> liters -> protein.
+    profile("production")
     produced_liters: dict[tuple[str, int], cp_model.IntVar] = {}
     for p in products:
-        for r in range(MAX_RUNS):
+        for r in range(n_runs[p]):
             partial_vars = []
             for l_id in product_lines[p]:
                 vol = int(line_final_vol[(p, l_id)])
                 pLit = model.NewIntVar(0, vol, f"pLit_{p}_{r}_l{l_id}")
                 model.AddMultiplicationEquality(pLit, [use_line[(p, r, l_id)], vol])
                 partial_vars.append(pLit)
-            totLit = model.NewIntVar(0, bigM, f"totLit_{p}_{r}")
+            totLit = model.NewIntVar(0, domains["liters"][p], f"totLit_{p}_{r}")
             model.Add(totLit == sum(partial_vars))
             produced_liters[(p, r)] = totLit
 
     produced_protein_int: dict[tuple[str, int], cp_model.IntVar] = {}
     for p in products:
         f_int = int(round(product_factor[p]))
-        for r in range(MAX_RUNS):
-            prot = model.NewIntVar(0, bigM, f"prot_{p}_{r}")
+        for r in range(n_runs[p]):
+            prot = model.NewIntVar(0, domains["protein"][p], f"prot_{p}_{r}")
             produced_protein_int[(p, r)] = prot
             plit = produced_liters[(p, r)]
             model.Add(plit * f_int >= prot * 1000)
-            diff = model.NewIntVar(0, bigM, f"diff_{p}_{r}")
+            diff = model.NewIntVar(0, 999, f"diff_{p}_{r}")
             model.Add(diff == plit * f_int - prot * 1000)
-            model.Add(diff < 1000)
 
 
     usage = {}
+    usage_hi = {}
     expiration_date = {}
-    isValid = {}
 
     # (A) Create expiration_date
+    profile("expiration")
     for p in products:
-        for r in range(MAX_RUNS):
-            exp_date = model.NewIntVar(0, bigM, f"exp_{p}_{r}")
+        for r in range(n_runs[p]):
+            exp_date = model.NewIntVar(
+                NEGATIVE_BOUND + SHELF_LIFE * DAYS_PER_MONTH,
+                last_finish + SHELF_LIFE * DAYS_PER_MONTH,
+                f"exp_{p}_{r}",
+            )
             # Shelf life in days = SHELF_LIFE * DAYS_PER_MONTH
             model.Add(exp_date == finish_time[(p, r)] + SHELF_LIFE * DAYS_PER_MONTH)
             expiration_date[(p, r)] = exp_date
 
-    # (B) Create usage variables for partial allocation across months
+    # (B) Create usage variables for partial allocation across months. Only the
+    # months a run slot can reach (compute_run_reach) and, in the stage phase,
+    # the months its planned run serves get a variable; the others are fixed 0.
+    profile("usage")
+    reach = compute_run_reach(inputs, n_runs, ordered=symmetry_breaking and run_plan is None)
     for p in products:
-        for r in range(MAX_RUNS):
+        for r in range(n_runs[p]):
             for m in range(1, TOTAL_MONTHS + 1):
-                usage[(p, r, m)] = model.NewIntVar(0, bigM, f"usage_{p}_{r}_m{m}")
+                hi = domains["usage"][(p, m)]
+                if m < reach[(p, r)] or (run_plan is not None and m not in run_plan[p][r][2]):
+                    hi = 0
+                usage_hi[(p, r, m)] = hi
+                if hi == 0:
+                    usage[(p, r, m)] = 0
+                    continue
+                usage[(p, r, m)] = model.NewIntVar(0, hi, f"usage_{p}_{r}_m{m}")
+
+    profile("warm_start")
+    warm_start_report = None
+    if warm_start is not None and run_plan is None:
+        warm_start_report = add_warm_start_hints(
+            model, warm_start, products, product_lines, n_runs, activate_run,
+            use_line, thaw_start, usage, usage_hi,
+        )
+        print("Warm start =>", warm_start_report)
 
-    # New: link usage to a boolean that says "this run actually supplies month m"
-    supplies_month = {}
+    # (B') First month each run can supply, channelled from its finish day:
+    # month m starts on day DAYS_PER_MONTH * (m - 1) + 1, so
+    # DAYS_PER_MONTH * (first - 2) < finish <= DAYS_PER_MONTH * (first - 1).
+    profile("first_month")
+    first_month = {}
     for p in products:
-        for r in range(MAX_RUNS):
-            for m in range(1, TOTAL_MONTHS+1):
-                sm = model.NewBoolVar(f"supplies_{p}_{r}_m{m}")
-                supplies_month[(p,r,m)] = sm
-                # If any usage > 0 then sm=1, else sm=0
-                model.Add(usage[(p, r, m)] > 0).OnlyEnforceIf(sm)
-                model.Add(usage[(p, r, m)] == 0).OnlyEnforceIf(sm.Not())
-                # And enforce the no‐spill constraint:
-                month_start = (m - 1) * DAYS_PER_MONTH + 1
-                model.Add(finish_time[(p, r)] <= month_start).OnlyEnforceIf(sm)
+        for r in range(n_runs[p]):
+            fm = model.NewIntVar(*domains["first_month"], f"first_month_{p}_{r}")
+            model.Add(finish_time[(p, r)] <= DAYS_PER_MONTH * (fm - 1))
+            model.Add(finish_time[(p, r)] >= DAYS_PER_MONTH * (fm - 2) + 1)
+            first_month[(p, r)] = fm
 
     # (C) Link total usage to produced_protein_int
+    profile("usage")
     for p in products:
-        for r in range(MAX_RUNS):
+        for r in range(n_runs[p]):
             model.Add(
                 sum(usage[(p, r, m)] for m in range(1, TOTAL_MONTHS + 1))
                 <= produced_protein_int[(p, r)]
@@ -1116,244 +1486,1581 @@ def build_schedule_with_inventory(
     #             >= int(math.ceil(demand[p].get(m, 0)))
     #         )
       
+    profile("demand_coverage")
     for product, month_ranges in demand.items():
         for m, (min_req, max_req) in month_ranges.items():
             # sum allocated usage for this product-month over all runs
             total_allocated = sum(
                 usage[(product, r, m)]
-                for r in range(MAX_RUNS)
+                for r in range(n_runs[product])
             )
 
-            # enforce the minimum
-            model.Add(total_allocated >= min_req)
+            # enforce the minimum
+            model.Add(total_allocated >= min_req)
+
+            # enforce the maximum
+            model.Add(total_allocated <= max_req)
+
+    # (E) serves[(p, r, m)] <=> run r supplies product p in month m, which it
+    # can only do from its first servable month on.
+    profile("serves")
+    serves = {}
+    for p in products:
+        for r in range(n_runs[p]):
+            for m in range(1, TOTAL_MONTHS + 1):
+                if usage_hi[(p, r, m)] == 0:
+                    continue
+                b = model.NewBoolVar(f"serves_{p}_{r}_m{m}")
+                serves[(p, r, m)] = b
+                model.Add(usage[(p, r, m)] >= 1).OnlyEnforceIf(b)
+                model.Add(usage[(p, r, m)] == 0).OnlyEnforceIf(b.Not())
+                model.Add(first_month[(p, r)] <= m).OnlyEnforceIf(b)
+
+    profile("demand_chosen")
+    demand_chosen = {}
+    for p in products:
+        for m in range(1, TOTAL_MONTHS+1):
+            demand_chosen[(p, m)] = model.NewIntVar(
+                0, domains["demand"][(p, m)], f"demand_chosen_{p}_{m}"
+            )
+    
+    # somewhere after you’ve built `serves[(p,r,m)]` and `finish_time[(p,r)]`:
+    profile("earliness")
+    earliness = {}
+    for p in products:
+        for r in range(n_runs[p]):
+            for m in range(1, TOTAL_MONTHS+1):
+                # only care when this run can actually supply month m
+                if (p, r, m) not in serves:
+                    continue
+                var = model.NewIntVar(
+                    0, domains["earliness"][m], f"earliness_{p}_{r}_m{m}"
+                )
+                earliness[(p,r,m)] = var
+
+                month_start = (m-1) * DAYS_PER_MONTH + 1 # e.g. if DAYS_PER_MONTH=30, month_start = 30, 60, 90, …
+                # 1) If run IS valid for month m, earliness >= (month_start − finish_time)
+                model.Add(earliness[(p, r, m)] 
+                        == month_start - finish_time[(p, r)]) \
+                    .OnlyEnforceIf(serves[(p, r, m)])
+                model.Add(earliness[(p, r, m)] == 0) \
+                    .OnlyEnforceIf(serves[(p, r, m)].Not())
+
+    # 2) DEFINE MONTH-TO-MONTH INVENTORY
+    profile("inventory")
+    inventory = {}
+    for p in products:
+        for m in range(1, TOTAL_MONTHS + 1):
+            inventory[(p, m)] = model.NewIntVar(
+                0, domains["inventory"][p], f"Inventory_{p}_m{m}"
+            )
+
+    # We interpret "monthly production" as the sum of usage in that month
+    # Because usage = how much product is actually allocated to month m
+    monthly_prod = {}
+    for p in products:
+        for m in range(1, TOTAL_MONTHS + 1):
+            monthly_prod[(p, m)] = model.NewIntVar(
+                0, domains["demand"][(p, m)], f"monthly_prod_{p}_m{m}"
+            )
+            model.Add(
+                monthly_prod[(p, m)] == sum(usage[(p, r, m)] for r in range(n_runs[p]))
+            )
+
+    # Demand is monthly_demand
+    # monthly_demand = {}
+    # for p in products:
+    #     for m in range(1, TOTAL_MONTHS + 1):
+    #         monthly_demand[p, m] = int(math.ceil(demand[p].get(m, 0)))
+    
+    # Build min & max demand dicts instead of a single monthly_demand
+    monthly_demand_min = {}
+    monthly_demand_max = {}
+
+    profile("demand_chosen")
+    for p in products:
+        for m in range(1, TOTAL_MONTHS + 1):
+            # pull from your aggregated ranges:
+            min_req, max_req = demand[p][m]  
+            # ensure they’re integers
+            monthly_demand_min[p, m] = int(min_req)
+            monthly_demand_max[p, m] = int(max_req)
+
+    for p in products:
+        for m in range(1, TOTAL_MONTHS+1):
+            total_usage = sum(usage[(p, r, m)] for r in range(n_runs[p]))
+            # demand_chosen == total allocated usage
+            model.Add(demand_chosen[(p, m)] == total_usage)
+
+    for p, month_ranges in demand.items():
+        for m, (min_req, max_req) in month_ranges.items():
+            dc = demand_chosen[(p, m)]
+            model.Add(dc >= int(min_req))
+            model.Add(dc <= int(max_req))
+
+
+    # 3) INVENTORY FLOW CONSTRAINTS
+    # Inv_{p,m} = Inv_{p,m-1} + monthly_prod[p,m] - monthly_demand[p,m]
+    # --- INVENTORY WITH INITIAL STOCK DRIVES DEMAND COVERAGE ---
+    profile("inventory")
+    inventory = {}
+    for p in products:
+        for m in range(1, TOTAL_MONTHS+1):
+            inventory[(p, m)] = model.NewIntVar(
+                0, domains["inventory"][p], f"inv_{p}_m{m}"
+            )
+
+    # month 1: start with existing stock + any usage in month 1
+    # for p in products:
+    #     model.Add(
+    #         inventory[(p, 1)]
+    #         == products_inventory_protein[p]
+    #         + sum(usage[(p, r, 1)] for r in range(MAX_RUNS))
+    #         - int(math.ceil(demand[p].get(1, 0)))
+    #     )
+    #     # months 2…TOTAL_MONTHS
+    #     for m in range(2, TOTAL_MONTHS+1):
+    #         model.Add(
+    #             inventory[(p, m)]
+    #             == inventory[(p, m-1)]
+    #             + sum(usage[(p, r, m)] for r in range(MAX_RUNS))
+    #             - int(math.ceil(demand[p].get(m, 0)))
+    #         )
+    #     # inventory can never go negative
+    #     for m in range(1, TOTAL_MONTHS+1):
+    #         # model.Add(inventory[(p, m)] >= abs(int((monthly_demand[p, m] - export_stocks_protein[p][m]) // 3)))
+    #         model.Add(inventory[(p, m)] >= 0)
+
+
+
+
+    # Month 1
+    model.Add(
+        inventory[(p, 1)]
+        == products_inventory_protein[p]
+        + sum(usage[(p, r, 1)] for r in range(n_runs[p]))
+        - demand_chosen[(p, 1)]
+    )
+
+    # Months 2…TOTAL_MONTHS
+    for m in range(2, TOTAL_MONTHS+1):
+        model.Add(
+            inventory[(p, m)]
+            == inventory[(p, m-1)]
+            + sum(usage[(p, r, m)] for r in range(n_runs[p]))
+            - demand_chosen[(p, m)]
+        )
+
+    # 1) sum up all earliness…
+    profile("earliness")
+    total_earliness = model.NewIntVar(
+        0,
+        sum(domains["earliness"][m] for (_, _, m) in earliness),
+        "total_earliness",
+    )
+    model.Add(total_earliness == sum(earliness.values()))
+
+    # pre-compute line volumes (liters → grams):
+    line_capacity = {
+        (p, l): int(line_final_vol[(p, l)] * product_factor[p] / 1000.0)
+        for p in products
+        for l in product_lines[p]
+    }
+
+    # after you've created demand_chosen[(p,m)]
+    profile("shortfall")
+    shortfall = {}
+    for p, month_ranges in demand.items():
+        for m, (_, max_req) in month_ranges.items():
+            # max shortfall is max_req
+            sc = model.NewIntVar(0, max_req, f"shortfall_{p}_{m}")
+            shortfall[(p, m)] = sc
+            # shortfall = max_req - demand_chosen
+            model.Add(sc == max_req - demand_chosen[(p, m)])
+            
+    # build a linear expression for “total run capacity”:
+    cap_penalty = []
+    for p in products:
+        for r in range(n_runs[p]):
+            for l in product_lines[p]:
+                cap_penalty.append(
+                    line_capacity[(p, l)] * use_line[(p, r, l)]
+                )
+
+    # e.g. α=1000 to give primary weight to earliness, β=1 to break ties by fewer runs
+    a = 3
+    b = 2
+    c = 2 # tiny weight compared to your a/b
+
+    total_shortfall = sum(shortfall.values())
+    model.Minimize(
+        # b*sum(activate_run.values()) +
+        b * total_shortfall +
+        a*total_earliness
+        # c*sum(cap_penalty)
+    )
+
+    return {
+        "model": model,
+        "products": products,
+        "product_lines": product_lines,
+        "product_factor": product_factor,
+        "n_runs": n_runs,
+        "activate_run": activate_run,
+        "use_line": use_line,
+        "stage_vars": stage_vars,
+        "finish_time": finish_time,
+        "expiration_date": expiration_date,
+        "produced_liters": produced_liters,
+        "usage": usage,
+        "first_month": first_month,
+        "demand_chosen": demand_chosen,
+        "inventory": inventory,
+        "products_inventory_protein": products_inventory_protein,
+        "warm_start": warm_start_report,
+        "profile": None if profiler is None else profiler.report(),
+        "build_seconds": time.perf_counter() - build_started,
+    }
+
+
+def configure_solver(
+    solver: cp_model.CpSolver, max_time_in_seconds: float, num_workers: int = None
+):
+    """
+    Apply the search parameters of the current SOLVER_PROFILE.
+
+    The time limit is the smaller of max_time_in_seconds and the profile's;
+    num_workers, if given, replaces the profile's worker count.
+    """
+    profile = SOLVER_PROFILE
+    solver.parameters.max_time_in_seconds = min(
+        max_time_in_seconds, profile["max_time_in_seconds"]
+    )
+    solver.parameters.relative_gap_limit = profile["relative_gap_limit"]
+    solver.parameters.cp_model_presolve = profile["presolve"]  # Enable fast presolving to reduce model size
+    solver.parameters.cp_model_probing_level = profile["probing_level"]    # 0=off, 1=light, 2=strengthened
+    solver.parameters.symmetry_level = profile["symmetry_level"]  # Enables symmetry breaking during preprocessing
+    solver.parameters.log_search_progress = profile["log_search_progress"]
+    solver.parameters.num_search_workers = num_workers or profile["num_workers"]
+    # solver.parameters.keep_all_feasible_solutions_in_presolve = True
+
+    # solver.parameters.stop_after_first_solution = True
+
+
+def model_size(model: cp_model.CpModel) -> dict[str, int]:
+    """
+    Number of variables, constraints and interval constraints of a model.
+    """
+    proto = model.Proto()
+    return {
+        "variables": len(proto.variables),
+        "constraints": len(proto.constraints),
+        "intervals": sum(1 for c in proto.constraints if c.has_interval()),
+    }
+
+
+def peak_rss_bytes() -> int:
+    """
+    Peak resident set size of this process or of its largest finished child
+    (the decomposition workers), or None where it cannot be measured.
+    """
+    try:
+        import resource
+    except ImportError:  # Windows
+        try:
+            import psutil
+        except ImportError:
+            return None
+        return psutil.Process().memory_info().peak_wset
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class SolutionCounter(cp_model.CpSolverSolutionCallback):
+    """
+    Solution callback counting the improving solutions of a solve.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.solutions = 0
+
+    def on_solution_callback(self):
+        self.solutions += 1
+
+
+def solve_model(
+    solver: cp_model.CpSolver,
+    model: cp_model.CpModel,
+    callback: SolutionCounter = None,
+    phase: str = "monolithic",
+    build_seconds: float = None,
+) -> int:
+    """
+    solver.Solve(model, callback), stopped early once STOP_EVENT is set: the
+    search ends as if its time limit was reached, so the best solution found so
+    far is kept (status FEASIBLE).
+
+    Every solve appends its telemetry to SOLVE_STATS: phase, build and solve
+    seconds, model size, status, objective, best bound, relative gap and the
+    number of solutions found.
+    """
+    callback = callback or SolutionCounter()
+    finished = threading.Event()
+
+    def watch():
+        while not finished.wait(0.2):
+            if STOP_EVENT.is_set():
+                solver.StopSearch()
+
+    watcher = None
+    if STOP_EVENT is not None:
+        watcher = threading.Thread(target=watch, daemon=True)
+        watcher.start()
+    try:
+        status = solver.Solve(model, callback)
+    finally:
+        finished.set()
+        if watcher is not None:
+            watcher.join()
+
+    objective = gap = None
+    if status in [cp_model.OPTIMAL, cp_model.FEASIBLE]:
+        objective = solver.ObjectiveValue()
+        gap = abs(objective - solver.BestObjectiveBound()) / max(1.0, abs(objective))
+    SOLVE_STATS.append(
+        {
+            "phase": phase,
+            "build_seconds": build_seconds,
+            "solve_seconds": solver.WallTime(),
+            **model_size(model),
+            "status": solver.StatusName(status),
+            "objective": objective,
+            "best_bound": solver.BestObjectiveBound(),
+            "gap": gap,
+            "solutions": callback.solutions,
+        }
+    )
+    return status
+
+
+def extract_solution_snapshot(solver, ctx: dict) -> dict:
+    """
+    Light view of a (possibly intermediate) solution of build_inventory_model:
+    the runs extract_inventory_plan would report, without their stage list, and
+    the inventory trajectory.
+
+    Returns:
+        {"final_plan": [{product, run_index, line_used, start_day, finish_day,
+        finish_date, monthly_usage, liters}, ...], "inventory_trajectory":
+        {product: {month: grams}}}
+    """
+    products = ctx["products"]
+    n_runs = ctx["n_runs"]
+    usage = ctx["usage"]
+
+    runs = []
+    for p in products:
+        for r in range(n_runs[p]):
+            if solver.Value(ctx["activate_run"][(p, r)]) == 0:
+                continue
+            if solver.Value(ctx["first_month"][(p, r)]) > TOTAL_MONTHS:
+                continue
+            line = next(
+                (l for l in ctx["product_lines"][p] if solver.Value(ctx["use_line"][(p, r, l)])),
+                None,
+            )
+            fday = solver.Value(ctx["finish_time"][(p, r)])
+            runs.append(
+                {
+                    "product": p,
+                    "run_index": r,
+                    "line_used": line,
+                    "start_day": (
+                        solver.Value(ctx["stage_vars"][(p, r, line)][0]["start"])
+                        if line is not None else None
+                    ),
+                    "finish_day": fday,
+                    "finish_date": day_to_date(fday),
+                    "monthly_usage": {
+                        m: solver.Value(usage[(p, r, m)])
+                        for m in range(1, TOTAL_MONTHS + 1)
+                        if solver.Value(usage[(p, r, m)]) > 0
+                    },
+                    "liters": solver.Value(ctx["produced_liters"][(p, r)]),
+                }
+            )
+
+    # Same trajectory as extract_inventory_plan: stock + usage - chosen demand.
+    inv_traj: dict[str, dict[int, int]] = {}
+    for p in products:
+        current_inv = ctx["products_inventory_protein"][f"{p}"]
+        inv_traj[p] = {}
+        for m in range(1, TOTAL_MONTHS + 1):
+            current_inv += sum(solver.Value(usage[(p, r, m)]) for r in range(n_runs[p]))
+            current_inv -= solver.Value(ctx["demand_chosen"][(p, m)])
+            inv_traj[p][m] = current_inv
+    return {"final_plan": runs, "inventory_trajectory": inv_traj}
+
+
+class SolutionStreamer(SolutionCounter):
+    """
+    Solution callback handing every improving solution of an inventory model to
+    on_solution, as extract_solution_snapshot plus its "objective", the best
+    objective bound known at that point ("best_bound") and the solver's wall
+    time in seconds ("elapsed").
+    """
+
+    def __init__(self, ctx: dict, on_solution):
+        super().__init__()
+        self.ctx = ctx
+        self.on_solution = on_solution
+
+    def on_solution_callback(self):
+        super().on_solution_callback()
+        snapshot = extract_solution_snapshot(self, self.ctx)
+        snapshot["objective"] = self.ObjectiveValue()
+        snapshot["best_bound"] = self.BestObjectiveBound()
+        snapshot["elapsed"] = round(self.WallTime(), 3)
+        self.on_solution(snapshot)
+
+
+def merge_solution_snapshots(latest: dict[int, dict], n_components: int) -> dict:
+    """
+    Combine the latest snapshot of each line-sharing component into one; the
+    objective and bound are sums over the components that have reported so far
+    (no bound while a component's plan is a greedy one).
+    """
+    final_plan, inv_traj = [], {}
+    bounds = [s["best_bound"] for s in latest.values()]
+    for snapshot in latest.values():
+        final_plan.extend(snapshot["final_plan"])
+        inv_traj.update(snapshot["inventory_trajectory"])
+    final_plan.sort(key=lambda x: (x["product"]))
+    return {
+        "final_plan": final_plan,
+        "inventory_trajectory": inv_traj,
+        "objective": sum(s["objective"] for s in latest.values()),
+        "best_bound": None if None in bounds else sum(bounds),
+        "elapsed": max(s["elapsed"] for s in latest.values()),
+        "components_reported": len(latest),
+        "components": n_components,
+    }
+
+
+def build_lot_sizing_model(demand: dict[str, dict], inputs: dict) -> dict:
+    """
+    Aggregate phase of the two-phase engine: how many runs of each product to
+    finish on each line in each month, without stage dates.
+
+    runs[(p, l_id, k)] counts runs finishing in bucket k: on or before day 0 for
+    k = 0, in month k (days 30(k-1)+1 .. 30k) otherwise, so they can supply months
+    k+1 onwards (the same "finish before the month starts" rule as the full
+    model). Constraints:
+
+      - a bucket is only open if the line's recipe can finish by its deadline,
+        starting no earlier than NEGATIVE_BOUND / the line's busy day;
+      - aggregated line capacity, a relaxation of the (line, resource) NoOverlap:
+        the days a resource is busy for the runs of buckets K1..K2 fit in the
+        window those runs can occupy. Rigid recipes place every stage at a fixed
+        distance from the finish; stages of recipes with free gaps only count
+        in windows starting at the line's first free day;
+      - runs deliver to months after their bucket, at most their yield in total,
+        and every month receives a demand inside its Covers range.
+
+    The objective is the full model's one (shortfall and earliness, same weights)
+    with every run assumed to finish on its bucket deadline, plus the run count.
+
+    Returns:
+        A dict with the model, the runs and serving variables and demand_chosen.
+    """
+    products = inputs["products"]
+    product_lines = inputs["product_lines"]
+    product_factor = inputs["product_factor"]
+    line_final_vol = inputs["line_final_vol"]
+    lineBusyUntil = inputs["lineBusyUntil"]
+    run_bounds = inputs["run_bounds"]
+    recipes = inputs["recipes"]
+
+    build_started = time.perf_counter()
+    model = cp_model.CpModel()
+    runs: dict[tuple[str, str, int], cp_model.IntVar] = {}
+    run_yield: dict[tuple[str, str], int] = {}
+    # (l_id, resource) -> [(product, busy days per run, start - finish or None,
+    #                       end - finish)]
+    resource_load: dict[tuple[str, str], list[tuple]] = {}
+    longest_recipe = 0
+
+    for p in products:
+        f_int = int(round(product_factor[p]))
+        for l_id in product_lines[p]:
+            recipe = recipes[(p, l_id)]
+            run_yield[(p, l_id)] = int(line_final_vol[(p, l_id)]) * f_int // 1000
+            if not recipe["feasible"] or run_yield[(p, l_id)] <= 0:
+                continue
+
+            seg_lo = {}
+            for seg in range(recipe["n_segments"]):
+                offsets = [st[4] for st in recipe["stages"] if st[3] == seg]
+                seg_lo[seg] = NEGATIVE_BOUND - min(offsets)
+                if seg == 0 and l_id in lineBusyUntil:
+                    seg_lo[seg] = max(seg_lo[seg], lineBusyUntil[l_id])
+            earliest_finish = max(seg_lo[seg] + off for seg, off in recipe["finish"])
+            for k in range(TOTAL_MONTHS):
+                if earliest_finish <= k * DAYS_PER_MONTH:
+                    runs[(p, l_id, k)] = model.NewIntVar(
+                        0, run_bounds[p][1], f"lot_{p}_l{l_id}_k{k}"
+                    )
+
+            # A stage ends at most (its end - its segment's finish) after the run
+            # finish; in a rigid recipe it also starts exactly that far from it.
+            seg_finish = dict(recipe["finish"])
+            rigid = recipe["n_segments"] == 1
+            longest_recipe = max(longest_recipe, max(seg_finish.values()))
+            occupied: dict[str, list] = {}
+            for _, _, resource, seg, offset, size in recipe["stages"]:
+                if size <= 0 or seg not in seg_finish:
+                    continue
+                start_rel = offset - seg_finish[seg] if rigid else None
+                end_rel = offset + size - seg_finish[seg]
+                load = occupied.get(resource)
+                if load is None:
+                    occupied[resource] = [size, start_rel, end_rel]
+                    continue
+                load[0] += size
+                if rigid:
+                    load[1] = min(load[1], start_rel)
+                load[2] = max(load[2], end_rel)
+            for resource, (days, start_rel, end_rel) in occupied.items():
+                resource_load.setdefault((l_id, resource), []).append(
+                    (p, days, start_rel, end_rel)
+                )
+
+    # Windows of up to span buckets are enough to see overlapping runs; longer
+    # ones are only checked from the line's first free day.
+    span = longest_recipe // DAYS_PER_MONTH + 2
+    for (l_id, resource), loads in resource_load.items():
+        first_free = max(NEGATIVE_BOUND, lineBusyUntil.get(l_id, NEGATIVE_BOUND))
+        for K1 in range(TOTAL_MONTHS):
+            for K2 in range(K1, TOTAL_MONTHS):
+                if K1 > 0 and K2 - K1 >= span:
+                    break
+                members = [ld for ld in loads if K1 == 0 or ld[2] is not None]
+                terms = [
+                    days * runs[(p, l_id, k)]
+                    for p, days, _, _ in members
+                    for k in range(K1, K2 + 1)
+                    if (p, l_id, k) in runs
+                ]
+                if not terms:
+                    continue
+                window_end = K2 * DAYS_PER_MONTH + max(ld[3] for ld in members)
+                window_start = first_free
+                if K1 > 0:
+                    window_start = max(
+                        first_free,
+                        (K1 - 1) * DAYS_PER_MONTH + 1 + min(ld[2] for ld in members),
+                    )
+                model.Add(sum(terms) <= max(window_end - window_start, 0))
+
+    # serving[(p, l_id, k, m)] runs of bucket k deliver delivered[...] grams in month m.
+    # Each such (run, month) pair costs what the full model charges as earliness
+    # when the run finishes on its deadline: month_start - k * DAYS_PER_MONTH.
+    demand_chosen = {}
+    serving_runs: dict[tuple[str, str, int, int], cp_model.IntVar] = {}
+    earliness = []
+    shortfall = []
+    for p in products:
+        month_ranges = demand.get(p, {})
+        delivered_by_month: dict[int, list] = {}
+        for (rp, l_id, k), n in runs.items():
+            if rp != p:
+                continue
+            y = run_yield[(p, l_id)]
+            delivered_by_run = []
+            for m in range(k + 1, TOTAL_MONTHS + 1):
+                max_req = int(month_ranges.get(m, (0, 0))[1])
+                if max_req <= 0:
+                    continue
+                serving = model.NewIntVar(
+                    0, run_bounds[p][1], f"lot_serving_{p}_l{l_id}_k{k}_m{m}"
+                )
+                model.Add(serving <= n)
+                serving_runs[(p, l_id, k, m)] = serving
+                delivered = model.NewIntVar(
+                    0, min(max_req, y * run_bounds[p][1]),
+                    f"lot_delivered_{p}_l{l_id}_k{k}_m{m}",
+                )
+                model.Add(delivered <= y * serving)
+                delivered_by_run.append(delivered)
+                delivered_by_month.setdefault(m, []).append(delivered)
+                month_start = (m - 1) * DAYS_PER_MONTH + 1
+                earliness.append((month_start - k * DAYS_PER_MONTH) * serving)
+            if delivered_by_run:
+                model.Add(sum(delivered_by_run) <= y * n)
+
+        for m in range(1, TOTAL_MONTHS + 1):
+            min_req, max_req = month_ranges.get(m, (0, 0))
+            dc = model.NewIntVar(int(min_req), int(max_req), f"lot_demand_{p}_m{m}")
+            demand_chosen[(p, m)] = dc
+            model.Add(dc == sum(delivered_by_month.get(m, [])))
+            shortfall.append(int(max_req) - dc)
+
+    a = 3  # same earliness / shortfall weights as the full model
+    b = 2
+    # Unit tie-break on the run count, so no idle run reaches the stage phase.
+    model.Minimize(b * sum(shortfall) + a * sum(earliness) + sum(runs.values()))
+
+    return {
+        "model": model,
+        "runs": runs,
+        "serving": serving_runs,
+        "demand_chosen": demand_chosen,
+        "build_seconds": time.perf_counter() - build_started,
+    }
+
+
+def solve_lot_sizing(
+    demand: dict[str, dict], inputs: dict, num_workers: int = None
+) -> dict:
+    """
+    Solve the aggregate phase and turn its counts into individual runs.
+
+    Returns:
+        { product: [(line_id, deadline_day, months), ...], ... } or None if the
+        aggregate model has no solution. months are the months the run's bucket
+        delivers to in the aggregate solution.
+    """
+    ctx = build_lot_sizing_model(demand, inputs)
+    solver = cp_model.CpSolver()
+    configure_solver(solver, LOT_SIZING_TIME_LIMIT, num_workers)
+    solver.parameters.log_search_progress = False
+    status = solve_model(
+        solver, ctx["model"], phase="lot_sizing", build_seconds=ctx["build_seconds"]
+    )
+    if status not in [cp_model.OPTIMAL, cp_model.FEASIBLE]:
+        print("Lot-sizing phase found no solution.")
+        return None
+
+    served: dict[tuple[str, str, int], list[int]] = {}
+    for (p, l_id, k, m), var in ctx["serving"].items():
+        if solver.Value(var) > 0:
+            served.setdefault((p, l_id, k), []).append(m)
+
+    run_plan: dict[str, list[tuple]] = {p: [] for p in inputs["products"]}
+    for (p, l_id, k), var in sorted(ctx["runs"].items(), key=lambda kv: kv[0][2]):
+        months = tuple(sorted(served.get((p, l_id, k), [])))
+        run_plan[p].extend([(l_id, k * DAYS_PER_MONTH, months)] * solver.Value(var))
+    print(
+        "Lot-sizing runs per product =>",
+        {p: len(planned) for p, planned in run_plan.items()},
+    )
+    return run_plan
+
+
+def build_schedule_two_phase(
+    data: Lines_Config.LinesConfig,
+    demand: dict[str, dict],
+    products_inventory_protein,
+    payload,
+    num_workers: int = None,
+    on_solution=None,
+):
+    """
+    Two-phase engine: solve the lot-sizing model, then schedule the stages of the
+    chosen runs only (build_inventory_model with run_plan). on_solution receives
+    the improving solutions of the stage phase (see SolutionStreamer).
+
+    Returns:
+        The same tuple as extract_inventory_plan, or None if either phase has no
+        solution (the caller then falls back to the monolithic model).
+    """
+    inputs = collect_planning_inputs(data, demand, products_inventory_protein, payload)
+    if inputs is None:
+        return None
+    run_plan = solve_lot_sizing(demand, inputs, num_workers)
+    if run_plan is None:
+        return None
+
+    ctx = build_inventory_model(
+        data, demand, products_inventory_protein, payload, run_plan=run_plan
+    )
+    if ctx is None:
+        return None
+    solver = cp_model.CpSolver()
+    configure_solver(solver, STAGE_SCHEDULING_TIME_LIMIT, num_workers)
+    status = solve_model(
+        solver, ctx["model"], SolutionStreamer(ctx, on_solution) if on_solution else None,
+        phase="stage_scheduling", build_seconds=ctx["build_seconds"],
+    )
+    if status not in [cp_model.OPTIMAL, cp_model.FEASIBLE]:
+        print("Stage-scheduling phase found no solution for the lot-sizing runs.")
+        return None
+
+    return extract_inventory_plan(solver, ctx)
+
+
+def recipe_stage_times(recipe: dict, seg_starts: list[int]) -> dict[int, dict]:
+    """
+    Stage registry in days (see stage_values) of a run whose segments start on
+    seg_starts.
+    """
+    run_stages: dict[int, dict] = {}
+    for kind, key, _, seg, offset, size in recipe["stages"]:
+        st = seg_starts[seg] + offset
+        en = st + size
+        if kind == "chain":
+            run_stages[key] = {"start": st, "end": en, "mabs": [], "sss": [], "fu": {}}
+        elif kind in ("harvest", "hold"):
+            run_stages[key][kind] = (st, en)
+        elif kind == "mab":
+            run_stages[key[0]]["mabs"].append((st, en))
+        elif kind == "ss":
+            run_stages[key[0]]["sss"].append((st, en))
+        else:
+            run_stages[key[0]]["fu"][key[1]] = (st, en)
+    return run_stages
+
+
+def _latest_fit(
+    recipe: dict, occupied: dict[tuple, list], l_id, lo: int, deadline: int
+) -> list[int]:
+    """
+    Segment start days that put a run on line l_id as late as possible while
+    finishing by `deadline`, starting thawing on or after `lo` and overlapping
+    no occupied (line, resource) interval; None if there is no such day. The
+    segments are kept as close as their links allow.
+    """
+    seg_rel = _segment_distances(recipe, 0)
+    seg_rel = [seg_rel.get(k, 0) for k in range(recipe["n_segments"])]
+    for k in range(1, recipe["n_segments"]):
+        seg_lo = NEGATIVE_BOUND - min(st[4] for st in recipe["stages"] if st[3] == k)
+        lo = max(lo, seg_lo - seg_rel[k])
+    finish_rel = max(seg_rel[s] + off for s, off in recipe["finish"])
+    stages = [
+        (resource, seg_rel[seg] + offset, size)
+        for _, _, resource, seg, offset, size in recipe["stages"]
+        if size > 0
+    ]
+
+    t = deadline - finish_rel
+    while t >= lo:
+        latest = t
+        for resource, rel, size in stages:
+            st = t + rel
+            for busy_st, busy_en in occupied.get((l_id, resource), ()):
+                if st < busy_en and busy_st < st + size:
+                    latest = min(latest, busy_st - size - rel)
+        if latest == t:
+            return [t + rel for rel in seg_rel]
+        t = latest
+    return None
+
+
+def build_schedule_greedy(
+    data: Lines_Config.LinesConfig,
+    demand: dict[str, dict],
+    products_inventory_protein,
+    payload,
+    on_solution=None,
+    phase: str = "greedy",
+):
+    """
+    Greedy constructive engine: a valid plan in milliseconds, for interactive
+    use, as the fallback when CP-SAT stops without a solution and as hints for
+    the exact model.
+
+    Months are served earliest deadline first, first up to their minimum
+    demand and then, in a second pass, up to their maximum. While a product has
+    run slots to spare for every month still to come, each month gets a new run
+    finishing just before it; otherwise its demand is allocated from the runs
+    already planned that finish before the month starts and have not expired
+    by then (oldest first, after those already serving the month). Whatever is left is covered by new runs. A new run is placed on the
+    line where it can finish latest before the deadline without overlapping
+    any stage already on that (line, resource) (or frozen there by an earlier
+    rolling window). Runs per product are capped at the sizing stage's maximum,
+    so the plan also fits the exact model's run slots. Like the model, opening
+    stock is carried, not allocated.
+
+    Returns:
+        The same tuple as extract_inventory_plan, or None if no product has
+        demand.
+    """
+    started = time.perf_counter()
+    inputs = collect_planning_inputs(data, demand, products_inventory_protein, payload)
+    if inputs is None:
+        return None
+    products = inputs["products"]
+    product_lines = inputs["product_lines"]
+    last_finish = (TOTAL_MONTHS - 1) * DAYS_PER_MONTH
+
+    occupied: dict[tuple, list] = {}
+    for l_id, resource, start, size in getattr(payload, "frozenStages", None) or []:
+        occupied.setdefault((l_id, resource), []).append((start, start + size))
+
+    runs: dict[str, list[dict]] = {p: [] for p in products}
+    lots: dict[str, list[list]] = {p: [] for p in products}  # [finish, expiry, left, run]
+    delivered = {(p, m): 0 for p in products for m in range(1, TOTAL_MONTHS + 1)}
+
+    def allocate(p, m, need):
+        month_start = (m - 1) * DAYS_PER_MONTH + 1
+        # FIFO, so lots are used before they expire; lots already serving m go
+        # first, as serving a month costs its earliness once per run, whatever
+        # the quantity.
+        for lot in sorted(lots[p], key=lambda x: (m not in x[3]["monthly_usage"], x[0])):
+            if need <= 0:
+                break
+            finish, expiry, left, run = lot
+            if left <= 0 or finish >= month_start or expiry <= month_start:
+                continue
+            q = min(left, need)
+            lot[2] -= q
+            run["monthly_usage"][m] = run["monthly_usage"].get(m, 0) + q
+            delivered[(p, m)] += q
+            need -= q
+        return need
+
+    def add_run(p, deadline):
+        best = None
+        for l_id in product_lines[p]:
+            recipe = inputs["recipes"][(p, l_id)]
+            liters = int(inputs["line_final_vol"][(p, l_id)])
+            run_yield = liters * int(round(inputs["product_factor"][p])) // 1000
+            if not recipe["feasible"] or run_yield <= 0:
+                continue
+            lo = max(
+                NEGATIVE_BOUND - min(st[4] for st in recipe["stages"] if st[3] == 0),
+                inputs["lineBusyUntil"].get(l_id, NEGATIVE_BOUND),
+            )
+            seg_starts = _latest_fit(recipe, occupied, l_id, lo, min(deadline, last_finish))
+            if seg_starts is None:
+                continue
+            finish = max(seg_starts[s] + off for s, off in recipe["finish"])
+            if best is None or (finish, run_yield) > (best[0], best[1]):
+                best = (finish, run_yield, l_id, liters, seg_starts)
+        if best is None:
+            return False
+        finish, run_yield, l_id, liters, seg_starts = best
+        recipe = inputs["recipes"][(p, l_id)]
+        for _, _, resource, seg, offset, size in recipe["stages"]:
+            st = seg_starts[seg] + offset
+            occupied.setdefault((l_id, resource), []).append((st, st + size))
+        run = {
+            "line_used": l_id,
+            "finish_day": finish,
+            "liters": liters,
+            "monthly_usage": {},
+            "stages": recipe_stage_times(recipe, seg_starts),
+        }
+        runs[p].append(run)
+        lots[p].append([finish, finish + SHELF_LIFE * DAYS_PER_MONTH, run_yield, run])
+        return True
+
+    # Months from m on with a minimum demand, per product.
+    months_left = {}
+    for p in products:
+        left = 0
+        for m in range(TOTAL_MONTHS, 0, -1):
+            left += int(demand[p].get(m, (0, 0))[0]) > 0
+            months_left[(p, m)] = left
+
+    for bound in (0, 1):  # minimum demand everywhere first, then up to the maximum
+        for m in range(1, TOTAL_MONTHS + 1):
+            deadline = (m - 1) * DAYS_PER_MONTH
+            for p in products:
+                target = int(demand[p].get(m, (0, 0))[bound])
+                if bound == 0 and target > delivered[(p, m)] and (
+                    len(runs[p]) + months_left[(p, m)] <= inputs["run_bounds"][p][1]
+                ):
+                    add_run(p, deadline)  # enough slots left for a run per month
+                need = allocate(p, m, target - delivered[(p, m)])
+                while need > 0 and len(runs[p]) < inputs["run_bounds"][p][1]:
+                    if not add_run(p, deadline):
+                        break
+                    need = allocate(p, m, need)
+
+    final_plan = []
+    earliness = 0
+    for p in products:
+        for r, run in enumerate(sorted(runs[p], key=lambda x: x["finish_day"])):
+            if not run["monthly_usage"]:
+                continue
+            fday = run["finish_day"]
+            exp_day = fday + SHELF_LIFE * DAYS_PER_MONTH
+            br_stages = stage_rows(run["stages"], product_lines[p][run["line_used"]])
+            release_day = next(
+                (st["end_day"] for st in br_stages if "Release" in st["stage"]), fday
+            )
+            earliness += sum(
+                (m - 1) * DAYS_PER_MONTH + 1 - fday for m in run["monthly_usage"]
+            )
+            final_plan.append(
+                {
+                    "product": p,
+                    "run_index": r,
+                    "line_used": run["line_used"],
+                    "start_date": br_stages[0]["start_date"],
+                    "finish_day": fday,
+                    "finish_date": day_to_date(fday),
+                    "monthly_usage": dict(sorted(run["monthly_usage"].items())),
+                    "liters": run["liters"],
+                    "production_month": None,
+                    "produced_protein": run["liters"] * inputs["product_factor"][p] / 1000.0,
+                    "br_stages": br_stages,
+                    "release_day": release_day,
+                    "expiration_date": exp_day,
+                    "expiration_date_str": day_to_date(exp_day),
+                }
+            )
+    final_plan.sort(key=lambda x: (x["product"]))
+
+    Demand: dict[str, dict[int, int]] = {}
+    inv_traj: dict[str, dict[int, int]] = {}
+    product_initial_stock = {}
+    shortfall = 0
+    met_minimum = True
+    for p in products:
+        # usage == chosen demand every month, so the stock is carried unchanged.
+        product_initial_stock[p] = products_inventory_protein[f"{p}"]
+        inv_traj[p] = {m: product_initial_stock[p] for m in range(1, TOTAL_MONTHS + 1)}
+        Demand[p] = {m: delivered[(p, m)] for m in range(1, TOTAL_MONTHS + 1)}
+        for m, (min_req, max_req) in demand[p].items():
+            shortfall += int(max_req) - delivered[(p, m)]
+            met_minimum = met_minimum and delivered[(p, m)] >= int(min_req)
+
+    objective = 2 * shortfall + 3 * earliness  # the exact model's objective
+    elapsed = time.perf_counter() - started
+    SOLVE_STATS.append(
+        {
+            "phase": phase,
+            "build_seconds": None,
+            "solve_seconds": elapsed,
+            "variables": 0,
+            "constraints": 0,
+            "intervals": 0,
+            "status": "FEASIBLE" if met_minimum else "PARTIAL",
+            "objective": objective,
+            "best_bound": None,
+            "gap": None,
+            "solutions": 1,
+        }
+    )
+    print(f"Greedy plan => {len(final_plan)} runs, objective {objective}, "
+          f"minimum demand {'met' if met_minimum else 'NOT met'}, {elapsed:.3f} s")
+    if on_solution is not None:
+        on_solution(
+            {
+                "final_plan": [
+                    {
+                        "product": run["product"],
+                        "run_index": run["run_index"],
+                        "line_used": run["line_used"],
+                        "start_day": run["br_stages"][0]["start_day"],
+                        "finish_day": run["finish_day"],
+                        "finish_date": run["finish_date"],
+                        "monthly_usage": run["monthly_usage"],
+                        "liters": run["liters"],
+                    }
+                    for run in final_plan
+                ],
+                "inventory_trajectory": inv_traj,
+                "objective": objective,
+                "best_bound": None,
+                "elapsed": round(elapsed, 3),
+            }
+        )
+    return final_plan, inv_traj, product_initial_stock, Demand
+
+
+def build_schedule_with_inventory(
+    data: Lines_Config.LinesConfig,
+    demand: dict[str, dict],
+    products_inventory_protein,
+    payload,
+    x,y,
+    symmetry_breaking: bool = False,
+    engine: str = "monolithic",
+    num_workers: int = None,
+    warm_start: dict = None,
+    warm_start_report: dict = None,
+    on_solution=None,
+    unsolved: list = None,
+):
+    """
+    Build and solve the CP-SAT model for every product except AryoSeven_RC.
+
+    engine="two_phase" tries build_schedule_two_phase first and only builds the
+    monolithic model if that has no solution; engine="greedy" only runs
+    build_schedule_greedy, which is also the fallback when CP-SAT runs out of
+    time before a first solution. num_workers is the number of CP-SAT
+    search workers (default: the SOLVER_PROFILE's). warm_start (from load_warm_start) is hinted onto the
+    monolithic model, or, if there is none and GREEDY_HINTS is set, a greedy
+    plan; if warm_start_report is a dict, it is filled with the
+    add_warm_start_hints report plus its "source" ("saved" or "greedy"), or
+    status "skipped" when the two-phase or greedy engine answers.
+    on_solution, if given, is called with a snapshot of every improving solution
+    (see SolutionStreamer). Setting STOP_EVENT ends the solve with the best
+    solution so far.
+
+    Returns:
+        final_plan, inv_traj, initial stock and chosen demand (see
+        extract_inventory_plan); all empty when no product has demand, or when
+        the model has no solution, in which case the products are appended to
+        unsolved if it is a list.
+    """
+    if warm_start_report is None:
+        warm_start_report = {}
+    warm_start_report.update(status="none" if warm_start is None else "skipped")
+
+    if engine == "greedy":
+        result = build_schedule_greedy(
+            data, demand, products_inventory_protein, payload, on_solution
+        )
+        if result is None:
+            return [], {}, {}, {}
+        return result
+
+    if engine == "two_phase":
+        result = build_schedule_two_phase(
+            data, demand, products_inventory_protein, payload, num_workers, on_solution
+        )
+        if result is not None:
+            return result
+        print("Two-phase engine failed, falling back to the monolithic model.")
+
+    warm_start_source = "saved"
+    if warm_start is None and GREEDY_HINTS:
+        greedy = build_schedule_greedy(
+            data, demand, products_inventory_protein, payload, phase="greedy_hint"
+        )
+        if greedy is not None:
+            warm_start = warm_start_from_plan(greedy[0])
+            warm_start_source = "greedy"
+
+    ctx = build_inventory_model(
+        data, demand, products_inventory_protein, payload, symmetry_breaking,
+        warm_start=warm_start,
+    )
+    if ctx is None:
+        return [], {}, {}, {}
+    if ctx["warm_start"] is not None:
+        warm_start_report.update(ctx["warm_start"], source=warm_start_source)
+    model = ctx["model"]
+
+    # Solve
+    solver = cp_model.CpSolver()
+    configure_solver(solver, SOLVER_PROFILE["max_time_in_seconds"], num_workers)
+
+    status = solve_model(
+        solver, model, SolutionStreamer(ctx, on_solution) if on_solution else None,
+        phase="monolithic", build_seconds=ctx["build_seconds"],
+    )
+    if status == cp_model.UNKNOWN:
+        # Out of time before a first solution: a greedy plan beats no plan.
+        print("No solution within the time limit, falling back to the greedy engine.")
+        result = build_schedule_greedy(
+            data, demand, products_inventory_protein, payload, on_solution
+        )
+        if result is None:
+            return [], {}, {}, {}
+        return result
+    if status not in [cp_model.OPTIMAL, cp_model.FEASIBLE]:
+        print("No feasible solution.")
+        if unsolved is not None:
+            unsolved.extend(ctx["products"])
+        return [], {}, {}, {}
 
-            # enforce the maximum
-            model.Add(total_allocated <= max_req)
+    return extract_inventory_plan(solver, ctx)
 
-    serves = {}  # will index (product,run,month) → Bool
-    for p in products:
-        for r in range(MAX_RUNS):
-            for m in range(1, TOTAL_MONTHS+1):
-                b = model.NewBoolVar(f"serves_{p}_{r}_m{m}")
-                serves[(p,r,m)] = b
 
-                # if we actually allocate any usage to month m, serves==1
-                model.Add(usage[(p,r,m)] >= 1).OnlyEnforceIf(b)
-                model.Add(usage[(p,r,m)] == 0).OnlyEnforceIf(b.Not())
+def line_sharing_components(data: Lines_Config.LinesConfig, products: list) -> list[list[str]]:
+    """
+    Split products into groups that never share a line.
 
-    # (E) isValid[(p, r, m)] => run r can supply product p in month m
-    for p in products:
-        for r in range(MAX_RUNS):
-            for m in range(1, TOTAL_MONTHS + 1):
-                isValid[(p, r, m)] = model.NewBoolVar(f"isValid_{p}_{r}_m{m}")
+    Two products are linked when a line id listed for both in Common_Lines is
+    active for both. Resources are keyed by (line id, stage), so the schedule of
+    one group never constrains another and each group is its own model.
 
-    # Link isValid to day-based shelf life:
-    for p in products:
-        for r in range(MAX_RUNS):
-            F = finish_time[(p, r)]  # day production finishes
-            E = expiration_date[(p, r)]
-            for m in range(1, TOTAL_MONTHS + 1):
-                month_start = (30 * (m - 1)) + 1
-                month_end = (30 * m) - 1
-                valid = isValid[(p, r, m)]
+    Returns:
+        [[product, ...], ...] in the order the products are given.
+    """
+    parent = {p: p for p in products}
 
-                # If valid=1 => run finishes on/before month_end AND not expired before month_start
-                model.Add(F < month_start).OnlyEnforceIf(valid)
-                # model.Add(E > month_start).OnlyEnforceIf(valid)
+    def find(p):
+        while parent[p] != p:
+            parent[p] = parent[parent[p]]
+            p = parent[p]
+        return p
 
-    # Force usage to 0 if not valid
-    for p in products:
-        for r in range(MAX_RUNS):
-            for m in range(1, TOTAL_MONTHS + 1):
-                model.Add(usage[(p, r, m)] <= bigM * isValid[(p, r, m)])
-                
-    demand_chosen = {}
+    line_owner: dict = {}
     for p in products:
-        for m in range(1, TOTAL_MONTHS+1):
-            demand_chosen[(p, m)] = model.NewIntVar(
-                0, bigM, f"demand_chosen_{p}_{m}"
-            )
-    
-    # somewhere after you’ve built `isValid[(p,r,m)]` and `finish_time[(p,r)]`:
-    earliness = {}
+        active = data.products[p].active_lines()
+        for l_id in data.common_lines.get(p, ()):
+            if l_id not in active:
+                continue
+            if l_id in line_owner:
+                parent[find(p)] = find(line_owner[l_id])
+            else:
+                line_owner[l_id] = p
+
+    groups: dict[str, list[str]] = {}
     for p in products:
-        for r in range(MAX_RUNS):
-            for m in range(1, TOTAL_MONTHS+1):
-                # only care when this run actually supplies month m
-                var = model.NewIntVar(0, bigM, f"earliness_{p}_{r}_m{m}")
-                earliness[(p,r,m)] = var
+        groups.setdefault(find(p), []).append(p)
+    return list(groups.values())
 
-                month_start = (m-1) * DAYS_PER_MONTH + 1 # e.g. if DAYS_PER_MONTH=30, month_start = 30, 60, 90, …
-                # 1) If run IS valid for month m, earliness >= (month_start − finish_time)
-                model.Add(earliness[(p, r, m)] 
-                        == month_start - finish_time[(p, r)]) \
-                    .OnlyEnforceIf(serves[(p, r, m)])
-                model.Add(earliness[(p, r, m)] == 0) \
-                    .OnlyEnforceIf(serves[(p, r, m)].Not())
 
-    for p in products:
-        for r in range(MAX_RUNS):
-            for m in range(1, TOTAL_MONTHS+1):
-                month_start = (m - 1) * DAYS_PER_MONTH + 1# e.g. 1, 31, 61, …
-                # month_end = m * DAYS_PER_MONTH - 1 # e.g. 30, 60, 90, …
-                model.Add(finish_time[(p,r)] < month_start)\
-                    .OnlyEnforceIf(serves[(p,r,m)])
+_SOLUTION_QUEUE = None  # Set in component workers that stream their solutions
 
-    # 2) DEFINE MONTH-TO-MONTH INVENTORY
-    inventory = {}
-    for p in products:
-        for m in range(1, TOTAL_MONTHS + 1):
-            inventory[(p, m)] = model.NewIntVar(0, bigM, f"Inventory_{p}_m{m}")
 
-    # We interpret "monthly production" as the sum of usage in that month
-    # Because usage = how much product is actually allocated to month m
-    monthly_prod = {}
-    for p in products:
-        for m in range(1, TOTAL_MONTHS + 1):
-            monthly_prod[(p, m)] = model.NewIntVar(0, bigM, f"monthly_prod_{p}_m{m}")
-            model.Add(
-                monthly_prod[(p, m)] == sum(usage[(p, r, m)] for r in range(MAX_RUNS))
-            )
+def _init_component_worker(stop_event, solution_queue, solver_profile):
+    """
+    Process-pool initializer: share the stop event, the solution queue and the
+    solver profile of the parent with a component worker.
+    """
+    global _SOLUTION_QUEUE, SOLVER_PROFILE
+    set_stop_event(stop_event)
+    SOLVER_PROFILE = solver_profile
+    _SOLUTION_QUEUE = solution_queue
 
-    # Demand is monthly_demand
-    # monthly_demand = {}
-    # for p in products:
-    #     for m in range(1, TOTAL_MONTHS + 1):
-    #         monthly_demand[p, m] = int(math.ceil(demand[p].get(m, 0)))
-    
-    # Build min & max demand dicts instead of a single monthly_demand
-    monthly_demand_min = {}
-    monthly_demand_max = {}
 
-    for p in products:
-        for m in range(1, TOTAL_MONTHS + 1):
-            # pull from your aggregated ranges:
-            min_req, max_req = demand[p][m]  
-            # ensure they’re integers
-            monthly_demand_min[p, m] = int(min_req)
-            monthly_demand_max[p, m] = int(max_req)
+def _solve_component(job: tuple):
+    """
+    Process-pool entry point: solve one line-sharing component.
 
-    for p in products:
-        for m in range(1, TOTAL_MONTHS+1):
-            total_usage = sum(usage[(p, r, m)] for r in range(MAX_RUNS))
-            # demand_chosen == total allocated usage
-            model.Add(demand_chosen[(p, m)] == total_usage)
+    The module globals are set again because a spawned worker starts from a
+    fresh import of this module. Improving solutions go to the parent as
+    (component index, snapshot) on _SOLUTION_QUEUE when it is set; the
+    component's SOLVE_STATS and the products it could not plan are returned
+    with its result.
+    """
+    (data, demand, products_inventory_protein, payload, total_months, base_date,
+     symmetry_breaking, engine, num_workers, warm_start, index) = job
+    set_total_months(total_months)
+    set_base_date_for_planning(base_date)
+    SOLVE_STATS.clear()
+    on_solution = None
+    if _SOLUTION_QUEUE is not None:
+        on_solution = lambda snapshot: _SOLUTION_QUEUE.put((index, snapshot))
+    report: dict = {}
+    unsolved: list[str] = []
+    result = build_schedule_with_inventory(
+        data, demand, products_inventory_protein, payload, {}, {},
+        symmetry_breaking=symmetry_breaking, engine=engine, num_workers=num_workers,
+        warm_start=warm_start, warm_start_report=report, on_solution=on_solution,
+        unsolved=unsolved,
+    )
+    return result, report, list(SOLVE_STATS), unsolved
 
-    for p, month_ranges in demand.items():
-        for m, (min_req, max_req) in month_ranges.items():
-            dc = demand_chosen[(p, m)]
-            model.Add(dc >= int(min_req))
-            model.Add(dc <= int(max_req))
 
+def build_schedule_decomposed(
+    data: Lines_Config.LinesConfig,
+    demand: dict[str, dict],
+    products_inventory_protein,
+    payload,
+    x,y,
+    symmetry_breaking: bool = False,
+    engine: str = "monolithic",
+    warm_start: dict = None,
+    warm_start_report: dict = None,
+    on_solution=None,
+    unsolved: list = None,
+):
+    """
+    Solve every line-sharing component (see line_sharing_components) as its own
+    CP-SAT model in a process pool and merge the results.
+
+    The objective is a sum over products, so the merged plan is the one the
+    single model would find. The cores are split evenly over the components
+    (at most the SOLVER_PROFILE's workers each) instead of all of them sharing
+    one search. With a single component this is
+    build_schedule_with_inventory. The warm-start reports of the components are
+    merged into warm_start_report, and on_solution receives the latest snapshot
+    of every component merged (see merge_solution_snapshots) each time one of
+    them improves. STOP_EVENT reaches the component workers. The products of
+    components without a solution are left out of the plan and, if unsolved is
+    a list, appended to it.
 
-    # 3) INVENTORY FLOW CONSTRAINTS
-    # Inv_{p,m} = Inv_{p,m-1} + monthly_prod[p,m] - monthly_demand[p,m]
-    # --- INVENTORY WITH INITIAL STOCK DRIVES DEMAND COVERAGE ---
-    inventory = {}
-    for p in products:
-        for m in range(1, TOTAL_MONTHS+1):
-            inventory[(p, m)] = model.NewIntVar(0, bigM, f"inv_{p}_m{m}")
+    Returns:
+        final_plan, inv_traj, initial stock and chosen demand, as
+        build_schedule_with_inventory.
+    """
+    products = [p for p in data.common_lines if p in demand]
+    components = line_sharing_components(data, products)
+    if len(components) <= 1:
+        return build_schedule_with_inventory(
+            data, demand, products_inventory_protein, payload, x, y,
+            symmetry_breaking=symmetry_breaking, engine=engine,
+            warm_start=warm_start, warm_start_report=warm_start_report,
+            on_solution=on_solution, unsolved=unsolved,
+        )
 
-    # month 1: start with existing stock + any usage in month 1
-    # for p in products:
-    #     model.Add(
-    #         inventory[(p, 1)]
-    #         == products_inventory_protein[p]
-    #         + sum(usage[(p, r, 1)] for r in range(MAX_RUNS))
-    #         - int(math.ceil(demand[p].get(1, 0)))
-    #     )
-    #     # months 2…TOTAL_MONTHS
-    #     for m in range(2, TOTAL_MONTHS+1):
-    #         model.Add(
-    #             inventory[(p, m)]
-    #             == inventory[(p, m-1)]
-    #             + sum(usage[(p, r, m)] for r in range(MAX_RUNS))
-    #             - int(math.ceil(demand[p].get(m, 0)))
-    #         )
-    #     # inventory can never go negative
-    #     for m in range(1, TOTAL_MONTHS+1):
-    #         # model.Add(inventory[(p, m)] >= abs(int((monthly_demand[p, m] - export_stocks_protein[p][m]) // 3)))
-    #         model.Add(inventory[(p, m)] >= 0)
+    print("Independent line-sharing components =>", components)
+    # The components solve at the same time, so they share the cores: each gets
+    # its slice, at least one worker and never more than the profile allows.
+    num_workers = min(
+        SOLVER_PROFILE["num_workers"], max(1, (os.cpu_count() or 1) // len(components))
+    )
+    # Only the fields the model reads, so workers do not need the API models.
+    light_payload = SimpleNamespace(
+        busyLines=payload.busyLines,
+        selectedDate=payload.selectedDate,
+        monthsCount=payload.monthsCount,
+        frozenStages=getattr(payload, "frozenStages", None),
+    )
+    jobs = [
+        (
+            data,
+            {p: demand[p] for p in component},
+            products_inventory_protein,
+            light_payload,
+            TOTAL_MONTHS,
+            BASE_DATE_FOR_PLANNING,
+            symmetry_breaking,
+            engine,
+            num_workers,
+            warm_start,
+            index,
+        )
+        for index, component in enumerate(components)
+    ]
+
+    solution_queue = relay = None
+    if on_solution is not None:
+        solution_queue = multiprocessing.Queue()
+
+        def relay_solutions():
+            latest: dict[int, dict] = {}
+            while True:
+                item = solution_queue.get()
+                if item is None:
+                    return
+                latest[item[0]] = item[1]
+                on_solution(merge_solution_snapshots(latest, len(jobs)))
+
+        relay = threading.Thread(target=relay_solutions, daemon=True)
+        relay.start()
+
+    with ProcessPoolExecutor(
+        max_workers=len(jobs),
+        initializer=_init_component_worker,
+        initargs=(STOP_EVENT, solution_queue, SOLVER_PROFILE),
+    ) as pool:
+        outcomes = list(pool.map(_solve_component, jobs))
+    if relay is not None:
+        solution_queue.put(None)
+        relay.join()
+    if warm_start_report is not None:
+        warm_start_report.update(
+            merge_warm_start_reports([report for _, report, _, _ in outcomes])
+        )
 
+    final_plan, inv_traj, initial_stock, Demand = [], {}, {}, {}
+    for component, (result, _, stats, component_unsolved) in zip(components, outcomes):
+        SOLVE_STATS.extend(stats)
+        if component_unsolved:
+            print("No feasible solution for component", component)
+            if unsolved is not None:
+                unsolved.extend(component_unsolved)
+        final_plan.extend(result[0])
+        inv_traj.update(result[1])
+        initial_stock.update(result[2])
+        Demand.update(result[3])
+    final_plan.sort(key=lambda x: (x["product"]))
+    return final_plan, inv_traj, initial_stock, Demand
 
 
+def frozen_run_stages(run: dict, recipe: dict, line: Lines_Config.LineSpec) -> list[tuple]:
+    """
+    The (line, resource) intervals a planned run occupies, rebuilt from its
+    compiled recipe and the reported start day of each segment's first chain
+    stage (thawing or a BR).
 
-    # Month 1
-    model.Add(
-        inventory[(p, 1)]
-        == products_inventory_protein[p]
-        + sum(usage[(p, r, 1)] for r in range(MAX_RUNS))
-        - demand_chosen[(p, 1)]
-    )
+    Returns:
+        [(l_id, resource, start_day, size), ...] in the run's day offsets.
+    """
+    reported = {st["stage"]: st["start_day"] for st in run["br_stages"]}
+    chain_names = ["CellThawing & SF"] + line.br_names
+    seg_start: dict[int, int] = {}
+    for kind, key, _, seg, offset, _ in recipe["stages"]:
+        if kind == "chain" and seg not in seg_start:
+            stage_name = "CellThawing & SF" if key == 0 else chain_names[key]
+            seg_start[seg] = reported[stage_name] - offset
+    return [
+        (run["line_used"], resource, seg_start[seg] + offset, size)
+        for _, _, resource, seg, offset, size in recipe["stages"]
+    ]
+
+
+def build_schedule_rolling(
+    data: Lines_Config.LinesConfig,
+    demand: dict[str, dict],
+    products_inventory_protein,
+    payload,
+    window: int,
+    step: int = None,
+    symmetry_breaking: bool = False,
+    engine: str = "monolithic",
+    on_solution=None,
+    unsolved: list = None,
+):
+    """
+    Rolling-horizon planning for long monthsCount.
+
+    Solves windows of `window` months (with build_schedule_decomposed), each
+    starting `step` months after the previous one (default: half a window). After
+    each window, the runs that deliver to its first `step` months are frozen:
+
+      - everything they deliver, in any month, is taken off the demand ranges
+        of the later windows;
+      - their stages stay on the (line, resource) NoOverlap of the later windows
+        as fixed intervals (payload.frozenStages, see build_inventory_model);
+      - the inventory at the end of the committed months opens the next window.
+
+    The last window commits everything. Day offsets, months and run indices of
+    the frozen runs are mapped back onto the full horizon. on_solution receives
+    the snapshots of the window being solved (see SolutionStreamer) on the full
+    horizon, after the runs already committed; their inventory covers the
+    window's months. If unsolved is a list, the products a window could not
+    plan are appended to it (all of them when planning stops at a window
+    without any solution).
 
-    # Months 2…TOTAL_MONTHS
-    for m in range(2, TOTAL_MONTHS+1):
-        model.Add(
-            inventory[(p, m)]
-            == inventory[(p, m-1)]
-            + sum(usage[(p, r, m)] for r in range(MAX_RUNS))
-            - demand_chosen[(p, m)]
+    Returns:
+        final_plan, inv_traj, initial stock and chosen demand over the full
+        horizon, as build_schedule_with_inventory.
+    """
+    total_months = TOTAL_MONTHS
+    base_date = BASE_DATE_FOR_PLANNING
+    selected = parse_date_isoformat(payload.selectedDate)
+    step = step or max(1, window // 2)
+    products = [p for p in data.common_lines if p in demand]
+
+    inputs = collect_planning_inputs(data, demand, products_inventory_protein, payload)
+    if inputs is None:
+        return [], {}, {}, {}
+
+    # Committed protein per (product, month) and frozen stage intervals, both on
+    # the full horizon.
+    delivered = {p: {m: 0 for m in range(1, total_months + 1)} for p in products}
+    frozen_stages: list[tuple] = []
+    stock = dict(products_inventory_protein)
+    final_plan = []
+
+    offset = 0
+    while offset < total_months:
+        length = min(window, total_months - offset)
+        last_window = offset + length >= total_months
+        commit = length if last_window else min(step, length)
+        shift = offset * DAYS_PER_MONTH
+        print(
+            f"Rolling window: months {offset + 1}-{offset + length}, "
+            f"committing {offset + 1}-{offset + commit}"
         )
 
-    # 1) sum up all earliness…
-    total_earliness = model.NewIntVar(0, MAX_RUNS * DAYS_PER_MONTH * len(earliness), "total_earliness")
-    model.Add(total_earliness == sum(earliness.values()))
+        window_demand = {}
+        for p in products:
+            window_demand[p] = {}
+            for m in range(1, length + 1):
+                min_req, max_req = demand[p].get(offset + m, (0, 0))
+                done = delivered[p][offset + m]
+                window_demand[p][m] = (max(0, min_req - done), max(0, max_req - done))
+
+        window_payload = SimpleNamespace(
+            busyLines=payload.busyLines or [],
+            selectedDate=(selected + timedelta(days=shift)).strftime(
+                "%Y-%m-%dT%H:%M:%S.000Z"
+            ),
+            monthsCount=length,
+            frozenStages=[
+                (l_id, resource, start - shift, size)
+                for l_id, resource, start, size in frozen_stages
+            ],
+        )
 
-    # pre-compute line volumes (liters → grams):
-    line_capacity = {
-        (p, l): int(line_final_vol[(p, l)] * product_factor[p] / 1000.0)
-        for p in products
-        for l in product_lines[p]
-    }
+        window_solution = None
+        if on_solution is not None:
+            committed = [
+                {
+                    "product": run["product"],
+                    "run_index": run["run_index"],
+                    "line_used": run["line_used"],
+                    "start_day": run["br_stages"][0]["start_day"],
+                    "finish_day": run["finish_day"],
+                    "finish_date": run["finish_date"],
+                    "monthly_usage": run["monthly_usage"],
+                    "liters": run["liters"],
+                }
+                for run in final_plan
+            ]
+
+            def window_solution(snapshot, offset=offset, shift=shift, committed=committed):
+                runs = [
+                    dict(
+                        run,
+                        start_day=None if run["start_day"] is None else run["start_day"] + shift,
+                        finish_day=run["finish_day"] + shift,
+                        monthly_usage={m + offset: q for m, q in run["monthly_usage"].items()},
+                    )
+                    for run in snapshot["final_plan"]
+                ]
+                on_solution(
+                    dict(
+                        snapshot,
+                        final_plan=committed + runs,
+                        inventory_trajectory={
+                            p: {m + offset: v for m, v in traj.items()}
+                            for p, traj in snapshot["inventory_trajectory"].items()
+                        },
+                        window=(offset + 1, offset + length),
+                    )
+                )
 
-    # after you've created demand_chosen[(p,m)]
-    shortfall = {}
-    for p, month_ranges in demand.items():
-        for m, (_, max_req) in month_ranges.items():
-            # max shortfall is max_req
-            sc = model.NewIntVar(0, max_req, f"shortfall_{p}_{m}")
-            shortfall[(p, m)] = sc
-            # shortfall = max_req - demand_chosen
-            model.Add(sc == max_req - demand_chosen[(p, m)])
-            
-    # build a linear expression for “total run capacity”:
-    cap_penalty = []
-    for p in products:
-        for r in range(MAX_RUNS):
-            for l in product_lines[p]:
-                cap_penalty.append(
-                    line_capacity[(p, l)] * use_line[(p, r, l)]
+        set_total_months(length)
+        set_base_date_for_planning(base_date + timedelta(days=shift))
+        window_unsolved: list[str] = []
+        window_plan, window_inv, _, _ = build_schedule_decomposed(
+            data, window_demand, stock, window_payload, {}, {},
+            symmetry_breaking=symmetry_breaking, engine=engine,
+            on_solution=window_solution, unsolved=window_unsolved,
+        )
+        if unsolved is not None:
+            unsolved.extend(window_unsolved)
+        if set(products) <= set(window_unsolved):
+            print("No feasible solution for the rolling window; stopping here.")
+            if unsolved is not None:
+                unsolved.extend(products)
+            break
+
+        for run in window_plan:
+            usage = run["monthly_usage"]
+            if not usage or min(usage) > commit:
+                continue
+            frozen = dict(run)
+            frozen["finish_day"] += shift
+            frozen["release_day"] += shift
+            frozen["expiration_date"] += shift
+            frozen["monthly_usage"] = {m + offset: q for m, q in usage.items()}
+            frozen["br_stages"] = [
+                {**st, "start_day": st["start_day"] + shift, "end_day": st["end_day"] + shift}
+                for st in run["br_stages"]
+            ]
+            for m, q in frozen["monthly_usage"].items():
+                delivered[run["product"]][m] += q
+            key = (run["product"], run["line_used"])
+            frozen_stages.extend(
+                frozen_run_stages(
+                    frozen, inputs["recipes"][key], inputs["product_lines"][key[0]][key[1]]
                 )
+            )
+            final_plan.append(frozen)
 
-    # e.g. α=1000 to give primary weight to earliness, β=1 to break ties by fewer runs
-    a = 3
-    b = 2
-    c = 2 # tiny weight compared to your a/b
+        for p in products:
+            if commit in window_inv.get(p, {}):
+                stock[p] = window_inv[p][commit]
+        offset += commit
 
-    total_shortfall = sum(shortfall.values())
-    model.Minimize(
-        # b*sum(activate_run.values()) +
-        b * total_shortfall +
-        a*total_earliness
-        # c*sum(cap_penalty)
-    )
+    set_total_months(total_months)
+    set_base_date_for_planning(base_date)
 
-    # Solve
-    solver = cp_model.CpSolver()
-    solver.parameters.max_time_in_seconds = 1000
-    solver.parameters.cp_model_presolve = True  # Enable fast presolving to reduce model size
-    solver.parameters.cp_model_probing_level = 2    # 0=off, 1=light, 2=strengthened
-    solver.parameters.symmetry_level = 3  # Enables symmetry breaking during preprocessing
-    solver.parameters.log_search_progress = True
-    solver.parameters.num_search_workers = 6
-    # solver.parameters.keep_all_feasible_solutions_in_presolve = True
+    final_plan.sort(key=lambda x: (x["product"], x["finish_day"]))
+    run_counter: dict[str, int] = {}
+    for run in final_plan:
+        run["run_index"] = run_counter.get(run["product"], 0)
+        run_counter[run["product"]] = run["run_index"] + 1
+
+    # As in extract_inventory_plan, the chosen demand is what the runs deliver,
+    # so the opening stock carries through every month.
+    initial_stock = {p: products_inventory_protein[f"{p}"] for p in products}
+    Demand = {p: dict(delivered[p]) for p in products}
+    inv_traj = {
+        p: {m: initial_stock[p] for m in range(1, total_months + 1)} for p in products
+    }
+    print("Inventory Start => ", inv_traj)
+    return final_plan, inv_traj, initial_stock, Demand
 
-    # solver.parameters.stop_after_first_solution = True
-    
-    status = solver.Solve(model)
-    if status not in [cp_model.OPTIMAL, cp_model.FEASIBLE]:
-        print("No feasible solution.")
-        return [], {}
+
+def _stage_row(stage: str, start_day: int, end_day: int) -> dict:
+    return {
+        "stage": stage,
+        "start_day": start_day,
+        "end_day": end_day,
+        "start_date": day_to_date(start_day),
+        "end_date": day_to_date(end_day),
+    }
+
+
+def stage_values(solver, run_stages: dict[int, dict]) -> dict[int, dict]:
+    """
+    The stage registry of one run (build_inventory_model's stage_vars entry)
+    with every start and end replaced by its value in the solution.
+    """
+    def pair(se):
+        return solver.Value(se[0]), solver.Value(se[1])
+
+    values = {}
+    for key, entry in run_stages.items():
+        values[key] = {
+            "start": solver.Value(entry["start"]),
+            "end": solver.Value(entry["end"]),
+            "mabs": [pair(se) for se in entry["mabs"]],
+            "sss": [pair(se) for se in entry["sss"]],
+            "fu": {name: pair(se) for name, se in entry["fu"].items()},
+        }
+        for kind in ("harvest", "hold"):
+            if kind in entry:
+                values[key][kind] = pair(entry[kind])
+    return values
+
+
+def stage_rows(run_stages: dict[int, dict], line: Lines_Config.LineSpec) -> list[dict]:
+    """
+    The br_stages of a final_plan run from its stage registry in days (see
+    stage_values): thawing, then per BR the BR, its Harvest, Hold, Mab, SS and
+    Follow-Up stages; FU stages in Lines.json order, not scheduling order.
+    """
+    rows = [_stage_row("CellThawing & SF", run_stages[0]["start"], run_stages[0]["end"])]
+    for i, br in enumerate(line.brs):
+        brn = br.name
+        entry = run_stages[i + 1]
+        rows.append(_stage_row(brn, entry["start"], entry["end"]))
+        if "harvest" in entry:
+            rows.append(_stage_row(f"Harvest {brn}", *entry["harvest"]))
+        if "hold" in entry:
+            rows.append(_stage_row(f"Hold {brn}", *entry["hold"]))
+        for mab_idx, (st, en) in enumerate(entry["mabs"], start=1):
+            rows.append(_stage_row(f"Mab {mab_idx} {brn}", st + 1, en + 1))
+        for sss_idx, (st, en) in enumerate(entry["sss"], start=1):
+            rows.append(_stage_row(f"SS {sss_idx} {brn}", st + 1, en + 1))
+        for fu in br.follow_up or ():
+            if fu.name in entry["fu"]:
+                rows.append(_stage_row(f"FU {fu.name}", *entry["fu"][fu.name]))
+    return rows
+
+
+def extract_inventory_plan(solver, ctx: dict):
+    """
+    Read final_plan, the inventory trajectory, the initial stock and the chosen
+    demand out of a solved model built by build_inventory_model.
+
+    `solver` is anything with a Value() method (CpSolver or a solution callback).
+    """
+    products = ctx["products"]
+    product_lines = ctx["product_lines"]
+    product_factor = ctx["product_factor"]
+    n_runs = ctx["n_runs"]
+    activate_run = ctx["activate_run"]
+    use_line = ctx["use_line"]
+    stage_vars = ctx["stage_vars"]
+    finish_time = ctx["finish_time"]
+    expiration_date = ctx["expiration_date"]
+    produced_liters = ctx["produced_liters"]
+    usage = ctx["usage"]
+    first_month = ctx["first_month"]
+    demand_chosen = ctx["demand_chosen"]
+    inventory = ctx["inventory"]
+    products_inventory_protein = ctx["products_inventory_protein"]
 
     inventory_solution = {}
     for p in products:
@@ -1367,17 +3074,12 @@ def build_schedule_with_inventory(
     # 7) Build final plan (updated for partial usage / Scenario B)
     final_plan = []
     for p in products:
-        for r in range(MAX_RUNS):
+        for r in range(n_runs[p]):
             if solver.Value(activate_run[(p, r)]) == 0:
                 continue
 
-            # Check if the run is valid in at least one month.
-            valid_run = False
-            for m in range(1, TOTAL_MONTHS + 1):
-                if solver.Value(isValid[(p, r, m)]) == 1:
-                    valid_run = True
-                    break
-            if not valid_run:
+            # Check if the run can supply at least one month of the horizon.
+            if solver.Value(first_month[(p, r)]) > TOTAL_MONTHS:
                 continue
 
             # Get run information
@@ -1408,116 +3110,10 @@ def build_schedule_with_inventory(
             # Gather the stage details (same as before)
             br_stages = []
             if used_line_id is not None:
-                # Thawing stage.
-                thaw_stage = {
-                    "stage": "CellThawing & SF",
-                    "start_day": solver.Value(stage_start[(p, r, used_line_id, 0)]),
-                    "end_day": solver.Value(stage_end[(p, r, used_line_id, 0)]),
-                    "start_date": day_to_date(
-                        solver.Value(stage_start[(p, r, used_line_id, 0)])
-                    ),
-                    "end_date": day_to_date(
-                        solver.Value(stage_end[(p, r, used_line_id, 0)])
-                    ),
-                }
-                br_stages.append(thaw_stage)
-                l_conf = product_lines[p][used_line_id]
-                br_names = list(l_conf["BRs"].keys())
-                for i, brn in enumerate(br_names):
-                    stage_key = i + 1
-                    s_val = solver.Value(stage_start[(p, r, used_line_id, stage_key)])
-                    e_val = solver.Value(stage_end[(p, r, used_line_id, stage_key)])
-                    stage_dict = {
-                        "stage": brn,
-                        "start_day": s_val,
-                        "end_day": e_val,
-                        "start_date": day_to_date(s_val),
-                        "end_date": day_to_date(e_val),
-                    }
-                    br_stages.append(stage_dict)
-                    if (p, r, used_line_id, stage_key) in harvest_vars:
-                        harv_s = solver.Value(
-                            harvest_vars[(p, r, used_line_id, stage_key)][0]
-                        )
-                        harv_e = solver.Value(
-                            harvest_vars[(p, r, used_line_id, stage_key)][1]
-                        )
-                        harvest_dict = {
-                            "stage": f"Harvest {brn}",
-                            "start_day": harv_s,
-                            "end_day": harv_e,
-                            "start_date": day_to_date(harv_s),
-                            "end_date": day_to_date(harv_e),
-                        }
-                        br_stages.append(harvest_dict)
-                    if (p, r, used_line_id, stage_key) in hold_vars:
-                        hold_s = solver.Value(
-                            hold_vars[(p, r, used_line_id, stage_key)][0]
-                        )
-                        hold_e = solver.Value(
-                            hold_vars[(p, r, used_line_id, stage_key)][1]
-                        )
-                        hold_dict = {
-                            "stage": f"Hold {brn}",
-                            "start_day": hold_s,
-                            "end_day": hold_e,
-                            "start_date": day_to_date(hold_s),
-                            "end_date": day_to_date(hold_e),
-                        }
-                        br_stages.append(hold_dict)
-                    # Mab stages and Follow-Up stages
-                    mab_idx = 1
-                    while (p, r, used_line_id, stage_key, mab_idx) in mab_vars:
-                        mab_st = solver.Value(
-                            mab_vars[(p, r, used_line_id, stage_key, mab_idx)][0] + 1
-                        )
-                        mab_e = solver.Value(
-                            mab_vars[(p, r, used_line_id, stage_key, mab_idx)][1] + 1
-                        )
-                        mab_dict = {
-                            "stage": f"Mab {mab_idx} {brn}",
-                            "start_day": mab_st,
-                            "end_day": mab_e,
-                            "start_date": day_to_date(mab_st),
-                            "end_date": day_to_date(mab_e),
-                        }
-                        br_stages.append(mab_dict)
-                        mab_idx += 1
-                    # Insert a similar loop for the SS's that you stored under mab_vars with an offset like 1000+sss_idx
-                    sss_idx = 1001
-                    while (p, r, used_line_id, stage_key, sss_idx) in mab_vars:
-                        sss_st = solver.Value(
-                            mab_vars[(p, r, used_line_id, stage_key, sss_idx)][0] + 1
-                        )
-                        sss_e = solver.Value(
-                            mab_vars[(p, r, used_line_id, stage_key, sss_idx)][1] + 1
-                        )
-                        sss_dict = {
-                            "stage": f"SS {sss_idx - 1000} {brn}",
-                            "start_day": sss_st,
-                            "end_day": sss_e,
-                            "start_date": day_to_date(sss_st),
-                            "end_date": day_to_date(sss_e),
-                        }
-                        br_stages.append(sss_dict)
-                        sss_idx += 1
-
-                    fu_key = f"Follow_Up_{brn}"
-                    if fu_key in l_conf:
-                        fu_dict = l_conf[fu_key]
-                        for fu_name, fu_duration in fu_dict.items():
-                            fu_var_key = (p, r, used_line_id, stage_key, fu_name)
-                            if fu_var_key in fu_vars:
-                                fu_st = solver.Value(fu_vars[fu_var_key][0])
-                                fu_e = solver.Value(fu_vars[fu_var_key][1])
-                                fu_dict_out = {
-                                    "stage": f"FU {fu_name}",
-                                    "start_day": fu_st,
-                                    "end_day": fu_e,
-                                    "start_date": day_to_date(fu_st),
-                                    "end_date": day_to_date(fu_e),
-                                }
-                                br_stages.append(fu_dict_out)
+                br_stages = stage_rows(
+                    stage_values(solver, stage_vars[(p, r, used_line_id)]),
+                    product_lines[p][used_line_id],
+                )
 
             # Determine a release day:
             release_day = None
@@ -1571,7 +3167,7 @@ def build_schedule_with_inventory(
             # Sum the production allocated to product p in period m over all runs.
             # Here, usage[(p, r, m)] is the CP variable from which we get the solver’s value.
             monthly_production = sum(
-                solver.Value(usage[(p, r, m)]) for r in range(MAX_RUNS)
+                solver.Value(usage[(p, r, m)]) for r in range(n_runs[p])
             )
             monthly_demand = int(math.ceil(solver.Value(demand_chosen[(p,m)])))
             
@@ -1748,10 +3344,8 @@ def print_production_runs_detail(final_plan) -> str:
             Data_Json.append(
                 f"{line_used!s:<6} {start_date:<12} {liter:>10.2f}"
             )
-            
-            
-            df = pd.DataFrame(Data_Json)
-    print(df)
+
+    print(pd.DataFrame(Data_Json))
             
     return "\n".join(lines)
 
@@ -1792,8 +3386,8 @@ def print_aggregated_inventory(final_plan, demand, max_period, products_inventor
             period_label = f"{period_start_date} - {period_end_date}"
             dem_val = int(math.ceil(demand[prod].get(m, 0)))
             np_val = new_prod.get(prod, {}).get(m, 0)
-            inv_start = inv_by_period[prod].get(m - 1, 0)
-            inv_end = inv_by_period[prod].get(m, 0)
+            inv_start = inv_by_period.get(prod, {}).get(m - 1, 0)
+            inv_end = inv_by_period.get(prod, {}).get(m, 0)
             balance = (inv_start + np_val) - dem_val
             balance_text = (
                 f"Surplus: {balance:.2f}"
@@ -2030,52 +3624,46 @@ def Output_Printers(final_plan: list[dict], inv_traj: dict[str, dict], demand, p
     return front_payload, lines, lines_detail
 
 # --- MODIFIED CODE in main() to handle AryoSeven_RC with a separate planner ---
-def main(total_products_protein_per_month, products_inventory_protein, payload, export_stock_protein, sales_stock_protein, covers_dict):
+def main(total_products_protein_per_month, products_inventory_protein, payload, aggregated, on_solution=None):
+    """
+    Plan one request.
+
+    Args:
+        aggregated: { product: { month: (min, max) } } grams of protein to
+            deliver, from Protein_Demand.demand_ranges.
+    """
     print("run with extended schedule (can start before day 0)...")
-    with open("E:\Sherkat_DeepSpring_projects\Aryogen_Planning\Data\Lines.json", "r") as f:
-        data = json.load(f)
+    data = Lines_Config.load_config(LINES_JSON_PATH)
     
     base_date = parse_base_date(payload.selectedDate)
     set_base_date_for_planning(base_date)
     set_total_months(payload.monthsCount)
+    set_solver_profile(getattr(payload, "solverProfile", None))
+    print("Solver profile =>", SOLVER_PROFILE)
+    SOLVE_STATS.clear()
 
-    demand_Export: dict[str, dict[int, float]] = {}
     demand_Sales:  dict[str, dict[int, float]] = {}
-    stock_ranges: dict[str, dict[str, dict[int, dict[str, float]]]] = {}
-    aggregated: dict[str, dict[int, tuple[int, int]]] = {}
-
-
-    for product, doses in sales_stock_protein.items():
-        stock_ranges[product] = {}
-        for dose, monthly_sales in doses.items():
-            key = f"{product} {dose}"
-            min_mult, max_mult = covers_dict.get(key, (1.0, 1.0))
-            stock_ranges[product][dose] = {}
-
-            for month, sales in monthly_sales.items():
-                demand_min = float(sales) * min_mult
-                demand_max = float(sales) * max_mult
-                export_qty = float(export_stock_protein[product][dose].get(month, 0.0))
-                stock_ranges[product][dose][month] = [
-                    math.ceil(export_qty + demand_min),
-                    math.ceil(export_qty + demand_max)
-                ]
-                
-    for product, doses in stock_ranges.items():
-        monthly_totals: dict[int, list[int]] = {}
-
-        for dose_ranges in doses.values():
-            for month, (low, high) in dose_ranges.items():
-                if month not in monthly_totals:
-                    monthly_totals[month] = [0, 0]
-                monthly_totals[month][0] += low
-                monthly_totals[month][1] += high
-
-        aggregated[product] = {
-            month: (totals[0], totals[1])
-            for month, totals in monthly_totals.items()
-        }
     print("Demand dict after distribution:\n", aggregated)
+
+    # Reject demand the active lines clearly cannot meet before building a model.
+    check_started = time.perf_counter()
+    inputs = collect_planning_inputs(data, aggregated, products_inventory_protein, payload)
+    shortfall = {}
+    if inputs is not None:
+        shortfall = compute_capacity_shortfall(inputs, aggregated, products_inventory_protein)
+    capacity_check_seconds = time.perf_counter() - check_started
+    if shortfall:
+        print("Minimum demand exceeds line capacity =>", shortfall)
+        return {
+            "status": "INFEASIBLE",
+            "capacity_shortfall": shortfall,
+            "demand": aggregated,
+            "telemetry": {
+                "stages": {"capacity_check": capacity_check_seconds},
+                "solves": [],
+                "peak_rss_bytes": peak_rss_bytes(),
+            },
+        }
     
     
             
@@ -2088,13 +3676,36 @@ def main(total_products_protein_per_month, products_inventory_protein, payload,
     if "AryoSeven_RC" in demand_Sales:
         del demand_Sales["AryoSeven_RC"]
 
+    # Hints from the last plan solved for the same products and horizon.
+    warm_key = warm_start_key([p for p in data.common_lines if p in aggregated], payload)
+    warm_start = load_warm_start(warm_key)
+    warm_start_report = {"status": "none" if warm_start is None else "skipped"}
+    unsolved: list[str] = []
+
     # The rest of products (including AryoSeven_BR) go through the normal build_schedule_with_inventory
-    final_plan, inv_traj, initial_stock, Demand = build_schedule_with_inventory(data, aggregated, products_inventory_protein, payload, demand_Export, stock_ranges)
+    if payload.rollingWindow and payload.rollingWindow < payload.monthsCount:
+        final_plan, inv_traj, initial_stock, Demand = build_schedule_rolling(
+            data, aggregated, products_inventory_protein, payload,
+            payload.rollingWindow, payload.rollingStep,
+            symmetry_breaking=payload.symmetryBreaking, engine=payload.engine,
+            on_solution=on_solution, unsolved=unsolved,
+        )
+    else:
+        final_plan, inv_traj, initial_stock, Demand = build_schedule_decomposed(data, aggregated, products_inventory_protein, payload, {}, {}, symmetry_breaking=payload.symmetryBreaking, engine=payload.engine, warm_start=warm_start, warm_start_report=warm_start_report, on_solution=on_solution, unsolved=unsolved)
+    unsolved = list(dict.fromkeys(unsolved))
+    unmet_minimum = unmet_minimum_demand(aggregated, Demand)
+    if unmet_minimum:
+        print("Minimum demand not met =>", unmet_minimum)
     
     if not final_plan:
         print(
             "No feasible total plan found with extended schedule. Possibly no runs were activated."
         )
+    elif unsolved:
+        # A partial plan would hint the next solve towards leaving them out.
+        print("No plan for =>", unsolved, "(warm start not saved)")
+    else:
+        save_warm_start(warm_key, final_plan)
         
     if not final_plan_RC and not final_plan:
         print(
@@ -2108,12 +3719,26 @@ def main(total_products_protein_per_month, products_inventory_protein, payload,
         inv_traj[k] = v
 
     
+    printers_started = time.perf_counter()
     front_payload, lines, lines_detail = Output_Printers(combined_plan, inv_traj, Demand, products_inventory_protein)
+    telemetry = {
+        "stages": {
+            "capacity_check": capacity_check_seconds,
+            "model_build": sum(s["build_seconds"] or 0 for s in SOLVE_STATS),
+            "solve": sum(s["solve_seconds"] for s in SOLVE_STATS),
+            "output_printers": time.perf_counter() - printers_started,
+        },
+        "solves": list(SOLVE_STATS),
+        "peak_rss_bytes": peak_rss_bytes(),
+    }
     # or build your final payload from combined results
     
     # Create a payload to return
     payload = {
-        "status": "OK",
+        "status": "PARTIAL" if unsolved or unmet_minimum else "OK",
+        "unsolved_products": unsolved,
+        "minimum_demand_met": not unmet_minimum,
+        "unmet_minimum": unmet_minimum,
         "final_plan": combined_plan,
         "inventory_trajectory": front_payload[0],
         "runs_detail": lines,
@@ -2122,6 +3747,8 @@ def main(total_products_protein_per_month, products_inventory_protein, payload,
         "demand": demand_Sales,
         "feasible_capacity": demand_Sales,
         "initial_stock": initial_stock,
+        "warm_start": warm_start_report,
+        "telemetry": telemetry,
     }
     return payload
 
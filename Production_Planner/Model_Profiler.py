@@ -0,0 +1,114 @@
+import time
+
+from ortools.sat.python import cp_model
+
+PROFILE_COLUMNS = ["variables", "booleans", "domain_values", "max_domain",
+                   "constraints", "reified", "intervals", "build_seconds"]
+
+
+class ModelProfiler:
+    """
+    Tags the variables and constraints of a CP-SAT model with the family that
+    created them, while the model is built.
+
+    The model builder calls the profiler with a family name at the start of
+    every block, e.g. profile("usage"): everything added to the model from
+    then until the next call, and the time it took, is counted for that family.
+    A family may come back any number of times (e.g. once per run slot, with
+    other families in between). Whatever is added before the first call is
+    reported as "untagged".
+    """
+
+    def __init__(self, model: cp_model.CpModel):
+        self.model = model
+        self._spans: list[tuple[str, int, int, float]] = []  # (family, variables, constraints, time) at each call
+        self._closed = None
+
+    def __call__(self, family: str):
+        proto = self.model.Proto()
+        self._spans.append(
+            (family, len(proto.variables), len(proto.constraints), time.perf_counter())
+        )
+
+    def close(self):
+        """
+        End the last family; called once the model is complete.
+        """
+        proto = self.model.Proto()
+        self._closed = (len(proto.variables), len(proto.constraints), time.perf_counter())
+
+    def report(self) -> dict[str, dict]:
+        """
+        Size of every family, largest (by variables plus constraints) first.
+
+        Returns:
+            {family: {"variables", "booleans", "domain_values", "max_domain",
+                      "constraints", "reified", "intervals", "build_seconds"}}
+            where domain_values is the sum of the domain sizes of its variables
+            and reified counts the constraints with an enforcement literal.
+        """
+        if self._closed is None:
+            self.close()
+        proto = self.model.Proto()
+        variables, constraints = proto.variables, proto.constraints
+        owner_v = ["untagged"] * len(variables)
+        owner_c = ["untagged"] * len(constraints)
+        report = {}
+        bounds = self._spans[1:] + [(None, *self._closed)]
+        for (family, v0, c0, t0), (_, v1, c1, t1) in zip(self._spans, bounds):
+            owner_v[v0:v1] = [family] * (v1 - v0)
+            owner_c[c0:c1] = [family] * (c1 - c0)
+            row = report.setdefault(family, dict.fromkeys(PROFILE_COLUMNS, 0))
+            row["build_seconds"] += t1 - t0
+
+        for i, var in enumerate(variables):
+            row = report.setdefault(owner_v[i], dict.fromkeys(PROFILE_COLUMNS, 0))
+            domain = list(var.domain)
+            size = sum(hi - lo + 1 for lo, hi in zip(domain[::2], domain[1::2]))
+            row["variables"] += 1
+            row["booleans"] += domain == [0, 1]
+            row["domain_values"] += size
+            row["max_domain"] = max(row["max_domain"], size)
+        for i, ct in enumerate(constraints):
+            row = report.setdefault(owner_c[i], dict.fromkeys(PROFILE_COLUMNS, 0))
+            row["constraints"] += 1
+            row["reified"] += len(ct.enforcement_literal) > 0
+            row["intervals"] += ct.has_interval()
+
+        return dict(
+            sorted(
+                report.items(),
+                key=lambda item: item[1]["variables"] + item[1]["constraints"],
+                reverse=True,
+            )
+        )
+
+
+def no_profile(family: str):
+    """
+    Stand-in for a ModelProfiler when the model is not profiled.
+    """
+
+
+def format_profile(report: dict[str, dict]) -> str:
+    """
+    ModelProfiler.report as a table, with a total row.
+    """
+    header = (
+        f"{'Family':<18} {'Vars':>8} {'Bools':>8} {'Dom. values':>12} {'Max dom.':>9} "
+        f"{'Cons':>8} {'Reified':>8} {'Intervals':>9} {'Build ms':>9}"
+    )
+
+    def line(name, row):
+        return (
+            f"{name:<18} {row['variables']:>8} {row['booleans']:>8} {row['domain_values']:>12} "
+            f"{row['max_domain']:>9} {row['constraints']:>8} {row['reified']:>8} "
+            f"{row['intervals']:>9} {1000 * row['build_seconds']:>9.1f}"
+        )
+
+    total = {c: sum(row[c] for row in report.values()) for c in PROFILE_COLUMNS}
+    total["max_domain"] = max((row["max_domain"] for row in report.values()), default=0)
+    rows = [header, "-" * len(header)]
+    rows.extend(line(name, row) for name, row in report.items())
+    rows.extend(["-" * len(header), line("total", total)])
+    return "\n".join(rows)
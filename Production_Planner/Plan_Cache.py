@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+CACHE_DIR = r"E:\Sherkat_DeepSpring_projects\Aryogen_Planning\Data\plan_cache"
+MEMORY_ENTRIES = 32  # Results kept in the in-memory tier
+DISK_MAX_BYTES = 512 * 1024 * 1024  # Size of the on-disk tier before eviction
+
+
+def canonical_json(value: Any) -> str:
+    """
+    Serialize a JSON-like value with sorted keys and no whitespace, so equal
+    payloads always give the same text whatever the key order they came in.
+    """
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+
+
+_file_digests: dict[str, tuple[int, int, str]] = {}
+
+
+def file_digest(path: str) -> str:
+    """
+    SHA-256 of a file's content, recomputed only when its mtime or size changes.
+    """
+    st = os.stat(path)
+    known = _file_digests.get(path)
+    if known is not None and known[:2] == (st.st_mtime_ns, st.st_size):
+        return known[2]
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+    _file_digests[path] = (st.st_mtime_ns, st.st_size, digest)
+    return digest
+
+
+def plan_cache_key(payload: dict, input_files: list[str]) -> str:
+    """
+    Content address of a plan request: the canonical payload plus the content
+    of every input file the plan is computed from.
+
+    Args:
+        payload: the request payload as a plain dict (PlanPayload.model_dump()).
+        input_files: paths of the data files read while planning.
+    Returns:
+        A hex SHA-256 digest.
+    """
+    h = hashlib.sha256(canonical_json(payload).encode("utf-8"))
+    for path in input_files:
+        h.update(file_digest(path).encode("ascii"))
+    return h.hexdigest()
+
+
+class PlanCache:
+    """
+    Two-tier result cache: an in-memory LRU of `memory_entries` results in front
+    of a directory of pickled results, evicted least recently used first once it
+    grows past `disk_max_bytes`. A disk hit is promoted to the memory tier.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = CACHE_DIR,
+        memory_entries: int = MEMORY_ENTRIES,
+        disk_max_bytes: int = DISK_MAX_BYTES,
+    ):
+        self.cache_dir = cache_dir
+        self.memory_entries = memory_entries
+        self.disk_max_bytes = disk_max_bytes
+        self._memory: OrderedDict[str, Any] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def _remember(self, key: str, value: Any):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> tuple[Optional[str], Any]:
+        """
+        Look a result up.
+
+        Returns:
+            ("memory", value), ("disk", value) or (None, None) on a miss.
+        """
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return "memory", self._memory[key]
+
+            path = self._path(key)
+            try:
+                with open(path, "rb") as f:
+                    value = pickle.load(f)
+                os.utime(path)  # mtime is the recency used by the disk eviction
+            except FileNotFoundError:
+                return None, None
+            except (OSError, pickle.UnpicklingError, EOFError):
+                print("Dropping unreadable plan cache entry", path)
+                self._discard(path)
+                return None, None
+            self._remember(key, value)
+            return "disk", value
+
+    def put(self, key: str, value: Any):
+        """
+        Store a result in both tiers and evict from disk if it grew too large.
+        """
+        with self._lock:
+            self._remember(key, value)
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._path(key)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+            self._evict_disk()
+
+    def clear(self):
+        """
+        Empty both tiers.
+        """
+        with self._lock:
+            self._memory.clear()
+            for path, _, _ in self._disk_entries():
+                self._discard(path)
+
+    def _disk_entries(self) -> list[tuple[str, int, float]]:
+        if not os.path.isdir(self.cache_dir):
+            return []
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".pkl"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((path, st.st_size, st.st_mtime))
+        return entries
+
+    def _evict_disk(self):
+        entries = self._disk_entries()
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in sorted(entries, key=lambda e: e[2]):
+            if total <= self.disk_max_bytes:
+                break
+            self._discard(path)
+            total -= size
+
+    @staticmethod
+    def _discard(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
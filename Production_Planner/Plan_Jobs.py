@@ -0,0 +1,315 @@
+import multiprocessing
+import os
+import signal
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+JOB_WORKERS = int(os.environ.get("PLAN_JOB_WORKERS", "2"))  # Solves running at once
+FINISHED_JOBS_KEPT = 200  # Finished jobs whose status and result stay available
+CANCEL_GRACE_SECONDS = 5.0  # Without process groups: time a cancelled job gets to stop its solves
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+def _job_entry(conn, target: Callable, payload: dict, stop_event):
+    """
+    Entry point of a job process: run target(payload, on_solution, stop_event),
+    sending ("solution", snapshot) for every snapshot passed to on_solution and
+    finally ("ok", result) or ("error", traceback).
+    """
+    _start_process_group()
+    send_lock = threading.Lock()
+
+    def on_solution(snapshot):
+        with send_lock:
+            conn.send(("solution", snapshot))
+
+    try:
+        result = target(payload, on_solution, stop_event)
+        with send_lock:
+            conn.send(("ok", result))
+    except BaseException:
+        with send_lock:
+            conn.send(("error", traceback.format_exc()))
+    finally:
+        conn.close()
+
+
+def _start_process_group():
+    """
+    Make the job process the leader of its own process group, so the solver
+    processes it starts (the decomposition's component workers) can be killed
+    with it. No-op where process groups do not exist (Windows).
+    """
+    if hasattr(os, "setpgrp"):
+        os.setpgrp()
+
+
+def _end_job_process(process, grace: float = CANCEL_GRACE_SECONDS):
+    """
+    Kill a cancelled job process and every process it started. Where process
+    groups exist the job's whole group is killed at once; elsewhere the job,
+    whose stop event is already set (which also stops its component workers'
+    solves), gets `grace` seconds to wind down its process pool before it is
+    terminated.
+    """
+    if hasattr(os, "killpg"):
+        try:
+            os.killpg(process.pid, signal.SIGTERM)
+            return
+        except (ProcessLookupError, PermissionError):
+            pass  # The job has not made its group yet, so it has no children either
+    else:
+        process.join(grace)
+    if process.is_alive():
+        process.terminate()
+
+
+class PlanJobs:
+    """
+    Runs plan solves in worker processes so the API never waits on CP-SAT.
+
+    At most `workers` jobs run at once, each in its own spawned process; the
+    others wait in submission order. A job process is not reused, so a running
+    job can be cancelled by terminating it, and a crash in one solve never takes
+    down another. `target` must be a module-level function (it is pickled into
+    the job process) called as target(payload, on_solution, stop_event): it
+    passes every intermediate solution to on_solution, and returns its result
+    early once stop_event is set (see stop).
+
+    Every job carries a `key`: a job submitted while another with the same key
+    is still queued or running is answered with the existing job, and
+    `on_done(key, result)` is called in this process for every job that
+    finished without being stopped early, and `on_finish(status, result)` for
+    every job that ended, however it ended (status as returned by status()).
+    """
+
+    def __init__(
+        self,
+        target: Callable[[dict], Any],
+        workers: int = JOB_WORKERS,
+        on_done: Optional[Callable[[str, Any], None]] = None,
+        on_finish: Optional[Callable[[dict, Any], None]] = None,
+    ):
+        self.target = target
+        self.workers = workers
+        self.on_done = on_done
+        self.on_finish = on_finish
+        self._slots = threading.Semaphore(workers)
+        self._jobs: OrderedDict[str, dict] = OrderedDict()
+        self._lock = threading.Lock()
+        self._mp = multiprocessing.get_context("spawn")
+
+    def submit(self, payload: dict, key: str) -> str:
+        """
+        Queue a solve and return its job id without waiting for it.
+        """
+        with self._lock:
+            for job in self._jobs.values():
+                if job["key"] == key and job["status"] in (QUEUED, RUNNING):
+                    return job["id"]
+            job = self._new_job(key)
+            job["payload"] = payload
+        threading.Thread(target=self._run, args=(job,), daemon=True).start()
+        return job["id"]
+
+    def add_finished(self, key: str, result: Any) -> str:
+        """
+        Record a job whose result is already known (e.g. from the plan cache).
+        """
+        with self._lock:
+            job = self._new_job(key)
+            job.update(status=DONE, result=result, started_at=job["submitted_at"],
+                       finished_at=job["submitted_at"], stop_event=None)
+            self._prune()
+        return job["id"]
+
+    def status(self, job_id: str) -> Optional[dict]:
+        """
+        Public view of a job (everything but the payload and the result), or
+        None for an unknown id.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return None if job is None else self._public(job)
+
+    def counts(self) -> dict[str, int]:
+        """
+        Number of known jobs per status.
+        """
+        counts = {status: 0 for status in (QUEUED, RUNNING, DONE, FAILED, CANCELLED)}
+        with self._lock:
+            for job in self._jobs.values():
+                counts[job["status"]] += 1
+        return counts
+
+    def result(self, job_id: str) -> tuple[Optional[str], Any]:
+        """
+        Returns:
+            (status, result); result is None unless status is "done", and status
+            is None for an unknown id.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None, None
+            return job["status"], job["result"]
+
+    def latest(self, job_id: str) -> tuple[int, Any]:
+        """
+        Returns:
+            (number of intermediate solutions so far, the latest one or None).
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return 0, None
+            return job["solutions"], job["latest"]
+
+    def stop(self, job_id: str) -> Optional[str]:
+        """
+        Ask a queued or running job to finish with the best solution it has; it
+        then ends "done" with a complete result instead of being cancelled.
+
+        Returns:
+            The job's status after the call, or None for an unknown id.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job["status"] in (QUEUED, RUNNING):
+                job["stop_requested"] = True
+                job["stop_event"].set()
+            return job["status"]
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        """
+        Cancel a queued or running job; finished jobs are left as they are. A
+        running job is killed together with the solver processes it started
+        (see _end_job_process).
+
+        Returns:
+            The job's status after the call, or None for an unknown id.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job["status"] not in (QUEUED, RUNNING):
+                return job["status"]
+            job["status"] = CANCELLED
+            job["finished_at"] = time.time()
+            job["stop_event"].set()
+            process = job["process"]
+        if process is not None and process.is_alive():
+            threading.Thread(target=_end_job_process, args=(process,), daemon=True).start()
+        return CANCELLED
+
+    def _new_job(self, key: str) -> dict:
+        job = {
+            "id": uuid.uuid4().hex,
+            "key": key,
+            "status": QUEUED,
+            "submitted_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "error": None,
+            "result": None,
+            "payload": None,
+            "process": None,
+            "solutions": 0,
+            "latest": None,
+            "best_objective": None,
+            "stop_requested": False,
+            "stop_event": self._mp.Event(),
+        }
+        self._jobs[job["id"]] = job
+        return job
+
+    @staticmethod
+    def _public(job: dict) -> dict:
+        return {
+            k: job[k]
+            for k in (
+                "id", "status", "submitted_at", "started_at", "finished_at",
+                "error", "solutions", "best_objective", "stop_requested",
+            )
+        }
+
+    def _prune(self):
+        finished = [
+            job_id for job_id, job in self._jobs.items()
+            if job["status"] in (DONE, FAILED, CANCELLED)
+        ]
+        for job_id in finished[: max(0, len(finished) - FINISHED_JOBS_KEPT)]:
+            del self._jobs[job_id]
+
+    def _run(self, job: dict):
+        self._execute(job)
+        if self.on_finish is not None:
+            with self._lock:
+                status = self._public(job)
+            self.on_finish(status, job["result"])
+
+    def _execute(self, job: dict):
+        with self._slots:
+            with self._lock:
+                if job["status"] == CANCELLED:
+                    return
+                receiver, sender = self._mp.Pipe(duplex=False)
+                process = self._mp.Process(
+                    target=_job_entry,
+                    args=(sender, self.target, job["payload"], job["stop_event"]),
+                )
+                job.update(status=RUNNING, started_at=time.time(), process=process,
+                           payload=None)
+                process.start()
+            sender.close()
+
+            # Read before joining: a large result would otherwise fill the pipe
+            # and block the job process forever.
+            message = None
+            while process.is_alive() or receiver.poll():
+                if not receiver.poll(0.5):
+                    continue
+                try:
+                    message = receiver.recv()
+                except EOFError:
+                    break
+                if message[0] != "solution":
+                    break
+                with self._lock:
+                    job["solutions"] += 1
+                    job["latest"] = message[1]
+                    job["best_objective"] = message[1].get("objective")
+                message = None
+            process.join()
+            receiver.close()
+
+        with self._lock:
+            job["process"] = None
+            if job["status"] == CANCELLED:
+                self._prune()
+                return
+            job["finished_at"] = time.time()
+            if message is not None and message[0] == "ok":
+                job.update(status=DONE, result=message[1])
+            else:
+                job.update(
+                    status=FAILED,
+                    error=message[1] if message is not None
+                    else f"job process exited with code {process.exitcode}",
+                )
+            self._prune()
+        # A stopped job's result is only as good as the solver got in time.
+        if job["status"] == DONE and not job["stop_requested"] and self.on_done is not None:
+            self.on_done(job["key"], job["result"])
@@ -0,0 +1,155 @@
+import math
+import threading
+from typing import Optional
+
+SECONDS_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600, 1200, 3600)
+SIZE_BUCKETS = (100, 500, 1_000, 5_000, 10_000, 50_000, 100_000, 500_000, 1_000_000)
+GAP_BUCKETS = (0, 0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 500)
+BYTES_BUCKETS = tuple(2**i * 1024 * 1024 for i in range(7, 16))  # 128 MB .. 16 GB
+
+
+def _labels_text(labels: tuple) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in labels
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """
+    Counters, gauges and histograms in the Prometheus text exposition format
+    (version 0.0.4), without the prometheus_client dependency.
+
+    Metrics are declared once with counter/gauge/histogram and then updated by
+    name with inc/set/observe and a dict of labels.
+    """
+
+    def __init__(self):
+        self._meta: dict[str, tuple[str, str, tuple]] = {}  # name -> (type, help, buckets)
+        self._values: dict[str, dict[tuple, object]] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str):
+        self._declare(name, "counter", help_text)
+
+    def gauge(self, name: str, help_text: str):
+        self._declare(name, "gauge", help_text)
+
+    def histogram(self, name: str, help_text: str, buckets: tuple = SECONDS_BUCKETS):
+        self._declare(name, "histogram", help_text, tuple(sorted(buckets)))
+
+    def _declare(self, name: str, kind: str, help_text: str, buckets: tuple = ()):
+        with self._lock:
+            self._meta[name] = (kind, help_text, buckets)
+            self._values.setdefault(name, {})
+
+    @staticmethod
+    def _key(labels: Optional[dict]) -> tuple:
+        return tuple(sorted((labels or {}).items()))
+
+    def inc(self, name: str, labels: dict = None, amount: float = 1):
+        with self._lock:
+            series = self._values[name]
+            key = self._key(labels)
+            series[key] = series.get(key, 0) + amount
+
+    def set(self, name: str, value: float, labels: dict = None):
+        with self._lock:
+            self._values[name][self._key(labels)] = value
+
+    def observe(self, name: str, value: float, labels: dict = None):
+        if value is None:
+            return
+        with self._lock:
+            buckets = self._meta[name][2]
+            series = self._values[name]
+            key = self._key(labels)
+            if key not in series:
+                series[key] = {"buckets": [0] * len(buckets), "sum": 0.0, "count": 0}
+            hist = series[key]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    hist["buckets"][i] += 1
+            hist["sum"] += value
+            hist["count"] += 1
+
+    def render(self) -> str:
+        """
+        All metrics in the Prometheus text format.
+        """
+        lines = []
+        with self._lock:
+            for name, (kind, help_text, buckets) in self._meta.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for key, value in self._values[name].items():
+                    if kind != "histogram":
+                        lines.append(f"{name}{_labels_text(key)} {_number(value)}")
+                        continue
+                    for bound, count in zip(buckets, value["buckets"]):
+                        le = _labels_text(key + (("le", _number(bound)),))
+                        lines.append(f"{name}_bucket{le} {count}")
+                    inf = _labels_text(key + (("le", "+Inf"),))
+                    lines.append(f"{name}_bucket{inf} {value['count']}")
+                    lines.append(f"{name}_sum{_labels_text(key)} {_number(value['sum'])}")
+                    lines.append(f"{name}_count{_labels_text(key)} {value['count']}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+REGISTRY.counter("plan_requests_total", "Plan requests by cache result (hit-memory, hit-disk, miss).")
+REGISTRY.counter("plan_jobs_total", "Finished plan jobs by final status.")
+REGISTRY.gauge("plan_jobs_active", "Plan jobs currently queued or running, by status.")
+REGISTRY.counter("plan_capacity_rejections_total", "Plan jobs rejected by the capacity pre-check.")
+REGISTRY.histogram("plan_job_seconds", "Wall time of a plan job from submission to its end.")
+REGISTRY.histogram(
+    "plan_stage_seconds",
+    "Time per pipeline stage (validation, products_protein, model_build, solve, output_printers).",
+)
+REGISTRY.histogram("plan_model_build_seconds", "CP-SAT model build time by phase.")
+REGISTRY.histogram("plan_solve_seconds", "CP-SAT solve wall time by phase.")
+REGISTRY.histogram("plan_model_variables", "CP-SAT model variables by phase.", SIZE_BUCKETS)
+REGISTRY.histogram("plan_model_constraints", "CP-SAT model constraints by phase.", SIZE_BUCKETS)
+REGISTRY.histogram("plan_model_intervals", "CP-SAT model interval variables by phase.", SIZE_BUCKETS)
+REGISTRY.counter("plan_solves_total", "CP-SAT solves by phase and solver status.")
+REGISTRY.gauge("plan_solve_objective", "Objective of the last solve by phase.")
+REGISTRY.gauge("plan_solve_best_bound", "Best objective bound of the last solve by phase.")
+REGISTRY.histogram("plan_solve_gap", "Relative gap between objective and bound at the end of a solve.", GAP_BUCKETS)
+REGISTRY.histogram("plan_solve_solutions", "Improving solutions found per solve.", COUNT_BUCKETS)
+REGISTRY.histogram("plan_peak_rss_bytes", "Peak resident set size of a plan job.", BYTES_BUCKETS)
+REGISTRY.gauge("plan_last_peak_rss_bytes", "Peak resident set size of the last plan job.")
+
+
+def record_plan_telemetry(telemetry: dict, registry: MetricsRegistry = REGISTRY):
+    """
+    Record the "telemetry" of a plan (MILP_Solver.main) in the registry.
+    """
+    for stage, seconds in telemetry.get("stages", {}).items():
+        registry.observe("plan_stage_seconds", seconds, {"stage": stage})
+    for solve in telemetry.get("solves", []):
+        phase = {"phase": solve["phase"]}
+        registry.observe("plan_model_build_seconds", solve["build_seconds"], phase)
+        registry.observe("plan_solve_seconds", solve["solve_seconds"], phase)
+        registry.observe("plan_model_variables", solve["variables"], phase)
+        registry.observe("plan_model_constraints", solve["constraints"], phase)
+        registry.observe("plan_model_intervals", solve["intervals"], phase)
+        registry.inc("plan_solves_total", {**phase, "status": solve["status"]})
+        if solve["objective"] is not None:
+            registry.set("plan_solve_objective", solve["objective"], phase)
+            if solve["best_bound"] is not None:  # the greedy engine proves no bound
+                registry.set("plan_solve_best_bound", solve["best_bound"], phase)
+        registry.observe("plan_solve_gap", solve["gap"], phase)
+        registry.observe("plan_solve_solutions", solve["solutions"], phase)
+    if telemetry.get("peak_rss_bytes") is not None:
+        registry.observe("plan_peak_rss_bytes", telemetry["peak_rss_bytes"])
+        registry.set("plan_last_peak_rss_bytes", telemetry["peak_rss_bytes"])
@@ -1,21 +1,35 @@
+import asyncio
 import base64
 import io
 import json
-import math
+import os
+import time
 import matplotlib.dates as mdates
 import matplotlib.pyplot as plt
+import Lines_Config
 import MILP_Solver
-import pandas as pd
+import Plan_Cache
+import Plan_Jobs
+import Plan_Metrics
+import Product_Parameters
+import Protein_Demand
 
 # import re
 from datetime import datetime, date
 from typing import Any, Dict, List, Optional, Tuple
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, field_validator
 
 # from openpyxl import load_workbook
 
+# Lines.json is read from MILP_Solver.LINES_JSON_PATH, the file the solver plans from.
+PARAMETERS_PATH = r"E:\\Sherkat_DeepSpring_projects\\Aryogen_Planning\\Data\\Products parameters AI.xlsx"
+
+# Results of /api/plan/, keyed by the payload and the content of both data files.
+plan_cache = Plan_Cache.PlanCache()
+
 # 1) FastAPI app and CORS
 app = FastAPI()
 app.add_middleware(
@@ -51,8 +65,44 @@ app.add_middleware(
 #     selectedDate: Optional[str] = None   # New field for the date
 
 
-from typing import Optional, Dict, List, Any
-from pydantic import BaseModel
+from typing import Optional, Dict, List, Any, Literal
+from pydantic import BaseModel, Field, model_validator
+
+class DemandColumns(BaseModel):
+    """
+    Compact alternative to Sales_Stocks / Export_Stocks: one dense month
+    vector per dose instead of a dict per month. Example:
+    {
+      "doses": ["Altebrel|25", "Altebrel|50", "Zytux|100"],
+      "months": [1, 2, 3],
+      "sales": [[0, 400, 400], [0, 250, 250], [0, 120, 120]],
+      "export": [[0, 0, 30], [0, 0, 0], [0, 10, 10]]
+    }
+    sales and export (optional) have one row per dose and one column per
+    month, in the order given; every listed month counts as sold.
+    """
+    doses: List[str]
+    months: List[int]
+    sales: List[List[int]]
+    export: Optional[List[List[int]]] = None
+
+    @model_validator(mode="after")
+    def _dense_rows(self):
+        if len(set(self.months)) != len(self.months):
+            raise ValueError("demandColumns.months has duplicate months")
+        for label in self.doses:
+            if label.count("|") != 1:
+                raise ValueError(f"demandColumns dose '{label}' is not 'product|dose'")
+        for name in ("sales", "export"):
+            rows = getattr(self, name)
+            if rows is None:
+                continue
+            if len(rows) != len(self.doses) or any(len(row) != len(self.months) for row in rows):
+                raise ValueError(
+                    f"demandColumns.{name} must have one row per dose and one value per month"
+                )
+        return self
+
 
 class PlanPayload(BaseModel):
     """
@@ -88,11 +138,14 @@ class PlanPayload(BaseModel):
          }
       ]
     }
+    The demand can be given as "demandColumns" (see DemandColumns) instead
+    of Export_Stocks and Sales_Stocks.
     """
     products: Dict[str, List[str]]
-    Min_Stock: Dict[str, Dict[str, Dict[int, int]]]
-    Export_Stocks: Dict[str, Dict[str, Dict[int, int]]]
-    Sales_Stocks: Dict[str, Dict[str, Dict[int, int]]]
+    Min_Stock: Dict[str, Dict[str, Dict[int, int]]] = {}
+    Export_Stocks: Dict[str, Dict[str, Dict[int, int]]] = {}
+    Sales_Stocks: Dict[str, Dict[str, Dict[int, int]]] = {}
+    demandColumns: Optional[DemandColumns] = None  # compact form of Sales_Stocks / Export_Stocks
     monthsCount: int
     commonBRs: List[Dict[str, Any]]
     dedicatedBRs: List[Dict[str, Any]]
@@ -100,12 +153,39 @@ class PlanPayload(BaseModel):
     currentStocks: Optional[List[dict]] = None
     busyLines: Optional[List[dict]] = None
     initialExpiry: Dict[str, str]   # parse DD/MM/YYYY automatically
+    symmetryBreaking: bool = False  # order interchangeable run slots in the solver
+    engine: Literal["monolithic", "two_phase", "greedy"] = "monolithic"  # or "two_phase": lot-sizing first, then stage scheduling; or "greedy": heuristic plan in milliseconds
+    rollingWindow: Optional[int] = Field(default=None, ge=1)  # months per rolling window; None plans the horizon at once
+    rollingStep: Optional[int] = Field(default=None, ge=1)  # months frozen per window (default: half a window)
+    solverProfile: Optional[str] = None  # "interactive", "balanced", "overnight-optimal" or one from solver_profiles.json
+
+    @model_validator(mode="after")
+    def _one_demand_format(self):
+        if self.demandColumns is not None and (self.Sales_Stocks or self.Export_Stocks):
+            raise ValueError("Give the demand either as Sales_Stocks/Export_Stocks or as demandColumns")
+        return self
+
+    @model_validator(mode="after")
+    def _step_within_window(self):
+        if (self.rollingWindow is not None and self.rollingStep is not None
+                and self.rollingStep > self.rollingWindow):
+            raise ValueError("rollingStep cannot be larger than rollingWindow")
+        return self
+
+    @field_validator("solverProfile")
+    @classmethod
+    def _known_solver_profile(cls, name: Optional[str]) -> Optional[str]:
+        if name is not None and name not in MILP_Solver.load_solver_profiles():
+            raise ValueError(f"Unknown solver profile '{name}'")
+        return name
 
 
 
 def _search_dose(prdct: str, x_dose: float) -> float:
     """
-    Search for the protein per container for a given product and dose.
+    Search for the protein per container for a given product and dose, in the
+    parameters workbook indexed by Product_Parameters (parsed once per change
+    of the file).
 
     Args:
         prdct (str): The name of the product.
@@ -118,36 +198,19 @@ def _search_dose(prdct: str, x_dose: float) -> float:
         ValueError: If no matching row is found for the product and dose.
 
     """
-    df_parameters = pd.read_excel(
-        r"E:\\Sherkat_DeepSpring_projects\\Aryogen_Planning\\Data\\Products parameters AI.xlsx"
-    )
-    df_parameters = df_parameters.ffill()
-
-    if prdct == "AryoSeven_BR":
-        prdct = "AryoSeven BR"
-    if prdct == "AryoSeven_RC":
-        prdct = "AryoSeven RC"
-        
-    if prdct == "Arylia" and x_dose == 120:
-        prdct = "Artenix"
-
-    subset = df_parameters.loc[
-        (df_parameters["Product name"] == prdct) & (df_parameters["Dose"] == x_dose)
-    ]
-
-    if subset.empty:
-        raise ValueError(f"No row found for Product '{prdct}' with Dose '{x_dose}'!")
-    return subset["Protein per container\n(mg)"].iloc[0]
+    return Product_Parameters.protein_per_container(PARAMETERS_PATH, prdct, x_dose)
 
 
 def Products_Protein(
     payload: PlanPayload,
+    on_solution=None,
 ) -> Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any]]:
     """
     Calculate the proteins needed for the products.
 
     Args:
         payload: the payload object containing the plan data
+        on_solution: optional callback for every improving solution of the solver
     Returns:
         Tuple of three dictionaries:
             - Products_Protein_total: total protein needed for each product
@@ -162,103 +225,44 @@ def Products_Protein(
     returns { "Altebrel": initial_amount, ... }.
     Adjust splitting logic as needed.
     """
-    products_inventory_protein = {}
-    init_stock = {}
-    
-    with open("E:\\Sherkat_DeepSpring_projects\\Aryogen_Planning\\Data\\Lines.json", "r") as f:
-        data = json.load(f)
-    
-    for stock in payload.currentStocks:
-        # if stock is a dict, use stock['productDose'] and stock['amount']
-        prod_dose = stock['productDose']  # e.g. "Altebrel|25"
-        amount = float(stock['amount'])
-        # Split the product name if needed, here we assume product name is before '|'
-        product = prod_dose.split("|")[0]
-        dose = prod_dose.split("|")[1]
-        init_stock[f"{product} {dose}"] = init_stock.get(product, 0) + amount
-    
-    for prdct, doses_dict in payload.Min_Stock.items():
-        products_inventory_protein[f"{prdct}"] = 0
-        
-    # print(init_stock)
-    products_protein = {}
-    sales_stock_protein = {}
-    export_stock_protein = {}
+    started = time.perf_counter()
+    covers = Lines_Config.load_config(MILP_Solver.LINES_JSON_PATH).covers
+    stock_products = list(payload.Min_Stock)
+    if payload.demandColumns is not None:
+        columns = payload.demandColumns
+        arrays = Protein_Demand.from_columns(columns.doses, columns.months, columns.sales, columns.export)
+        stock_products += [p for p in arrays.products() if p not in payload.Min_Stock]
+    else:
+        arrays = Protein_Demand.from_nested(payload.Sales_Stocks, payload.Export_Stocks)
+    demand = Protein_Demand.demand_ranges(arrays, covers, _search_dose)
+    products_inventory_protein = Protein_Demand.stock_protein(
+        payload.currentStocks or [], stock_products, _search_dose
+    )
     products_protein_per_month = {}
-    stock_amount = 0
-    covers_dict = {}
-    
-    # 1) EXPORT side
-    for prdct, doses_dict in payload.Export_Stocks.items():
-        export_stock_protein.setdefault(prdct, {})
-        products_protein.setdefault(prdct, {})
-
-        for dose_str, month_map in doses_dict.items():
-            numeric_dose      = float(dose_str) if "." in dose_str else int(dose_str)
-            mg_per_container  = _search_dose(prdct, numeric_dose)
-            export_stock_protein[prdct][f"{numeric_dose}"] = {}
-
-            for month, qty in month_map.items():
-                grams = qty * mg_per_container * 0.001
-
-                # accumulate export by month
-                export_stock_protein[prdct][f"{numeric_dose}"].setdefault(month, 0.0)
-                export_stock_protein[prdct][f"{numeric_dose}"][month] += grams
-
-    # 2) SALES side
-    for prdct, doses_dict in payload.Sales_Stocks.items():
-        sales_stock_protein.setdefault(prdct, {})
-        products_protein.setdefault(prdct, {})
-
-        for dose_str, month_map in doses_dict.items():
-            numeric_dose      = float(dose_str) if "." in dose_str else int(dose_str)
-            mg_per_container  = _search_dose(prdct, numeric_dose)
-
-            if f'{prdct} {numeric_dose}' in data['Covers']:
-                covers_dict[f'{prdct} {numeric_dose}'] = data['Covers'][f'{prdct} {numeric_dose}']
-                print(f"Found Covers data for Product '{prdct}' with Dose '{numeric_dose}'. Amount: {covers_dict[f'{prdct} {numeric_dose}']}")
-            else:
-                raise ValueError(f"No row found for Product '{prdct}' with Dose '{numeric_dose}' in Covers data!")
-
-            sales_stock_protein[prdct][f"{numeric_dose}"] = {}
-            for month, qty in month_map.items():
-                grams = qty * mg_per_container * 0.001
-
-                # accumulate sales by month
-                sales_stock_protein[prdct][f"{numeric_dose}"].setdefault(month, 0.0)
-                sales_stock_protein[prdct][f"{numeric_dose}"][month] += grams
-
-    # 3) INVENTORY (unchanged)
-    for prod_dose, stock_amount in init_stock.items():
-        prdct, dose_val = prod_dose.split()
-        numeric_dose    = float(dose_val) if "." in dose_val else int(dose_val)
-        mg_per_container = _search_dose(prdct, numeric_dose)
-        grams = stock_amount * mg_per_container * 0.001
-        products_inventory_protein.setdefault(prdct, 0)
-        products_inventory_protein[prdct] += int(math.ceil(grams))
-    
-    print("Export Stock Protein:", export_stock_protein)
-    print("Sales Stock Protein:", sales_stock_protein)
-    print("covers_dict:", covers_dict)
+    print("Opening stock protein:", products_inventory_protein)
 
+    protein_seconds = time.perf_counter() - started
     Schedule = MILP_Solver.main(
-        products_protein_per_month, products_inventory_protein, payload, export_stock_protein, sales_stock_protein, covers_dict
+        products_protein_per_month, products_inventory_protein, payload, demand,
+        on_solution=on_solution,
     )
+    Schedule["telemetry"]["stages"]["products_protein"] = protein_seconds
     return products_protein_per_month, Schedule
 
 
-def Planner(payload: PlanPayload) -> dict[str, Dict[str, float]]:
+def Planner(payload: PlanPayload, on_solution=None) -> dict[str, Dict[str, float]]:
     """
     Run the Planner agent.
 
     Args:
         payload: the payload object containing the plan data
+        on_solution: optional callback for every improving solution of the solver
     Returns:
         production_plan: dictionary with the total and monthly protein values for each product
 
     """
     Products_Protein_per_month, Schedule = Products_Protein(
-        payload=payload
+        payload=payload, on_solution=on_solution
     )
     production_plan = {
         "Monthly Protein": Products_Protein_per_month,
@@ -267,6 +271,78 @@ def Planner(payload: PlanPayload) -> dict[str, Dict[str, float]]:
     return production_plan
 
 
+def solve_plan(payload: dict, on_solution=None, stop_event=None) -> Dict[str, Any]:
+    """
+    Plan one request; the target of the plan_jobs worker processes.
+
+    Args:
+        payload: the plan data as a plain dict (PlanPayload.model_dump())
+        on_solution: callback for every improving solution (a light plan and
+            inventory snapshot, see MILP_Solver.SolutionStreamer)
+        stop_event: once set, the solver stops with the best solution so far
+    Returns:
+        The /api/plan/ result: the schedule and its demand, feasible demand,
+        initial inventory, warm-start report and telemetry (planner status
+        "PARTIAL" with its unsolved_products when some products could not be
+        planned, or minimum_demand_met false and the unmet_minimum months
+        when a greedy plan falls short); or, for a demand the capacity
+        pre-check rejects (MILP_Solver.compute_capacity_shortfall),
+        status "INFEASIBLE" with the per-product, per-month shortfall.
+
+    """
+    MILP_Solver.set_stop_event(stop_event)
+    started = time.perf_counter()
+    plan_payload = PlanPayload(**payload)
+    validation_seconds = time.perf_counter() - started
+    planner = Planner(payload=plan_payload, on_solution=on_solution)
+    planner["Schedule"]["telemetry"]["stages"]["validation"] = validation_seconds
+    if planner["Schedule"]["status"] == "INFEASIBLE":
+        return {
+            "status": "INFEASIBLE",
+            "Capacity_Shortfall": planner["Schedule"]["capacity_shortfall"],
+            "demand": planner["Schedule"]["demand"],
+            "Telemetry": planner["Schedule"]["telemetry"],
+        }
+    return {
+        "planner": planner["Schedule"],
+        "demand": planner["Schedule"]["demand"],
+        "Feasible_Demand": planner["Schedule"]["feasible_capacity"],
+        "Initial_Inventory_Amount": planner["Schedule"]["initial_stock"],
+        "Warm_Start": planner["Schedule"]["warm_start"],
+        "Telemetry": planner["Schedule"]["telemetry"],
+    }
+
+
+def _record_job_metrics(status: dict, result: Optional[Dict[str, Any]]):
+    """
+    Record a finished plan job and its telemetry in Plan_Metrics.REGISTRY.
+    """
+    registry = Plan_Metrics.REGISTRY
+    registry.inc("plan_jobs_total", {"status": status["status"]})
+    registry.observe("plan_job_seconds", status["finished_at"] - status["submitted_at"])
+    if result is not None and result.get("status") == "INFEASIBLE":
+        registry.inc("plan_capacity_rejections_total")
+    if result is not None and "Telemetry" in result:
+        Plan_Metrics.record_plan_telemetry(result["Telemetry"], registry)
+
+
+def _cache_plan(key: str, result: Dict[str, Any]):
+    """
+    Keep a finished plan in plan_cache if it answers the request in full: a
+    complete plan (planner status "OK") or a capacity rejection. PARTIAL
+    plans (unsolved products, unmet minimum demand) are solved again next time.
+    """
+    if result.get("status") == "INFEASIBLE" or result["planner"]["status"] == "OK":
+        plan_cache.put(key, result)
+
+
+# Solves run in worker processes (PLAN_JOB_WORKERS, default 2); complete
+# results go into plan_cache and their telemetry into Plan_Metrics.
+plan_jobs = Plan_Jobs.PlanJobs(
+    solve_plan, on_done=_cache_plan, on_finish=_record_job_metrics
+)
+
+
 def create_timeline_chart(final_plan: list) -> str:
     """
     Generate a timeline (Gantt) chart from the final_plan.
@@ -352,33 +428,175 @@ def create_timeline_chart(final_plan: list) -> str:
 
 
 # 4) FastAPI Endpoint
-@app.post("/api/plan/")
-async def receive_plan(payload: PlanPayload) -> Dict[str, Any]:
+@app.post("/api/plan/", status_code=202)
+async def receive_plan(payload: PlanPayload, response: Response) -> Dict[str, Any]:
     """
-    Receive the plan data from the front-end,
-    runs the Planner agent, returns the final production plan.
+    Receive the plan data from the front-end and start a solve job for it.
+
+    The solve runs in a plan_jobs worker process; poll /api/plan/jobs/{job_id}
+    and fetch /api/plan/jobs/{job_id}/result when it is "done". A payload
+    already planned against the same Lines.json and parameter sheet is answered
+    from plan_cache with a job that is done at once; the X-Plan-Cache header
+    says "hit-memory", "hit-disk" or "miss". Resubmitting a payload whose job is
+    still queued or running returns that job.
 
     Args:
         payload: the plan data
+        response: the outgoing response, for the cache header
     Returns:
-        production_plan: dictionary with the total and monthly protein values for each product
+        {"job_id": ..., "status": ...}
 
     """
     print("************************\n", payload)
-    planner = Planner(payload=payload)
+    payload_dict = payload.model_dump()
+    input_files = [MILP_Solver.LINES_JSON_PATH, PARAMETERS_PATH]
+    if os.path.exists(MILP_Solver.SOLVER_PROFILES_PATH):
+        input_files.append(MILP_Solver.SOLVER_PROFILES_PATH)
+    cache_key = Plan_Cache.plan_cache_key(payload_dict, input_files)
+    tier, cached = plan_cache.get(cache_key)
+    if cached is not None:
+        response.headers["X-Plan-Cache"] = f"hit-{tier}"
+        job_id = plan_jobs.add_finished(cache_key, cached)
+    else:
+        response.headers["X-Plan-Cache"] = "miss"
+        job_id = plan_jobs.submit(payload_dict, cache_key)
+    Plan_Metrics.REGISTRY.inc("plan_requests_total", {"result": response.headers["X-Plan-Cache"]})
+    return {"job_id": job_id, "status": plan_jobs.status(job_id)["status"]}
+
+
+@app.get("/api/plan/jobs/{job_id}")
+async def plan_job_status(job_id: str) -> Dict[str, Any]:
+    """
+    Status of a solve job: "queued", "running", "done", "failed" or "cancelled",
+    with its submit, start and finish times (epoch seconds) and, if it
+    failed, the error.
 
-    return {
-        "planner": planner["Schedule"],
-        "demand": planner["Schedule"]["demand"],
-        "Feasible_Demand": planner["Schedule"]["feasible_capacity"],
-        "Initial_Inventory_Amount": planner["Schedule"]["initial_stock"],
-    }
+    Raises:
+        HTTPException: 404 for an unknown job id.
+
+    """
+    status = plan_jobs.status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job '{job_id}'")
+    return status
+
+
+@app.get("/api/plan/jobs/{job_id}/result")
+async def plan_job_result(job_id: str) -> Dict[str, Any]:
+    """
+    Result of a finished solve job, as the synchronous /api/plan/ used to return.
+
+    Raises:
+        HTTPException: 404 for an unknown job id, 409 if the job is not done
+        (yet), 500 if it failed, 422 with the per-product, per-month shortfall
+        if the capacity pre-check rejected the demand.
+
+    """
+    status, result = plan_jobs.result(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job '{job_id}'")
+    if status == Plan_Jobs.FAILED:
+        raise HTTPException(status_code=500, detail=plan_jobs.status(job_id)["error"])
+    if status != Plan_Jobs.DONE:
+        raise HTTPException(status_code=409, detail=f"Job '{job_id}' is {status}")
+    if result.get("status") == "INFEASIBLE":
+        raise HTTPException(
+            status_code=422,
+            detail={
+                "message": "Minimum demand exceeds what the active lines can produce",
+                "shortfall": result["Capacity_Shortfall"],
+            },
+        )
+    return result
+
+
+@app.get("/api/plan/jobs/{job_id}/stream")
+async def stream_plan_job(job_id: str) -> StreamingResponse:
+    """
+    Server-Sent Events stream of a solve job.
+
+    Sends a "solution" event with each improving solution (a light final_plan,
+    the inventory trajectory, its objective and the solver's elapsed seconds),
+    then one event named after the job's final status ("done", "failed" or
+    "cancelled") carrying the job status, and ends. Solutions found between two
+    polls (every 0.5 s) are coalesced into the latest one.
+
+    Raises:
+        HTTPException: 404 for an unknown job id.
+
+    """
+    if plan_jobs.status(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job '{job_id}'")
+
+    async def events():
+        sent = 0
+        while True:
+            count, snapshot = plan_jobs.latest(job_id)
+            if count > sent:
+                sent = count
+                yield f"event: solution\ndata: {json.dumps(snapshot, default=str)}\n\n"
+            status = plan_jobs.status(job_id)
+            if status is None or status["status"] not in (Plan_Jobs.QUEUED, Plan_Jobs.RUNNING):
+                final = status["status"] if status else Plan_Jobs.CANCELLED
+                yield f"event: {final}\ndata: {json.dumps(status, default=str)}\n\n"
+                return
+            await asyncio.sleep(0.5)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.post("/api/plan/jobs/{job_id}/stop")
+async def stop_plan_job(job_id: str) -> Dict[str, Any]:
+    """
+    End a solve job early with the best solution found so far; unlike DELETE,
+    the job still finishes "done" with a complete result.
+
+    Raises:
+        HTTPException: 404 for an unknown job id.
+
+    """
+    status = plan_jobs.stop(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job '{job_id}'")
+    return {"job_id": job_id, "status": status}
+
+
+@app.delete("/api/plan/jobs/{job_id}")
+async def cancel_plan_job(job_id: str) -> Dict[str, Any]:
+    """
+    Cancel a queued or running solve job (a running solve is terminated).
+
+    Raises:
+        HTTPException: 404 for an unknown job id.
+
+    """
+    status = plan_jobs.cancel(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job '{job_id}'")
+    return {"job_id": job_id, "status": status}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> PlainTextResponse:
+    """
+    Planner telemetry in the Prometheus text format: requests and cache hits,
+    job outcomes and durations, time per pipeline stage, model size, solver
+    status, objective, bound, gap and solution count per phase, and peak RSS.
+
+    """
+    for status, count in plan_jobs.counts().items():
+        if status in (Plan_Jobs.QUEUED, Plan_Jobs.RUNNING):
+            Plan_Metrics.REGISTRY.set("plan_jobs_active", count, {"status": status})
+    return PlainTextResponse(
+        Plan_Metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4"
+    )
 
 
 @app.get("/api/lines")
 async def get_lines() -> Dict[str, Any]:
     """
-    Asynchronously retrieves production line data from a JSON file.
+    Asynchronously retrieves production line data from a JSON file (the raw
+    content of the compiled configuration, see Lines_Config).
     This function reads the contents of a JSON file containing information
     about production lines and returns the data. If an error occurs during
     file reading or JSON parsing, an HTTPException with status code 500 is raised.
@@ -391,11 +609,7 @@ async def get_lines() -> Dict[str, Any]:
 
     """
     try:
-        with open(
-            r"E:\\Sherkat_DeepSpring_projects\\Aryogen_Planning\\Data\\Lines.json", "r"
-        ) as file:
-            data = json.load(file)
-        return data
+        return Lines_Config.load_config(MILP_Solver.LINES_JSON_PATH).raw
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -0,0 +1,61 @@
+import pandas as pd
+
+import Input_Snapshots
+
+PROTEIN_COLUMN = "Protein per container\n(mg)"
+# Request product names that the workbook lists under another name.
+PRODUCT_ALIASES = {
+    "AryoSeven_BR": "AryoSeven BR",
+    "AryoSeven_RC": "AryoSeven RC",
+}
+# (product, dose) pairs sold under another product name.
+DOSE_ALIASES = {
+    ("Arylia", 120): "Artenix",
+}
+
+
+def workbook_name(product: str, dose: float) -> str:
+    """
+    Name under which the parameters workbook lists a product at a dose.
+    """
+    product = PRODUCT_ALIASES.get(product, product)
+    return DOSE_ALIASES.get((product, dose), product)
+
+
+def index_workbook(path: str) -> dict[tuple[str, float], float]:
+    """
+    Protein per container (mg) of every (product name, dose) row of the
+    parameters workbook, the first row winning, as plain Python values.
+    """
+    df_parameters = pd.read_excel(path).ffill()
+    index = {}
+    for product, dose, protein in zip(
+        df_parameters["Product name"].tolist(),
+        df_parameters["Dose"].tolist(),
+        df_parameters[PROTEIN_COLUMN].tolist(),
+    ):
+        index.setdefault((product, dose), protein)
+    return index
+
+
+def load_parameters(path: str) -> dict[tuple[str, float], float]:
+    """
+    index_workbook of the workbook at path, through its binary snapshot: the
+    sheet is only parsed again when the file changes.
+    """
+    return Input_Snapshots.load_snapshot(path, "parameters", index_workbook)
+
+
+def protein_per_container(path: str, product: str, dose: float) -> float:
+    """
+    Protein per container (mg) of a product at a dose, from the parameters
+    workbook at path.
+
+    Raises:
+        ValueError: If the workbook has no row for the product and dose.
+    """
+    name = workbook_name(product, dose)
+    try:
+        return load_parameters(path)[(name, dose)]
+    except KeyError:
+        raise ValueError(f"No row found for Product '{name}' with Dose '{dose}'!") from None
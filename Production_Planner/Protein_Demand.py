@@ -0,0 +1,198 @@
+"""
+Protein demand of a plan request, prepared in bulk.
+
+Both payload formats are first normalized into DoseMonthArrays: the sales and
+export containers of every (product, dose) row as a dense row x month array.
+The nested Sales_Stocks / Export_Stocks dicts go through from_nested, the
+compact demandColumns vectors through from_columns (no per-month dicts).
+demand_ranges then converts the arrays to grams with one mg-per-container
+vector, widens the sales by the Covers multipliers, adds the export and sums
+the doses per product, all with NumPy. The result is the
+{ product: { month: (min, max) } } demand the solver consumes.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+
+@dataclass(slots=True)
+class DoseMonthArrays:
+    """
+    rows:    (product, numeric dose) of every array row.
+    months:  the sorted month numbers of the columns.
+    sales:   containers sold, rows x months.
+    export:  containers exported, rows x months.
+    sold:    cells with a sales entry; only those carry demand.
+    unsold:  doses with export but no sales: not planned, but they must still
+             be known to the parameters workbook.
+    """
+    rows: list[tuple[str, int | float]]
+    months: np.ndarray
+    sales: np.ndarray
+    export: np.ndarray
+    sold: np.ndarray
+    unsold: list[tuple[str, int | float]]
+
+    def products(self) -> list[str]:
+        return list(dict.fromkeys(product for product, _ in self.rows))
+
+
+def parse_dose(dose: str) -> int | float:
+    """
+    Numeric dose of a payload dose key ("25" -> 25, "2.5" -> 2.5).
+    """
+    return float(dose) if "." in dose else int(dose)
+
+
+def _nested_into(quantities: dict, rows: dict, months: np.ndarray, out: np.ndarray, listed: np.ndarray = None):
+    """
+    Add a { product: { dose: { month: containers } } } payload field into the
+    rows x months array out, marking the cells it lists in listed.
+    """
+    if not len(months):
+        return
+    for product, doses in quantities.items():
+        for dose, month_map in doses.items():
+            i = rows.get((product, parse_dose(dose)))
+            if i is None or not month_map:
+                continue
+            keys = np.fromiter(month_map.keys(), dtype=np.int64, count=len(month_map))
+            qty = np.fromiter(month_map.values(), dtype=np.float64, count=len(month_map))
+            cols = np.searchsorted(months, keys)
+            known = (cols < len(months)) & (months[np.minimum(cols, len(months) - 1)] == keys)
+            out[i, cols[known]] += qty[known]
+            if listed is not None:
+                listed[i, cols[known]] = True
+
+
+def from_nested(sales: dict, export: dict) -> DoseMonthArrays:
+    """
+    DoseMonthArrays of the payload's Sales_Stocks and Export_Stocks,
+    { product: { dose: { month: containers } } }. Export only counts in months
+    with sales of the same dose.
+    """
+    rows: dict[tuple[str, int | float], int] = {}
+    for product, doses in sales.items():
+        for dose in doses:
+            rows.setdefault((product, parse_dose(dose)), len(rows))
+    months = np.array(sorted({
+        month for doses in sales.values() for month_map in doses.values() for month in month_map
+    }), dtype=np.int64)
+    unsold = list(dict.fromkeys(
+        (product, parse_dose(dose))
+        for product, doses in export.items() for dose in doses
+        if (product, parse_dose(dose)) not in rows
+    ))
+
+    shape = (len(rows), len(months))
+    sales_qty, export_qty = np.zeros(shape), np.zeros(shape)
+    sold = np.zeros(shape, dtype=bool)
+    _nested_into(sales, rows, months, sales_qty, sold)
+    _nested_into(export, rows, months, export_qty)
+    return DoseMonthArrays(list(rows), months, sales_qty, export_qty, sold, unsold)
+
+
+def from_columns(doses: list[str], months: list[int], sales: list, export: list = None) -> DoseMonthArrays:
+    """
+    DoseMonthArrays of the compact demandColumns payload: one "product|dose"
+    per row and dense month vectors; every listed month counts as sold. Rows
+    naming the same dose are added up.
+    """
+    rows: dict[tuple[str, int | float], int] = {}
+    row_of = []
+    for label in doses:
+        product, dose = label.split("|")[:2]
+        row_of.append(rows.setdefault((product, parse_dose(dose)), len(rows)))
+    row_of = np.array(row_of, dtype=np.int64)
+    order = np.argsort(months, kind="stable")
+    shape = (len(rows), len(months))
+
+    sales_qty = np.zeros(shape)
+    np.add.at(sales_qty, row_of, np.asarray(sales, dtype=np.float64).reshape(len(doses), len(months)))
+    export_qty = np.zeros(shape)
+    if export is not None:
+        np.add.at(export_qty, row_of, np.asarray(export, dtype=np.float64).reshape(len(doses), len(months)))
+    return DoseMonthArrays(
+        list(rows),
+        np.asarray(months, dtype=np.int64)[order],
+        sales_qty[:, order],
+        export_qty[:, order],
+        np.ones(shape, dtype=bool),
+        [],
+    )
+
+
+def demand_ranges(
+    arrays: DoseMonthArrays,
+    covers: dict[str, tuple[float, float]],
+    mg_per_container,
+) -> dict[str, dict[int, tuple[int, int]]]:
+    """
+    Per product and month, the (min, max) grams of protein to deliver.
+
+    For every dose sold in a month: ceil(export + sales * cover) grams, with
+    the dose's min and max cover multiplier; summed over the product's doses.
+    Months without sales for any dose of a product are left out.
+
+    Args:
+        arrays: from_nested or from_columns of the payload.
+        covers: "<product> <dose>" -> (min, max) multipliers (LinesConfig.covers).
+        mg_per_container: function of (product, numeric dose), e.g.
+            Planning_MILP._search_dose; called once per (product, dose).
+    Raises:
+        ValueError: If a sold dose has no Covers entry, or a dose has no
+            parameters row.
+    """
+    mg = np.array([mg_per_container(product, dose) for product, dose in arrays.rows], dtype=np.float64)
+    for product, dose in arrays.unsold:
+        mg_per_container(product, dose)
+
+    cover = np.ones((len(arrays.rows), 2))
+    for i, (product, dose) in enumerate(arrays.rows):
+        key = f"{product} {dose}"
+        if key not in covers:
+            raise ValueError(f"No row found for Product '{product}' with Dose '{dose}' in Covers data!")
+        cover[i] = covers[key]
+
+    sales_g = arrays.sales * mg[:, None] * 0.001
+    export_g = arrays.export * mg[:, None] * 0.001
+    low = np.where(arrays.sold, np.ceil(export_g + sales_g * cover[:, :1]), 0).astype(np.int64)
+    high = np.where(arrays.sold, np.ceil(export_g + sales_g * cover[:, 1:]), 0).astype(np.int64)
+
+    products = {product: k for k, product in enumerate(arrays.products())}
+    product_of = np.array([products[product] for product, _ in arrays.rows], dtype=np.int64)
+    totals = np.zeros((len(products), len(arrays.months), 2), dtype=np.int64)
+    np.add.at(totals, product_of, np.stack([low, high], axis=-1))
+    served = np.zeros((len(products), len(arrays.months)), dtype=bool)
+    np.logical_or.at(served, product_of, arrays.sold)
+
+    months = arrays.months.tolist()
+    totals = totals.tolist()
+    return {
+        product: {
+            months[j]: tuple(totals[k][j])
+            for j in np.flatnonzero(served[k]).tolist()
+        }
+        for product, k in products.items()
+    }
+
+
+def stock_protein(current_stocks: list, products: list, mg_per_container) -> dict[str, int]:
+    """
+    Opening stock per product in whole grams: ceil(containers * mg / 1000) per
+    dose, summed per product. The products given (those of Min_Stock) start
+    at 0; a dose listed twice in currentStocks counts with its last amount.
+    """
+    amounts: dict[tuple[str, int | float], float] = {}
+    for stock in current_stocks:
+        product, dose = stock["productDose"].split("|")[:2]
+        amounts[(product, parse_dose(dose))] = float(stock["amount"])
+
+    inventory = {product: 0 for product in products}
+    if not amounts:
+        return inventory
+    mg = np.array([mg_per_container(product, dose) for product, dose in amounts], dtype=np.float64)
+    grams = np.ceil(np.fromiter(amounts.values(), dtype=np.float64) * mg * 0.001).astype(np.int64)
+    for (product, _), g in zip(amounts, grams.tolist()):
+        inventory[product] = inventory.get(product, 0) + g
+    return inventory
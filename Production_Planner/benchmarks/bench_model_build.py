@@ -0,0 +1,91 @@
+"""
+Model-construction benchmark for MILP_Solver.build_inventory_model.
+
+Builds (without solving) the CP-SAT model for a fixed number of run slots per
+product and reports how build time grows with the number of runs. With the
+stage registry every per-run lookup is constant time, so the time per run
+should stay flat as the slot count doubles.
+
+Usage (from the repository root):
+    python Production_Planner/benchmarks/bench_model_build.py
+    python Production_Planner/benchmarks/bench_model_build.py --runs 5 10 20 40 --months 24
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import Lines_Config  # noqa: E402
+import MILP_Solver  # noqa: E402
+
+LINES_JSON = os.path.join(HERE, "..", "..", "Data", "Lines.json")
+SELECTED_DATE = "2025-04-11T20:30:00.000Z"
+
+
+def build_once(data: Lines_Config.LinesConfig, products: list, months: int, runs: int) -> tuple[float, int]:
+    """
+    Build the model once and return (seconds, number of variables).
+    """
+    MILP_Solver.set_total_months(months)
+    MILP_Solver.set_base_date_for_planning(MILP_Solver.parse_base_date(SELECTED_DATE))
+    payload = SimpleNamespace(busyLines=[], selectedDate=SELECTED_DATE, monthsCount=months)
+    demand = {p: {m: (0, 1000) for m in range(1, months + 1)} for p in products}
+    stock = {p: 0 for p in products}
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        ctx = MILP_Solver.build_inventory_model(
+            data, demand, stock, payload, run_slots=runs
+        )
+    elapsed = time.perf_counter() - start
+    return elapsed, len(ctx["model"].Proto().variables)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, nargs="+", default=[5, 10, 20, 40, 80])
+    parser.add_argument("--months", type=int, default=12)
+    parser.add_argument(
+        "--products",
+        nargs="+",
+        default=["Altebrel", "Arylia", "AryoTrust", "Stivant", "Zytux"],
+    )
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    data = Lines_Config.load_config(LINES_JSON)
+
+    results = []
+    for runs in args.runs:
+        seconds, n_vars = build_once(data, args.products, args.months, runs)
+        results.append(
+            {
+                "runs": runs,
+                "build_seconds": round(seconds, 4),
+                "ms_per_run": round(1000 * seconds / runs, 3),
+                "variables": n_vars,
+            }
+        )
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    header = f"{'Runs':>6} {'Build (s)':>10} {'ms/run':>10} {'Variables':>10}"
+    print(header)
+    print("-" * len(header))
+    for row in results:
+        print(
+            f"{row['runs']:>6} {row['build_seconds']:>10.3f} {row['ms_per_run']:>10.3f} {row['variables']:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+Scaling benchmark for the whole planning pipeline on synthetic instances.
+
+Each case is generated by synthetic.generate_case from the bundled Data files
+and planned through Planning_MILP.solve_plan in a fresh process (so its peak
+memory is its own), with the same payload checks, protein conversion, model,
+solver profile and output printers as an /api/plan/ job. One dimension is
+scaled at a time: the first value of every option is the base case, and every
+further value of an option gives a case that differs from the base in that
+option only.
+
+Measured per case: model build and solve time, wall time to the first
+feasible plan and to a plan within --target-gap of the final objective bound,
+peak memory, response size, model size and solver outcome. Results are written
+as JSON; --compare prints the change against the results of another commit.
+
+Usage (from the repository root):
+    python Production_Planner/benchmarks/bench_scaling.py --output bench.json
+    python Production_Planner/benchmarks/bench_scaling.py --products 2 4 8 --months 12 --profile interactive
+    python Production_Planner/benchmarks/bench_scaling.py --output new.json --compare old.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+DIMENSIONS = ["products", "doses", "lines", "br_chains", "months", "busy_lines"]
+COMPARED = ["wall_seconds", "first_solution_seconds", "target_gap_seconds",
+            "model_build_seconds", "peak_rss_bytes", "response_bytes"]
+
+
+def scaling_cases(options: dict[str, list]) -> list[dict]:
+    """
+    The base case (first value of every dimension) and one case per further
+    value of a dimension, named after what differs from the base.
+    """
+    base = {dim: values[0] for dim, values in options.items()}
+    cases = [{"name": "base", **base}]
+    for dim, values in options.items():
+        for value in values[1:]:
+            cases.append({"name": f"{dim}={value}", **base, dim: value})
+    return cases
+
+
+def _gap(objective: float, bound: float) -> float:
+    return abs(objective - bound) / max(1.0, abs(objective))
+
+
+def run_case(case: dict, work_dir: str, profile: str, engine: str, target_gap: float, seed: int) -> dict:
+    """
+    Generate and plan one case; runs in its own process.
+    """
+    import MILP_Solver
+    import Planning_MILP
+    import synthetic
+    from fastapi.encoders import jsonable_encoder
+
+    spec = {dim: case[dim] for dim in DIMENSIONS}
+    generated = synthetic.generate_case(
+        work_dir, **spec, seed=seed, solverProfile=profile, engine=engine
+    )
+    Planning_MILP.PARAMETERS_PATH = generated["parameters"]
+    MILP_Solver.LINES_JSON_PATH = generated["lines_json"]
+    MILP_Solver.WARM_START_DIR = os.path.join(work_dir, "warm_starts")  # always cold
+
+    solutions = []
+    started = time.perf_counter()
+
+    def on_solution(snapshot):
+        if snapshot.get("components_reported", 1) < snapshot.get("components", 1):
+            return  # some components have no plan yet
+        solutions.append(
+            (time.perf_counter() - started, snapshot["objective"], snapshot["best_bound"])
+        )
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = Planning_MILP.solve_plan(generated["payload"].model_dump(), on_solution)
+    wall = time.perf_counter() - started
+
+    telemetry = result["Telemetry"]
+    # The greedy plans hinted onto the model are not outcomes of their own.
+    solves = [s for s in telemetry["solves"] if s["phase"] != "greedy_hint"]
+    bounds = [s["best_bound"] for s in solves if s["objective"] is not None]
+    final_bound = None if None in bounds else sum(bounds)  # the greedy engine has none
+    final_gap = max((s["gap"] for s in solves if s["gap"] is not None), default=None)
+    target_seconds = next(
+        (
+            t for t, objective, _ in solutions
+            if final_bound is not None and _gap(objective, final_bound) <= target_gap
+        ),
+        None,
+    )
+    if target_seconds is None and final_gap is not None and final_gap <= target_gap:
+        target_seconds = wall  # the bound closed the gap after the last solution
+
+    return {
+        **case,
+        "wall_seconds": round(wall, 3),
+        "model_build_seconds": round(telemetry["stages"].get("model_build", 0.0), 3),
+        "solve_seconds": round(telemetry["stages"].get("solve", 0.0), 3),
+        "first_solution_seconds": round(solutions[0][0], 3) if solutions else None,
+        "target_gap_seconds": None if target_seconds is None else round(target_seconds, 3),
+        "stages": {k: round(v, 3) for k, v in telemetry["stages"].items()},
+        "peak_rss_bytes": telemetry["peak_rss_bytes"],
+        "response_bytes": len(json.dumps(jsonable_encoder(result))),
+        "variables": sum(s["variables"] for s in solves),
+        "constraints": sum(s["constraints"] for s in solves),
+        "intervals": sum(s["intervals"] for s in solves),
+        "statuses": [s["status"] for s in solves] or [result.get("status", "UNKNOWN")],
+        "objective": sum(s["objective"] for s in solves if s["objective"] is not None),
+        "gap": final_gap,
+        "solutions": len(solutions),
+        "runs": len(result["planner"]["final_plan"]) if "planner" in result else 0,
+    }
+
+
+def environment() -> dict:
+    """
+    What the results depend on besides the code: commit, interpreter, solver
+    version and machine.
+    """
+    from ortools import __version__ as ortools_version
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=HERE, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "ortools": ortools_version,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare(results: list[dict], baseline: dict):
+    """
+    Print every COMPARED metric next to the baseline's for the cases both have
+    (same value in every dimension).
+    """
+    def spec(case):
+        return tuple(case[dim] for dim in DIMENSIONS)
+
+    before = {spec(case): case for case in baseline["cases"]}
+    print(f"\nAgainst {baseline['environment'].get('commit')}:")
+    header = f"{'Case':<16} {'Metric':<24} {'Before':>12} {'After':>12} {'Ratio':>8}"
+    print(header)
+    print("-" * len(header))
+    for case in results:
+        old = before.get(spec(case))
+        if old is None:
+            continue
+        for metric in COMPARED:
+            a, b = old.get(metric), case.get(metric)
+            ratio = f"{b / a:.2f}" if a and b is not None else "-"
+            print(f"{case['name']:<16} {metric:<24} {str(a):>12} {str(b):>12} {ratio:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--products", type=int, nargs="+", default=[2, 4, 8])
+    parser.add_argument("--doses", type=int, nargs="+", default=[2])
+    parser.add_argument("--lines", type=int, nargs="+", default=[3])
+    parser.add_argument("--br-chains", type=int, nargs="+", default=[2])
+    parser.add_argument("--months", type=int, nargs="+", default=[12, 24])
+    parser.add_argument("--busy-lines", type=int, nargs="+", default=[0])
+    parser.add_argument("--profile", default="balanced", help="solver profile of every case")
+    parser.add_argument("--engine", default="monolithic", choices=["monolithic", "two_phase", "greedy"])
+    parser.add_argument("--target-gap", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="results JSON of an earlier run to compare against")
+    args = parser.parse_args()
+
+    cases = scaling_cases({dim: getattr(args, dim) for dim in DIMENSIONS})
+    results = []
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        for i, case in enumerate(cases):
+            print(f"[{i + 1}/{len(cases)}] {case['name']}", flush=True)
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                results.append(
+                    pool.submit(
+                        run_case, case, os.path.join(tmp, str(i)), args.profile,
+                        args.engine, args.target_gap, args.seed,
+                    ).result()
+                )
+
+    report = {
+        "environment": environment(),
+        "settings": {
+            "profile": args.profile,
+            "engine": args.engine,
+            "target_gap": args.target_gap,
+            "seed": args.seed,
+        },
+        "cases": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    header = (
+        f"{'Case':<16} {'Wall (s)':>9} {'Build (s)':>10} {'First (s)':>10} "
+        f"{'Gap (s)':>9} {'Vars':>8} {'Peak MB':>8} {'Resp KB':>8} {'Status':<10}"
+    )
+    print(header)
+    print("-" * len(header))
+    for row in results:
+        first = "-" if row["first_solution_seconds"] is None else f"{row['first_solution_seconds']:.2f}"
+        gap = "-" if row["target_gap_seconds"] is None else f"{row['target_gap_seconds']:.2f}"
+        print(
+            f"{row['name']:<16} {row['wall_seconds']:>9.2f} {row['model_build_seconds']:>10.3f} "
+            f"{first:>10} {gap:>9} {row['variables']:>8} "
+            f"{row['peak_rss_bytes'] / 2**20:>8.0f} {row['response_bytes'] / 1024:>8.0f} "
+            f"{','.join(row['statuses']):<10}"
+        )
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
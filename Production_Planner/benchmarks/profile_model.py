@@ -0,0 +1,85 @@
+"""
+Per-family size profile of the CP-SAT model of MILP_Solver.build_inventory_model.
+
+Builds (without solving) the model with every variable and constraint tagged
+by the family that creates it (Model_Profiler.ModelProfiler) and reports, per
+family: variables, booleans, summed and largest domain size, constraints,
+reified constraints, intervals and build time. Giving several --runs or
+--months values profiles every combination, which shows the families that grow
+with run slots x months.
+
+Usage (from the repository root):
+    python Production_Planner/benchmarks/profile_model.py
+    python Production_Planner/benchmarks/profile_model.py --runs 10 20 --months 12 24 --json
+    python Production_Planner/benchmarks/profile_model.py --lines-json /tmp/case/Lines.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import Lines_Config  # noqa: E402
+import MILP_Solver  # noqa: E402
+import Model_Profiler  # noqa: E402
+
+LINES_JSON = os.path.join(HERE, "..", "..", "Data", "Lines.json")
+SELECTED_DATE = "2025-04-11T20:30:00.000Z"
+
+
+def profile_once(data: Lines_Config.LinesConfig, products: list, months: int, runs: int = None) -> dict:
+    """
+    Build the model once and return its per-family profile; runs=None sizes
+    the run slots from demand like a real request.
+    """
+    MILP_Solver.set_total_months(months)
+    MILP_Solver.set_base_date_for_planning(MILP_Solver.parse_base_date(SELECTED_DATE))
+    payload = SimpleNamespace(busyLines=[], selectedDate=SELECTED_DATE, monthsCount=months)
+    demand = {p: {m: (0, 1000) for m in range(1, months + 1)} for p in products}
+    stock = {p: 0 for p in products}
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        ctx = MILP_Solver.build_inventory_model(
+            data, demand, stock, payload, run_slots=runs, profile_model=True
+        )
+    return ctx["profile"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, nargs="+", default=[None],
+                        help="run slots per product (default: sized from demand)")
+    parser.add_argument("--months", type=int, nargs="+", default=[12])
+    parser.add_argument("--products", nargs="+",
+                        help="default: every product of the Lines.json but AryoSeven_RC")
+    parser.add_argument("--lines-json", default=LINES_JSON)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    data = Lines_Config.load_config(args.lines_json)
+    products = args.products or [p for p in data.common_lines if p in data.products]
+
+    results = []
+    for months in args.months:
+        for runs in args.runs:
+            results.append(
+                {"runs": runs, "months": months, "profile": profile_once(data, products, months, runs)}
+            )
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    for row in results:
+        runs = "sized from demand" if row["runs"] is None else row["runs"]
+        print(f"\nRun slots: {runs}, months: {row['months']}")
+        print(Model_Profiler.format_profile(row["profile"]))
+
+
+if __name__ == "__main__":
+    main()
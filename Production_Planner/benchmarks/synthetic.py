@@ -0,0 +1,255 @@
+"""
+Synthetic planning instances built from the bundled Data files.
+
+Every synthetic product is a copy of one of the real monoclonal products in
+Data/Lines.json (its thawing, harvest and protein parameters) with its own
+name, doses and set of lines: `br_chains` bioreactor chains per product, each a
+copy of one of the template's real lines, placed on `lines` shared line ids.
+Products placed on the same line id compete for it exactly like the real
+products do. The generator writes a Lines.json and a parameters workbook for
+the synthetic products and builds the matching PlanPayload, so a case runs
+through the same Planning_MILP.solve_plan path as a real request.
+
+Usage (from the repository root):
+    python Production_Planner/benchmarks/synthetic.py --products 6 --lines 4 --out /tmp/case
+"""
+import argparse
+import copy
+import json
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+DATA_DIR = os.path.join(HERE, "..", "..", "Data")
+LINES_JSON = os.path.join(DATA_DIR, "Lines.json")
+PARAMETERS_XLSX = os.path.join(DATA_DIR, "Products parameters AI.xlsx")
+SELECTED_DATE = "2025-04-11T20:30:00.000Z"
+TEMPLATE_PRODUCTS = ["Altebrel", "AryoTrust", "Arylia", "Zytux", "Stivant"]
+PROTEIN_COLUMN = "Protein per container\n(mg)"
+
+
+def _template_doses(parameters: pd.DataFrame, product: str) -> list[tuple[int, float]]:
+    """
+    [(dose, protein mg per container), ...] of a real product in the workbook.
+    """
+    rows = parameters.loc[parameters["Product name"] == product]
+    return [(int(r["Dose"]), float(r[PROTEIN_COLUMN])) for _, r in rows.iterrows()]
+
+
+def synthetic_lines(
+    base: dict,
+    parameters: pd.DataFrame,
+    products: int,
+    doses: int,
+    lines: int,
+    br_chains: int,
+) -> tuple[dict, list[dict]]:
+    """
+    A Lines.json with `products` synthetic products.
+
+    Product i copies TEMPLATE_PRODUCTS[i % 5]; its chain j copies the template's
+    line j (cycling through them) and runs on line id (i + j) % lines + 1, so
+    neighbouring products share lines. Doses beyond the template's own double
+    the largest one, with protein per container scaled alike.
+
+    Returns:
+        (Lines.json content, [{"product", "dose", "protein_mg", "cover"}, ...])
+    """
+    data = {"Common_Lines": {}, "Covers": {}}
+    dose_rows = []
+    for i in range(products):
+        template = TEMPLATE_PRODUCTS[i % len(TEMPLATE_PRODUCTS)]
+        name = f"S{i + 1:02d}_{template}"
+        base_conf, lines_conf = base[template]
+        template_lines = [li for li in lines_conf["lines"] if li.get("status") == "active"]
+
+        chains = []
+        for j in range(br_chains):
+            line = copy.deepcopy(template_lines[j % len(template_lines)])
+            line["id"] = (i + j) % lines + 1
+            if any(c["id"] == line["id"] for c in chains):
+                continue  # fewer lines than chains: one chain per line id
+            chains.append(line)
+        data["Common_Lines"][name] = [c["id"] for c in chains]
+        data[name] = [dict(base_conf), {"lines": chains}]
+
+        known = _template_doses(parameters, template)
+        for k in range(doses):
+            if k < len(known):
+                dose, protein_mg = known[k]
+            else:
+                scale = 2 ** (k - len(known) + 1)
+                dose, protein_mg = known[-1][0] * scale, known[-1][1] * scale
+            cover = base["Covers"].get(f"{template} {known[min(k, len(known) - 1)][0]}", [1, 4.0])
+            data["Covers"][f"{name} {dose}"] = list(cover)
+            dose_rows.append({"product": name, "dose": dose, "protein_mg": protein_mg, "cover": cover})
+    return data, dose_rows
+
+
+def synthetic_parameters(dose_rows: list[dict]) -> pd.DataFrame:
+    """
+    Parameters workbook rows (the columns _search_dose reads) for the doses of
+    synthetic_lines.
+    """
+    return pd.DataFrame(
+        {
+            "Product name": [r["product"] for r in dose_rows],
+            "Dose": [r["dose"] for r in dose_rows],
+            PROTEIN_COLUMN: [r["protein_mg"] for r in dose_rows],
+        }
+    )
+
+
+def synthetic_payload(
+    data: dict,
+    dose_rows: list[dict],
+    months: int,
+    busy_lines: int,
+    demand_scale: float = 1.0,
+    seed: int = 0,
+    **options,
+) -> dict:
+    """
+    A plan request for the products of synthetic_lines, as a plain dict.
+
+    Each dose sells a random 200-600 containers (times demand_scale) a month
+    from month 3 on; the first `busy_lines` line ids are busy for 30-120 days
+    after SELECTED_DATE. `options` are passed through (engine, solverProfile,
+    rollingWindow, ...).
+    """
+    rng = random.Random(seed)
+    products: dict[str, list[str]] = {}
+    sales: dict[str, dict] = {}
+    export: dict[str, dict] = {}
+    for row in dose_rows:
+        p, dose = row["product"], str(row["dose"])
+        products.setdefault(p, []).append(dose)
+        sales.setdefault(p, {})[dose] = {
+            m: (round(rng.uniform(200, 600) * demand_scale) if m > 2 else 0)
+            for m in range(1, months + 1)
+        }
+        export.setdefault(p, {})[dose] = {m: 0 for m in range(1, months + 1)}
+
+    base_date = datetime.strptime(SELECTED_DATE[:10], "%Y-%m-%d")
+    line_users: dict[int, str] = {}
+    for p, ids in data["Common_Lines"].items():
+        for l_id in ids:
+            line_users.setdefault(l_id, p)
+    busy = [
+        {
+            "line": f"{line_users[l_id]}|{l_id}",
+            "Date": SELECTED_DATE,
+            "Finish": (base_date + timedelta(days=rng.randint(30, 120))).strftime("%d/%m/%Y"),
+        }
+        for l_id in sorted(line_users)[:busy_lines]
+    ]
+
+    return {
+        "products": products,
+        "Min_Stock": {p: {} for p in products},
+        "Export_Stocks": export,
+        "Sales_Stocks": sales,
+        "monthsCount": months,
+        "commonBRs": [],
+        "dedicatedBRs": [],
+        "selectedDate": SELECTED_DATE,
+        "currentStocks": [],
+        "busyLines": busy,
+        "initialExpiry": {},
+        **options,
+    }
+
+
+def columnar_demand(payload: dict) -> dict:
+    """
+    The payload with its Sales_Stocks and Export_Stocks moved into the compact
+    demandColumns form (see Planning_MILP.DemandColumns).
+    """
+    sales, export = payload["Sales_Stocks"], payload["Export_Stocks"]
+    doses = [(p, dose) for p, by_dose in sales.items() for dose in by_dose]
+    months = sorted({m for by_dose in sales.values() for month_map in by_dose.values() for m in month_map})
+    columns = {
+        "doses": [f"{p}|{dose}" for p, dose in doses],
+        "months": months,
+        "sales": [[sales[p][dose].get(m, 0) for m in months] for p, dose in doses],
+        "export": [[export.get(p, {}).get(dose, {}).get(m, 0) for m in months] for p, dose in doses],
+    }
+    return {**payload, "Sales_Stocks": {}, "Export_Stocks": {}, "demandColumns": columns}
+
+
+def generate_case(
+    out_dir: str,
+    products: int = 2,
+    doses: int = 2,
+    lines: int = 3,
+    br_chains: int = 2,
+    months: int = 12,
+    busy_lines: int = 0,
+    demand_scale: float = 1.0,
+    seed: int = 0,
+    compact: bool = False,
+    **options,
+) -> dict:
+    """
+    Write a synthetic Lines.json and parameters workbook to out_dir and build
+    the matching PlanPayload; with compact, its demand is in demandColumns.
+
+    Returns:
+        {"payload": PlanPayload, "lines_json": path, "parameters": path}
+    """
+    from Planning_MILP import PlanPayload
+
+    with open(LINES_JSON, "r") as f:
+        base = json.load(f)
+    parameters = pd.read_excel(PARAMETERS_XLSX).ffill()
+
+    data, dose_rows = synthetic_lines(base, parameters, products, doses, lines, br_chains)
+    payload = synthetic_payload(data, dose_rows, months, busy_lines, demand_scale, seed, **options)
+    if compact:
+        payload = columnar_demand(payload)
+
+    os.makedirs(out_dir, exist_ok=True)
+    lines_json = os.path.join(out_dir, "Lines.json")
+    with open(lines_json, "w") as f:
+        json.dump(data, f, indent=2)
+    parameters_path = os.path.join(out_dir, "Products parameters.xlsx")
+    synthetic_parameters(dose_rows).to_excel(parameters_path, index=False)
+
+    return {
+        "payload": PlanPayload(**payload),
+        "lines_json": lines_json,
+        "parameters": parameters_path,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--out", required=True, help="directory for Lines.json, the workbook and payload.json")
+    parser.add_argument("--products", type=int, default=2)
+    parser.add_argument("--doses", type=int, default=2)
+    parser.add_argument("--lines", type=int, default=3)
+    parser.add_argument("--br-chains", type=int, default=2)
+    parser.add_argument("--months", type=int, default=12)
+    parser.add_argument("--busy-lines", type=int, default=0)
+    parser.add_argument("--demand-scale", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--compact", action="store_true", help="write the demand as demandColumns")
+    args = parser.parse_args()
+
+    case = generate_case(
+        args.out, args.products, args.doses, args.lines, args.br_chains,
+        args.months, args.busy_lines, args.demand_scale, args.seed, args.compact,
+    )
+    with open(os.path.join(args.out, "payload.json"), "w") as f:
+        json.dump(case["payload"].model_dump(), f, indent=2)
+    print("Wrote", case["lines_json"], case["parameters"], os.path.join(args.out, "payload.json"))
+
+
+if __name__ == "__main__":
+    main()